@@ -0,0 +1,274 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from typing import Dict, Iterator, Optional
+from commands import run_command
+from diagnostics import record_command
+from config import compose_dir as default_compose_dir, compose_project, container_backend, podman_socket
+
+SERVICE_LABEL = "com.docker.compose.service"
+PROJECT_LABEL = "com.docker.compose.project"
+
+
+def project_name_for(compose_dir: str) -> str:
+    """compose と同じ規則でディレクトリ名からプロジェクト名を求める"""
+    if os.path.normpath(compose_dir) == os.path.normpath(default_compose_dir):
+        return compose_project
+    return re.sub(r"[^a-z0-9_-]", "", os.path.basename(os.path.normpath(compose_dir)).lower())
+
+
+def fetch_container_status(compose_dir: str) -> Dict[str, dict]:
+    """podman compose ps を実行し、サービス名 → コンテナ情報の辞書を返す。失敗したら例外を送出する"""
+    # 失敗を空の結果 (全サービス停止) と取り違えないよう、run_command を使わずに失敗を送出する
+    command = ["podman", "compose", "ps", "--format=json"]
+    started = time.monotonic()
+    try:
+        result = subprocess.run(command, cwd=compose_dir, check=True, capture_output=True, text=True).stdout
+    finally:
+        record_command(command, time.monotonic() - started)
+    containers = {}
+    for line in result.strip().splitlines():
+        try:
+            container_data = json.loads(line)
+            service_name = container_data.get("Service")
+            if service_name:
+                containers[service_name] = container_data
+        except json.JSONDecodeError as e:
+            print(f"エラー: JSONデコードに失敗しました (行: {line}) - {e}")
+    return containers
+
+
+class ProcessStream:
+    """コマンドの標準出力を1行ずつ返す。close() でプロセスを終了する"""
+
+    def __init__(self, command: list, cwd: str) -> None:
+        self.process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+            bufsize=1,
+        )
+
+    def __iter__(self) -> Iterator[str]:
+        yield from self.process.stdout
+        self.process.wait()
+
+    def close(self) -> None:
+        if self.process.poll() is None:
+            self.process.terminate()
+
+
+class CliBackend:
+    """podman / podman compose コマンドを実行するバックエンド"""
+
+    name = "cli"
+
+    def __init__(self, compose_dir: str, project: str) -> None:
+        self.compose_dir = compose_dir
+        self.project = project
+
+    def list_services(self) -> Dict[str, dict]:
+        return fetch_container_status(self.compose_dir)
+
+    def start_service(self, service_name: str) -> None:
+        self._run(["podman", "compose", "up", "-d", service_name])
+
+    def stop_service(self, service_name: str) -> None:
+        self._run(["podman", "compose", "stop", service_name])
+
+    def down_project(self) -> None:
+        """プロジェクトのコンテナとネットワークを削除する"""
+        self._run(["podman", "compose", "down"])
+
+    def _run(self, command: list) -> None:
+        started = time.monotonic()
+        try:
+            subprocess.run(command, cwd=self.compose_dir, check=True,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        finally:
+            record_command(command, time.monotonic() - started)
+
+    def inspect_service(self, service_name: str) -> Optional[dict]:
+        container = self.list_services().get(service_name)
+        if not container:
+            return None
+        return self.inspect_container(container.get("ID") or container.get("Name"))
+
+    def inspect_container(self, container_id: str) -> Optional[dict]:
+        result = run_command(["podman", "inspect", container_id])
+        try:
+            return json.loads(result)[0]
+        except (ValueError, IndexError):
+            return None
+
+    def open_log_stream(self, service_name: str, follow: bool, tail: Optional[int] = None,
+                        since: Optional[str] = None) -> ProcessStream:
+        command = ["podman", "compose", "logs", "--timestamps"]
+        if follow:
+            command.append("--follow")
+        if since is not None:
+            command += ["--since", since]
+        if tail is not None:
+            command += ["--tail", str(tail)]
+        command.append(service_name)
+        return ProcessStream(command, self.compose_dir)
+
+    def open_stats_stream(self, container_names: list) -> ProcessStream:
+        return ProcessStream(["podman", "stats", "--format", "{{json .}}", "--interval", "1"] + container_names,
+                             self.compose_dir)
+
+    def open_event_stream(self) -> ProcessStream:
+        return ProcessStream([
+            "podman", "events",
+            "--format", "json",
+            "--filter", "type=container",
+            "--filter", f"label={PROJECT_LABEL}={self.project}",
+        ], self.compose_dir)
+
+
+class ApiBackend:
+    """Podman REST API (UNIX ソケット) を使うバックエンド。
+       API で扱えない操作や API が使えないときは CliBackend にフォールバックする。
+    """
+
+    name = "api"
+
+    def __init__(self, compose_dir: str, project: str, socket_path: str) -> None:
+        self.compose_dir = compose_dir
+        self.project = project
+        # http.client の読み込みは重いので、API を使うときだけ読み込む (ヘッドレス版の起動時間のため)
+        from podman_api import PodmanAPIClient, PodmanAPIError
+        self.client = PodmanAPIClient(socket_path)
+        self.api_errors = (OSError, PodmanAPIError)
+        self.fallback = CliBackend(compose_dir, project)
+
+    def _project_filters(self, service_name: Optional[str] = None) -> dict:
+        labels = [f"{PROJECT_LABEL}={self.project}"]
+        if service_name:
+            labels.append(f"{SERVICE_LABEL}={service_name}")
+        return {"label": labels}
+
+    @staticmethod
+    def normalize_container(container: dict) -> dict:
+        """libpod の一覧形式を compose ps の JSON と同じキーに揃える"""
+        labels = container.get("Labels") or {}
+        names = container.get("Names") or []
+        return {
+            "ID": container.get("Id", ""),
+            "Name": names[0] if names else "",
+            "Image": container.get("Image", ""),
+            "Project": labels.get(PROJECT_LABEL, ""),
+            "Service": labels.get(SERVICE_LABEL, ""),
+            "State": container.get("State", ""),
+            "Status": container.get("Status", ""),
+            "ExitCode": container.get("ExitCode", 0),
+            "Created": container.get("Created", ""),
+            "Labels": labels,
+        }
+
+    def list_services(self) -> Dict[str, dict]:
+        try:
+            containers = self.client.list_containers(self._project_filters())
+        except self.api_errors as e:
+            print(f"警告: Podman API に接続できないため CLI で取得します - {e}")
+            return self.fallback.list_services()
+        services = {}
+        for container in containers:
+            container_data = self.normalize_container(container)
+            if container_data["Service"]:
+                services[container_data["Service"]] = container_data
+        return services
+
+    def _container_names(self, service_name: str) -> list:
+        containers = self.client.list_containers(self._project_filters(service_name))
+        return [self.normalize_container(c)["Name"] for c in containers]
+
+    def start_service(self, service_name: str) -> None:
+        try:
+            names = self._container_names(service_name)
+            for name in names:
+                self.client.start_container(name)
+        except self.api_errors as e:
+            print(f"警告: Podman API で起動できないため CLI で起動します - {e}")
+            names = []
+        if not names:
+            # まだコンテナが作成されていない場合は compose で作成する
+            self.fallback.start_service(service_name)
+
+    def stop_service(self, service_name: str) -> None:
+        try:
+            for name in self._container_names(service_name):
+                self.client.stop_container(name)
+        except self.api_errors as e:
+            print(f"警告: Podman API で停止できないため CLI で停止します - {e}")
+            self.fallback.stop_service(service_name)
+
+    def down_project(self) -> None:
+        # ネットワークなどの後始末は compose に任せる
+        self.fallback.down_project()
+
+    def inspect_service(self, service_name: str) -> Optional[dict]:
+        try:
+            names = self._container_names(service_name)
+        except self.api_errors as e:
+            print(f"警告: Podman API に接続できないため CLI で取得します - {e}")
+            return self.fallback.inspect_service(service_name)
+        if not names:
+            return None
+        return self.inspect_container(names[0])
+
+    def inspect_container(self, container_id: str) -> Optional[dict]:
+        try:
+            return self.client.inspect_container(container_id)
+        except self.api_errors as e:
+            print(f"警告: Podman API に接続できないため CLI で取得します - {e}")
+            return self.fallback.inspect_container(container_id)
+
+    def open_log_stream(self, service_name: str, follow: bool, tail: Optional[int] = None,
+                        since: Optional[str] = None):
+        try:
+            names = self._container_names(service_name)
+            if names:
+                return self.client.logs(names[0], follow=follow, tail=tail, since=since)
+        except self.api_errors as e:
+            print(f"警告: Podman API でログを取得できないため CLI を使います - {e}")
+        return self.fallback.open_log_stream(service_name, follow, tail, since)
+
+    def open_stats_stream(self, container_names: list):
+        try:
+            return self.client.stats(container_names)
+        except self.api_errors as e:
+            print(f"警告: Podman API で統計を取得できないため CLI を使います - {e}")
+            return self.fallback.open_stats_stream(container_names)
+
+    def open_event_stream(self):
+        try:
+            return self.client.events({"type": ["container"], **self._project_filters()})
+        except self.api_errors as e:
+            print(f"警告: Podman API でイベントを購読できないため CLI を使います - {e}")
+            return self.fallback.open_event_stream()
+
+
+_backends: Dict[str, object] = {}
+_backends_lock = threading.Lock()
+
+
+def get_backend(compose_dir: str):
+    """設定に応じたバックエンドを返す (compose ディレクトリごとに共有する)"""
+    with _backends_lock:
+        backend = _backends.get(compose_dir)
+        if backend is None:
+            project = project_name_for(compose_dir)
+            if container_backend == "api" and os.path.exists(podman_socket):
+                backend = ApiBackend(compose_dir, project, podman_socket)
+            else:
+                if container_backend == "api":
+                    print(f"警告: Podman のソケットが見つかりません ({podman_socket})。CLI を使います")
+                backend = CliBackend(compose_dir, project)
+            _backends[compose_dir] = backend
+        return backend
@@ -0,0 +1,131 @@
+"""ベンチマーク用の podman の代わり。bench/run.py が PATH の先頭に置くシムから実行される。
+
+環境変数で振る舞いを変える:
+    FAKE_PODMAN_STATE         状態 (起動中のサービス) と呼び出し記録を置くディレクトリ (必須)
+    FAKE_PODMAN_SERVICES      サービス数 (svc000, svc001, ...)
+    FAKE_PODMAN_LATENCY       1回の呼び出しにかかる秒数
+    FAKE_PODMAN_FAILURE_RATE  操作・状態取得が失敗する確率 (0〜1)
+    FAKE_PODMAN_LOG_LINES     compose logs が出力する行数
+    FAKE_PODMAN_LINE_BYTES    ログ1行のおおよそのバイト数
+"""
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+STATE_DIR = os.environ["FAKE_PODMAN_STATE"]
+SERVICE_COUNT = int(os.getenv("FAKE_PODMAN_SERVICES", "3"))
+LATENCY = float(os.getenv("FAKE_PODMAN_LATENCY", "0"))
+FAILURE_RATE = float(os.getenv("FAKE_PODMAN_FAILURE_RATE", "0"))
+LOG_LINES = int(os.getenv("FAKE_PODMAN_LOG_LINES", "1000"))
+LINE_BYTES = int(os.getenv("FAKE_PODMAN_LINE_BYTES", "120"))
+
+PROJECT = os.path.basename(os.getcwd())
+
+
+def service_names() -> list:
+    return [f"svc{i:03d}" for i in range(SERVICE_COUNT)]
+
+
+def state_path(service_name: str) -> str:
+    return os.path.join(STATE_DIR, f"running.{service_name}")
+
+
+def is_running(service_name: str) -> bool:
+    return os.path.exists(state_path(service_name))
+
+
+def set_running(service_name: str, running: bool) -> None:
+    if running:
+        open(state_path(service_name), "w").close()
+    elif is_running(service_name):
+        os.remove(state_path(service_name))
+
+
+def maybe_fail() -> None:
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        print("Error: injected failure", file=sys.stderr)
+        sys.exit(125)
+
+
+def compose_ps() -> None:
+    maybe_fail()
+    for index, name in enumerate(service_names()):
+        if not is_running(name):
+            continue
+        print(json.dumps({
+            "ID": f"{index:012x}",
+            "Name": f"{PROJECT}_{name}_1",
+            "Image": f"registry.example.com/{name}:latest",
+            "Project": PROJECT,
+            "Service": name,
+            "State": "running",
+            "Status": "Up 5 minutes",
+            "Health": "",
+            "ExitCode": 0,
+            "Labels": {
+                "com.docker.compose.project": PROJECT,
+                "com.docker.compose.service": name,
+            },
+        }))
+
+
+def compose_logs(args: list) -> None:
+    follow = "--follow" in args or "-f" in args
+    tail = LOG_LINES
+    if "--tail" in args:
+        tail = min(LOG_LINES, int(args[args.index("--tail") + 1]))
+    service_name = args[-1]
+    start = datetime.now(timezone.utc) - timedelta(seconds=LOG_LINES)
+    padding = "x" * max(0, LINE_BYTES - 60)
+
+    def line(index: int) -> str:
+        timestamp = (start + timedelta(seconds=index)).isoformat().replace("+00:00", "Z")
+        return f"{service_name}  | {timestamp} INFO request {index} {padding}\n"
+
+    # 過去分は末尾 tail 行、追従中は残りを新しい出力としてまとめて流す
+    out = sys.stdout
+    out.writelines(line(i) for i in range(LOG_LINES - tail, LOG_LINES))
+    if follow:
+        out.writelines(line(i) for i in range(LOG_LINES, LOG_LINES + LOG_LINES - tail))
+        out.flush()
+        while True:
+            time.sleep(3600)
+
+
+def main(args: list) -> None:
+    with open(os.path.join(STATE_DIR, "calls.log"), "a") as f:
+        f.write(" ".join(args) + "\n")
+    if LATENCY:
+        time.sleep(LATENCY)
+
+    if args[:1] == ["compose"]:
+        command, rest = args[1], args[2:]
+        if command == "ps":
+            compose_ps()
+        elif command == "up":
+            maybe_fail()
+            for name in [a for a in rest if not a.startswith("-")] or service_names():
+                set_running(name, True)
+        elif command == "stop":
+            maybe_fail()
+            for name in [a for a in rest if not a.startswith("-")] or service_names():
+                set_running(name, False)
+        elif command == "down":
+            maybe_fail()
+            for name in service_names():
+                set_running(name, False)
+        elif command == "logs":
+            compose_logs(rest)
+    elif args[:1] in (["events"], ["stats"]):
+        # 常駐系のコマンドは何も出さずに終了を待たせる
+        while True:
+            time.sleep(3600)
+    elif args[:1] == ["inspect"]:
+        print(json.dumps([{"Id": args[1], "State": {"Status": "running"}}]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
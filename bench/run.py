@@ -0,0 +1,348 @@
+"""偽の podman を PATH に置いて、状態取得・操作・ログ表示の性能を測る。
+
+    python3 bench/run.py [--services 20] [--latency 0.05] [--log-lines 20000] [--failure-rate 0]
+
+結果はリポジトリ直下の bench_output.txt (--output で変更) に JSON で書き出す。
+GTK を使う計測 (ログの取り込み・メインループの停止時間) は表示が必要なので、
+DISPLAY がなければ xvfb-run の下で自分自身を起動し直す。GTK が使えない環境では省略する。
+"""
+import argparse
+import contextlib
+import json
+import os
+import resource
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH_DIR)
+
+# この時間以上メインループが遅れたら停止とみなす (ミリ秒)
+STALL_THRESHOLD_MS = 50
+# 停止を測るためのタイマーの間隔 (ミリ秒)
+PROBE_INTERVAL_MS = 10
+
+
+def prepare_environment(args: argparse.Namespace) -> dict:
+    """偽の podman と compose ファイルを一時ディレクトリに作り、環境変数を設定する"""
+    workdir = tempfile.mkdtemp(prefix="manager-bench-")
+    bin_dir = os.path.join(workdir, "bin")
+    state_dir = os.path.join(workdir, "state")
+    compose_dir = os.path.join(workdir, "bench")
+    for path in (bin_dir, state_dir, compose_dir):
+        os.makedirs(path)
+
+    shim = os.path.join(bin_dir, "podman")
+    with open(shim, "w") as f:
+        f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(BENCH_DIR, "fake_podman.py")}" "$@"\n')
+    os.chmod(shim, 0o755)
+
+    with open(os.path.join(compose_dir, "compose.yaml"), "w") as f:
+        f.write("services:\n")
+        for i in range(args.services):
+            f.write(f"  svc{i:03d}:\n    image: registry.example.com/svc{i:03d}:latest\n")
+
+    os.environ.update({
+        "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+        "FAKE_PODMAN_STATE": state_dir,
+        "FAKE_PODMAN_SERVICES": str(args.services),
+        "FAKE_PODMAN_LATENCY": str(args.latency),
+        "FAKE_PODMAN_FAILURE_RATE": str(args.failure_rate),
+        "FAKE_PODMAN_LOG_LINES": str(args.log_lines),
+        "COMPOSE_DIR": compose_dir,
+        "COMPOSE_DIRS": compose_dir,
+        "CONTAINER_BACKEND": "cli",
+        "LOG_ARCHIVE_DIR": os.path.join(workdir, "logs"),
+    })
+    os.environ.pop("COMPOSE_PROJECT_NAME", None)
+    return {"workdir": workdir, "compose_dir": compose_dir, "calls_log": os.path.join(state_dir, "calls.log")}
+
+
+class CallLog:
+    """偽の podman が記録した呼び出しを数える"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def read(self) -> list:
+        try:
+            with open(self.path) as f:
+                return f.read().splitlines()
+        except FileNotFoundError:
+            return []
+
+    def reset(self) -> None:
+        open(self.path, "w").close()
+
+
+def summarize(values: list) -> dict:
+    """秒の一覧をミリ秒の要約にする"""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    return {
+        "count": len(values),
+        "mean_ms": round(statistics.mean(values) * 1000, 2),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def peak_rss_kb() -> int:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_headless(env: dict, args: argparse.Namespace) -> dict:
+    """GTK を使わずに状態取得の待ち時間と、操作ごとに起動したコマンド数を測る"""
+    import dispatch
+    from cli import EventLoop, refresh
+    from project_model import ProjectModel
+
+    loop = EventLoop()
+    dispatch.set_dispatcher(loop.dispatch)
+    model = ProjectModel(env["compose_dir"])
+    calls = CallLog(env["calls_log"])
+
+    def settle(timeout: float = 60.0) -> bool:
+        return loop.run_until(
+            lambda: model.scheduler.get_counts() == (0, 0) and not model.is_refreshing() and loop.queue.empty(),
+            timeout,
+        )
+
+    results = {}
+
+    # 1回ずつの状態取得
+    latencies = []
+    failures = 0
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        if not refresh(loop, model, 60.0):
+            failures += 1
+        latencies.append(time.perf_counter() - started)
+    results["refresh_latency"] = dict(summarize(latencies), failures=failures)
+
+    # 同時に来た要求が1回の取得にまとまるか
+    calls.reset()
+    waiters = []
+    started = time.perf_counter()
+    for _ in range(10):
+        model.update_container_status(waiters.append)
+    loop.run_until(lambda: len(waiters) == 10, 60.0)
+    results["refresh_burst"] = {
+        "requests": 10,
+        "commands": len(calls.read()),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+    # 操作ごとのコマンド数と完了 (状態の再取得を含む) までの時間
+    first = "svc000"
+    actions = [
+        ("refresh", lambda: model.update_container_status()),
+        ("start_service", lambda: model.start_container(first)),
+        ("stop_service", lambda: model.stop_container(first)),
+        ("start_service_toggle_x3", lambda: [model.start_container(first), model.stop_container(first),
+                                             model.start_container(first)]),
+        ("start_all", model.start_all_containers),
+        ("stop_all", model.stop_all_containers),
+    ]
+    commands = {}
+    for name, action in actions:
+        calls.reset()
+        started = time.perf_counter()
+        action()
+        settled = settle()
+        recorded = calls.read()
+        commands[name] = {
+            "commands": len(recorded),
+            "by_subcommand": count_subcommands(recorded),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+            "settled": settled,
+        }
+    results["commands_per_action"] = commands
+    results["peak_rss_kb"] = peak_rss_kb()
+    dispatch.set_dispatcher(None)
+    return results
+
+
+def count_subcommands(lines: list) -> dict:
+    counts: dict = {}
+    for line in lines:
+        words = line.split()
+        key = " ".join(words[:2]) if words[:1] == ["compose"] else (words[0] if words else "")
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+class StallProbe:
+    """一定間隔のタイマーの遅れからメインループが止まっていた時間を測る"""
+
+    def __init__(self, GLib) -> None:
+        self.GLib = GLib
+        self.delays: list = []
+        self.expected = time.perf_counter() + PROBE_INTERVAL_MS / 1000
+        self.source_id = GLib.timeout_add(PROBE_INTERVAL_MS, self.tick)
+
+    def tick(self) -> bool:
+        now = time.perf_counter()
+        self.delays.append(max(0.0, now - self.expected))
+        self.expected = now + PROBE_INTERVAL_MS / 1000
+        return True
+
+    def stop(self) -> dict:
+        self.GLib.source_remove(self.source_id)
+        stalls = [delay for delay in self.delays if delay * 1000 >= STALL_THRESHOLD_MS]
+        return {
+            "samples": len(self.delays),
+            "max_delay_ms": round(max(self.delays, default=0.0) * 1000, 2),
+            "stalls": len(stalls),
+            "stalled_ms": round(sum(stalls) * 1000, 2),
+        }
+
+
+def run_main_loop(Gtk, GLib, predicate, timeout: float) -> float:
+    """predicate が真になるまでメインループを回し、かかった秒数を返す (タイムアウトは -1)"""
+    main_loop = GLib.MainLoop()
+    started = time.perf_counter()
+    result = {"elapsed": -1.0}
+
+    def check() -> bool:
+        if predicate():
+            result["elapsed"] = time.perf_counter() - started
+            main_loop.quit()
+            return False
+        if time.perf_counter() - started > timeout:
+            main_loop.quit()
+            return False
+        return True
+
+    GLib.timeout_add(5, check)
+    main_loop.run()
+    return result["elapsed"]
+
+
+def bench_gtk(env: dict, args: argparse.Namespace) -> dict:
+    """ウィンドウの表示とログの取り込みをメインループで実行し、停止時間と合わせて測る"""
+    try:
+        import gi
+        gi.require_version("Gtk", "3.0")
+        from gi.repository import Gtk, GLib
+    except (ImportError, ValueError) as e:
+        return {"skipped": f"GTK を読み込めません - {e}"}
+    if not Gtk.init_check(sys.argv)[0]:
+        return {"skipped": "ディスプレイに接続できません"}
+
+    import dispatch
+    dispatch.set_dispatcher(GLib.idle_add)
+    from project_view import ProjectView
+    from log_viewer import ContainerLogViewer
+
+    results = {}
+
+    # 全サービスのカードが作られ、状態が反映されるまで
+    with open(os.path.join(os.environ["FAKE_PODMAN_STATE"], "running.svc000"), "w"):
+        pass
+    probe = StallProbe(GLib)
+    started = time.perf_counter()
+    window = Gtk.Window()
+    view = ProjectView(env["compose_dir"], status_callback=None)
+    window.add(view)
+    window.show_all()
+    manager = view.container_manager
+    elapsed = run_main_loop(
+        Gtk, GLib,
+        lambda: manager.last_updated is not None and len(manager.container_cards) == args.services,
+        60.0,
+    )
+    results["window_refresh"] = {
+        "elapsed_ms": round(elapsed * 1000, 2) if elapsed >= 0 else None,
+        "main_loop": probe.stop(),
+        "since_construct_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+    # ログの取り込み (最後の行がアーカイブに記録され、表示されるまで)
+    last_line = f"request {args.log_lines - 1} "
+    probe = StallProbe(GLib)
+    viewer = ContainerLogViewer("svc000", env["compose_dir"])
+    viewer.show_all()
+
+    def ingested() -> bool:
+        buffer = viewer.log_buffer
+        return last_line in buffer.get_text(buffer.get_start_iter(), buffer.get_end_iter(), False)
+
+    elapsed = run_main_loop(Gtk, GLib, ingested, 120.0)
+    results["log_ingest"] = {
+        "lines": args.log_lines,
+        "elapsed_ms": round(elapsed * 1000, 2) if elapsed >= 0 else None,
+        "lines_per_sec": round(args.log_lines / elapsed) if elapsed > 0 else None,
+        "buffer_lines": viewer.log_buffer.get_line_count(),
+        "archive_bytes": viewer.channel.disk_bytes(),
+        "main_loop": probe.stop(),
+    }
+    viewer.destroy()
+    window.destroy()
+    view.shutdown()
+    results["peak_rss_kb"] = peak_rss_kb()
+    return results
+
+
+def relaunch_under_xvfb() -> None:
+    """表示がなければ xvfb-run の下で起動し直す (戻らない)"""
+    if os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY") or os.environ.get("BENCH_UNDER_XVFB"):
+        return
+    xvfb_run = shutil.which("xvfb-run")
+    if xvfb_run is None:
+        return
+    os.environ["BENCH_UNDER_XVFB"] = "1"
+    os.execv(xvfb_run, [xvfb_run, "-a", sys.executable] + sys.argv)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="偽の podman を使ったベンチマーク")
+    parser.add_argument("--services", type=int, default=20, help="サービス数")
+    parser.add_argument("--latency", type=float, default=0.05, help="podman 1回あたりの遅延 (秒)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="podman が失敗する確率")
+    parser.add_argument("--log-lines", type=int, default=20000, help="ログの行数")
+    parser.add_argument("--iterations", type=int, default=20, help="状態取得を繰り返す回数")
+    parser.add_argument("--no-gtk", action="store_true", help="GTK を使う計測を省略する")
+    parser.add_argument("--output", default=os.path.join(ROOT, "bench_output.txt"), help="結果の出力先")
+    return parser
+
+
+def main() -> None:
+    args = build_parser().parse_args()
+    if not args.no_gtk:
+        relaunch_under_xvfb()
+
+    env = prepare_environment(args)
+    sys.path.insert(0, ROOT)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parameters": {key: value for key, value in vars(args).items() if key != "output"},
+    }
+    try:
+        # 各モジュールの print (podman の出力など) は結果に混ぜない
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            report["headless"] = bench_headless(env, args)
+            report["gtk"] = {"skipped": "--no-gtk"} if args.no_gtk else bench_gtk(env, args)
+    finally:
+        shutil.rmtree(env["workdir"], ignore_errors=True)
+    report["peak_rss_kb"] = peak_rss_kb()
+    # コマンドランナーが記録したサブコマンド・サービスごとの所要時間
+    from diagnostics import timings
+    report["timings"] = timings.snapshot()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(text + "\n")
+    print(text)
+    print(f"結果を {args.output} に書き出しました")
+
+
+if __name__ == "__main__":
+    main()
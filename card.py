@@ -1,6 +1,6 @@
 from gi.repository import Gtk, GLib
-import webbrowser
-from log_viewer import ContainerLogViewer
+from typing import Optional
+from metrics import format_bytes
 
 
 class ContainerCard:
@@ -11,6 +11,10 @@ class ContainerCard:
         self.start_callback = start_callback
         self.stop_callback = stop_callback
         self.container_data = container
+        # 観測した状態 (podman から取得) と、ユーザーが操作で指定した希望状態
+        # 状態を取得するまでは None (不明) とし、スイッチを操作できないようにする
+        self.observed_state: Optional[str] = container.get("state")
+        self.desired_state: Optional[bool] = None
 
         # メインUI構築
         self.widget = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
@@ -24,10 +28,37 @@ class ContainerCard:
         info_box.pack_start(self.title_label, False, False, 0)
         info_box.pack_start(self.description_label, False, False, 0)
 
+        # 依存関係に沿った起動・停止の進行状況 (実行中だけ表示する)
+        self.progress_label = Gtk.Label(label="")
+        self.progress_label.set_xalign(0)
+        self.progress_label.set_no_show_all(True)
+        info_box.pack_start(self.progress_label, False, False, 0)
+
+        # リンクの応答確認の結果 (確認対象があり、結果が出ているときだけ表示する)
+        self.readiness_label = Gtk.Label(label="")
+        self.readiness_label.set_xalign(0)
+        self.readiness_label.set_no_show_all(True)
+        info_box.pack_start(self.readiness_label, False, False, 0)
+
+        # リソース使用量 (サンプルが届いたときだけ再描画する)
+        self.metrics = None
+        metrics_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        self.metrics_label = Gtk.Label(label="")
+        self.metrics_label.set_xalign(0)
+        self.cpu_sparkline = self.create_sparkline("cpu")
+        self.memory_sparkline = self.create_sparkline("memory")
+        metrics_box.pack_start(self.cpu_sparkline, False, False, 0)
+        metrics_box.pack_start(self.memory_sparkline, False, False, 0)
+        metrics_box.pack_start(self.metrics_label, False, False, 0)
+        info_box.pack_start(metrics_box, False, False, 0)
+
         # 中央: スイッチ
         self.switch = Gtk.Switch()
-        self.switch.set_active(container.get("state", "stopped") == "running")
-        self.switch.connect("state-set", self.on_switch_toggled)
+        self.switch.set_active(self.observed_state == "running")
+        if self.observed_state is None:
+            self.switch.set_sensitive(False)
+            self.switch.set_tooltip_text("状態を取得中...")
+        self.switch_handler_id = self.switch.connect("state-set", self.on_switch_toggled)
         self.switch.set_halign(Gtk.Align.CENTER)
         self.switch.set_valign(Gtk.Align.CENTER)
 
@@ -70,83 +101,146 @@ class ContainerCard:
         return self.widget
 
     def update_container_data(self, container_data: dict) -> None:
-        """状態を更新する (RAWデータも更新)"""
+        """観測した状態を更新する (RAWデータも更新)。コマンドは発行しない"""
         self.container_data = container_data
-        self.switch.set_active(container_data.get("State", "stopped") == "running")
+        observed_state = container_data.get("State", "stopped")
+        if observed_state == self.observed_state:
+            return
+        if self.observed_state is None:
+            self.switch.set_sensitive(True)
+            self.switch.set_tooltip_text(None)
+        self.observed_state = observed_state
+        if self.desired_state is not None and self.desired_state == self.is_running():
+            # 希望した状態に到達した
+            self.desired_state = None
+        self.sync_switch()
+
+    def set_progress(self, text: str) -> None:
+        """進行状況を表示する (空文字なら隠す)"""
+        self.progress_label.set_text(text)
+        self.progress_label.set_visible(bool(text))
+
+    def set_readiness(self, summary: Optional[dict]) -> None:
+        """EndpointProber.summary() の結果を表示する (None や未確認なら隠す)"""
+        if summary is None or summary["state"] == "unknown":
+            self.readiness_label.set_visible(False)
+            return
+        if summary["state"] == "ready":
+            text = "🟢 応答あり"
+            if summary["p50_ms"] is not None:
+                text += f" p50 {summary['p50_ms']:.0f}ms / p95 {summary['p95_ms']:.0f}ms"
+        elif summary["state"] == "partial":
+            text = "🟡 一部応答なし"
+        else:
+            text = "🔴 応答なし"
+        self.readiness_label.set_text(text)
+        self.readiness_label.set_tooltip_text("\n".join(
+            f"{'✓' if ok else '✗'} {name}: {detail}" for name, ok, detail in summary["endpoints"] if ok is not None
+        ))
+        self.readiness_label.set_visible(True)
+
+    def clear_desired_state(self) -> None:
+        """希望状態を解除し、観測した状態を表示する"""
+        self.desired_state = None
+        self.sync_switch()
+
+    def sync_switch(self) -> None:
+        """スイッチを表示すべき状態に合わせる。ハンドラを止めて操作と区別する"""
+        active = self.desired_state if self.desired_state is not None else self.is_running()
+        if self.switch.get_active() == active:
+            return
+        self.switch.handler_block(self.switch_handler_id)
+        try:
+            self.switch.set_active(active)
+        finally:
+            self.switch.handler_unblock(self.switch_handler_id)
+
+    def create_sparkline(self, series: str) -> Gtk.DrawingArea:
+        area = Gtk.DrawingArea()
+        area.set_size_request(80, 18)
+        area.set_tooltip_text("CPU" if series == "cpu" else "メモリ")
+        area.connect("draw", self.on_draw_sparkline, series)
+        return area
+
+    def set_metrics(self, metrics) -> None:
+        self.metrics = metrics
+        self.update_metrics()
+
+    def update_metrics(self) -> None:
+        """新しいサンプルが届いたときに呼ばれ、数値とグラフを更新する"""
+        if self.metrics is None:
+            return
+        cpu = self.metrics.latest("cpu")
+        memory = self.metrics.latest("memory")
+        self.metrics_label.set_text(f"CPU {cpu:.1f}% / MEM {format_bytes(memory)}")
+        self.cpu_sparkline.queue_draw()
+        self.memory_sparkline.queue_draw()
+
+    def on_draw_sparkline(self, area: Gtk.DrawingArea, cr, series: str) -> bool:
+        if self.metrics is None:
+            return False
+        width = area.get_allocated_width()
+        height = area.get_allocated_height()
+        # 1点あたり2px として、表示できる分だけ取り出す
+        values = self.metrics.values(series, max(2, width // 2))
+        if len(values) < 2:
+            return False
+
+        if series == "memory" and self.metrics.memory_limit > 0:
+            peak = self.metrics.memory_limit
+        elif series == "cpu":
+            peak = max(100.0, max(values))
+        else:
+            peak = max(values) or 1.0
+
+        cr.set_source_rgba(0.5, 0.5, 0.5, 0.15)
+        cr.rectangle(0, 0, width, height)
+        cr.fill()
+
+        color = (0.2, 0.6, 0.3) if series == "cpu" else (0.2, 0.4, 0.8)
+        cr.set_source_rgb(*color)
+        cr.set_line_width(1.0)
+        step = width / (len(values) - 1)
+        for i, value in enumerate(values):
+            x = i * step
+            y = height - 1 - (min(value, peak) / peak) * (height - 2)
+            if i == 0:
+                cr.move_to(x, y)
+            else:
+                cr.line_to(x, y)
+        cr.stroke()
+        return False
 
-    def on_switch_toggled(self, switch: Gtk.Switch, state: bool) -> None:
+    def on_switch_toggled(self, switch: Gtk.Switch, state: bool) -> bool:
+        """ユーザーによる操作のみがここに来る"""
+        self.desired_state = state
         if state:
             self.start_callback(self.service_name)
         else:
             self.stop_callback(self.service_name)
+        return False
 
     def show_details(self, menu_item: Gtk.MenuItem) -> None:
         """詳細情報ウィンドウを開く"""
-        details_window = Gtk.Window(title=f"詳細情報 - {self.container_name}")  # container_name を利用
-        details_window.set_default_size(600, 400)
-
-        # スクロール可能なエリア
-        scroll = Gtk.ScrolledWindow()
-        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
-        scroll.set_margin_top(5)
-        scroll.set_margin_bottom(5)
-        scroll.set_margin_start(5)
-        scroll.set_margin_end(5)
-
-        # 詳細情報レイアウト
-        layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-
-        # 再帰的に階層構造を作る関数
-        def create_hierarchical_view(parent_layout, data, indent=0):
-            if isinstance(data, dict):
-                for key, value in data.items():
-                    key_label = Gtk.Label()
-                    key_label.set_markup(f'<b>{" " * indent}{key}:</b>')
-                    key_label.set_xalign(0)
-                    parent_layout.pack_start(key_label, False, False, 0)
-                    create_hierarchical_view(parent_layout, value, indent + 4)
-            elif isinstance(data, list):
-                for i, item in enumerate(data):
-                    item_label = Gtk.Label()
-                    item_label.set_markup(f'<b>{" " * indent}- [{i}]</b>')
-                    item_label.set_xalign(0)
-                    parent_layout.pack_start(item_label, False, False, 0)
-                    create_hierarchical_view(parent_layout, item, indent + 4)
-            else:
-                value_label = Gtk.Label(label=" " * indent + str(data))
-                value_label.set_xalign(0)
-                parent_layout.pack_start(value_label, False, False, 0)
-
-        # 階層構造を生成
-        create_hierarchical_view(layout, self.container_data)
-
-        # スクロールエリアにレイアウトをセット
-        scroll.add(layout)
-
-        # 閉じるボタン
-        close_button = Gtk.Button(label="閉じる")
-        close_button.set_margin_top(10)
-        close_button.set_margin_bottom(10)
-        close_button.set_margin_start(10)
-        close_button.set_margin_end(10)
-        close_button.connect("clicked", lambda _: details_window.close())
-
-        # メインボックスに追加
-        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
-        main_box.pack_start(scroll, True, True, 0)
-        main_box.pack_start(close_button, False, False, 0)
-
-        details_window.add(main_box)
-        details_window.show_all()
+        # 起動を速くするため、ウィンドウのモジュールは初めて開くときに読み込む
+        from details import DetailsWindow
+        DetailsWindow(
+            f"詳細情報 - {self.container_name}",  # container_name を利用
+            self.service_name,
+            self.container_data,
+            self.compose_dir,
+        ).show_all()
 
     def show_logs(self, menu_item: Gtk.MenuItem) -> None:
         """ログビューアを開く"""
+        from log_viewer import ContainerLogViewer
         ContainerLogViewer(self.service_name, self.compose_dir).show_all()
 
     def open_link(self, menu_item: Gtk.MenuItem, url: str) -> None:
         """リンクを開く"""
+        import webbrowser
         webbrowser.open(url)
 
     def is_running(self) -> bool:
-        """現在のスイッチの状態が「起動中」かを確認"""
-        return self.switch.get_active()
+        """観測した状態が「起動中」かを確認"""
+        return self.observed_state == "running"
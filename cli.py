@@ -0,0 +1,292 @@
+"""GTK を読み込まずにコンテナを操作するヘッドレス版のエントリーポイント。
+
+    python3 cli.py status
+    python3 cli.py start [SERVICE ...] [--wait]
+    python3 cli.py stop [SERVICE ...] [--wait]
+    python3 cli.py wait SERVICE ... [--state running|healthy|exited|stopped]
+    python3 cli.py watch
+    python3 cli.py logs SERVICE ... [--tail N] [--follow]
+
+結果は標準出力に JSON で出力する (watch は変化ごとに1行、logs はログ1行ごとに1行)。進捗とエラーは標準エラーに出る。
+"""
+import argparse
+import json
+import queue
+import sys
+import time
+from collections import deque
+from typing import Callable, Optional
+import dispatch
+from project_model import ProjectModel
+from events import PodmanEventSubscriber
+from log_hub import get_hub
+from orchestrator import container_health
+from config import compose_dir as default_compose_dir
+
+# 正常終了 / 操作の失敗・タイムアウト / 引数の誤り
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+# wait で状態を取り直す間隔 (秒)
+WAIT_POLL_INTERVAL = 1.0
+
+# logs (--follow なし) で、新しい行がこの時間届かなければ取り込み終えたとみなす (秒)
+LOGS_IDLE_TIMEOUT = 0.5
+
+
+class EventLoop:
+    """GLib のメインループの代わり。dispatch された通知をメインスレッドで順に実行する"""
+
+    def __init__(self) -> None:
+        self.queue: "queue.Queue[tuple]" = queue.Queue()
+        self.timers: list = []
+
+    def dispatch(self, callback: Callable, *args) -> None:
+        self.queue.put((callback, args))
+
+    def add_timer(self, interval: float, callback: Callable[[], None]) -> None:
+        """interval 秒ごとに callback を呼ぶ (run_until の実行中のみ)"""
+        self.timers.append([time.monotonic() + interval, interval, callback])
+
+    def run_until(self, predicate: Callable[[], bool], timeout: Optional[float] = None) -> bool:
+        """predicate が真になるまで通知を処理する。タイムアウトしたら False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not predicate():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return False
+            for timer in self.timers:
+                if now >= timer[0]:
+                    timer[0] = now + timer[1]
+                    timer[2]()
+            wait = min([timer[0] for timer in self.timers] + ([deadline] if deadline else []), default=now + 0.5)
+            try:
+                callback, args = self.queue.get(timeout=max(0.0, min(wait - now, 0.5)))
+            except queue.Empty:
+                continue
+            callback(*args)
+        return True
+
+
+class HeadlessProject(ProjectModel):
+    """状態の変化を JSON の行として出力できる ProjectModel"""
+
+    def __init__(self, compose_dir: str, output) -> None:
+        super().__init__(compose_dir, status_callback=lambda message: print(message, file=sys.stderr))
+        self.output = output
+        self.watching = False
+
+    def on_service_updated(self, service_name: str, container_data: dict, changed: bool) -> None:
+        if self.watching and changed:
+            emit(self.output, dict(service_entry(service_name, container_data), time=time.time()))
+
+    def service_state(self, service_name: str) -> Optional[dict]:
+        return self.container_states.get(service_name)
+
+
+def service_entry(service_name: str, container_data: dict) -> dict:
+    return {
+        "service": service_name,
+        "state": container_data.get("State"),
+        "health": container_health(container_data) or None,
+        "exit_code": container_data.get("ExitCode"),
+        "id": container_data.get("ID"),
+        "name": container_data.get("Name"),
+        "status": container_data.get("Status"),
+    }
+
+
+def project_status(project: HeadlessProject) -> dict:
+    return {
+        "project": project.backend.project,
+        "compose_dir": project.compose_dir,
+        "backend": project.backend.name,
+        "services": [
+            service_entry(service_name, project.container_states.get(service_name, {}))
+            for service_name in project.services
+        ],
+    }
+
+
+def emit(output, data: dict) -> None:
+    output.write(json.dumps(data, ensure_ascii=False) + "\n")
+    output.flush()
+
+
+def matches_state(container_data: Optional[dict], state: str) -> bool:
+    if container_data is None:
+        return False
+    if state == "healthy":
+        # Health がなく Status に "(healthy)" と書くだけの環境もある (起動の準備完了の判定と揃える)
+        return container_health(container_data) == "healthy"
+    return container_data.get("State") == state
+
+
+def refresh(loop: EventLoop, project: HeadlessProject, timeout: float) -> bool:
+    """状態を1回取得する。失敗またはタイムアウトなら False"""
+    results = []
+    project.update_container_status(results.append)
+    return loop.run_until(lambda: bool(results), timeout) and results[0] is not None
+
+
+def wait_for_state(loop: EventLoop, project: HeadlessProject, services: list, state: str,
+                   timeout: float) -> bool:
+    """サービスが指定の状態になるまで状態を取り直しながら待つ"""
+    loop.add_timer(WAIT_POLL_INTERVAL, project.update_container_status)
+    return loop.run_until(
+        lambda: all(matches_state(project.service_state(name), state) for name in services),
+        timeout,
+    )
+
+
+def run_operation(loop: EventLoop, project: HeadlessProject, action: str, services: list,
+                  args: argparse.Namespace) -> int:
+    if services:
+        for service_name in services:
+            getattr(project, f"{action}_container")(service_name)
+    else:
+        getattr(project, f"{action}_all_containers")()
+    loop.run_until(lambda: project.scheduler.get_counts() == (0, 0))
+    ok = all(project.operation_results.values())
+
+    refresh(loop, project, args.timeout)
+    if ok and args.wait:
+        target = "running" if action == "start" else "exited"
+        names = services or list(project.services)
+        if action == "stop" and not services:
+            # down はコンテナを削除するので「存在しない」状態を待つ
+            target = "stopped"
+        ok = wait_for_state(loop, project, names, target, args.timeout)
+    return EXIT_OK if ok else EXIT_FAILED
+
+
+def run_watch(loop: EventLoop, project: HeadlessProject, output) -> int:
+    """状態を一度出力した後、変化したサービスだけを1行ずつ出力し続ける"""
+    emit(output, project_status(project))
+    project.watching = True
+    subscriber = PodmanEventSubscriber(
+        project.backend,
+        state_callback=lambda service, state: loop.dispatch(project.apply_service_state, service, state),
+        poll_callback=lambda: loop.dispatch(project.update_container_status),
+    )
+    subscriber.start()
+    try:
+        loop.run_until(lambda: False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        subscriber.stop()
+    return EXIT_OK
+
+
+def run_logs(project: HeadlessProject, services: list, args: argparse.Namespace, output) -> int:
+    """記録済みの末尾を出力した後、新しく届いた行を出力する (--follow なら出力し続ける)。
+       出力が詰まったらログの取得を待たせ、行を取りこぼさない。
+    """
+    hub = get_hub(project.backend)
+    subscriptions = [hub.subscribe(service_name, "ヘッドレス版", block=True, tail=args.tail)
+                     for service_name in services]
+    try:
+        # 記録済みの行で足りない分は、取得を始めたときに届く過去の行の末尾で補う
+        bursts = {}
+        for subscription in subscriptions:
+            channel = subscription.channel
+            start = max(channel.start_line, subscription.cursor - args.tail)
+            lines = channel.read_lines(start, subscription.cursor - start)
+            for line in lines:
+                emit(output, {"service": channel.service_name, "line": line.rstrip("\n")})
+            bursts[subscription] = deque(maxlen=max(0, args.tail - len(lines)))
+        deadline = time.monotonic() + LOGS_IDLE_TIMEOUT
+        while time.monotonic() < deadline:
+            for subscription in subscriptions:
+                bursts[subscription].extend(subscription.read(timeout=0.1 / len(subscriptions))[1])
+        for subscription in subscriptions:
+            for line in bursts[subscription]:
+                emit(output, {"service": subscription.channel.service_name, "line": line.rstrip("\n")})
+
+        idle_since = time.monotonic()
+        while True:
+            received = False
+            for subscription in subscriptions:
+                _, lines = subscription.read(timeout=0.1 / len(subscriptions))
+                for line in lines:
+                    emit(output, {"service": subscription.channel.service_name, "line": line.rstrip("\n")})
+                received = received or bool(lines)
+            if received:
+                idle_since = time.monotonic()
+            elif not args.follow and (time.monotonic() - idle_since > LOGS_IDLE_TIMEOUT or not any(
+                    subscription.channel.is_streaming() for subscription in subscriptions)):
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for subscription in subscriptions:
+            subscription.close()
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # どのサブコマンドの後ろにも書ける共通オプション
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("-C", "--compose-dir", default=default_compose_dir, help="compose ファイルのあるディレクトリ")
+    common.add_argument("--timeout", type=float, default=120.0, help="待機の上限秒数")
+
+    parser = argparse.ArgumentParser(description="compose プロジェクトのコンテナをヘッドレスで操作する")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", parents=[common], help="サービスごとの状態を出力する")
+    for action in ("start", "stop"):
+        command = commands.add_parser(action, parents=[common],
+                                      help=f"サービスを{'起動' if action == 'start' else '停止'}する (省略時はすべて)")
+        command.add_argument("services", nargs="*")
+        command.add_argument("--wait", action="store_true", help="状態が変わるまで待つ")
+    wait = commands.add_parser("wait", parents=[common], help="サービスが指定の状態になるまで待つ")
+    wait.add_argument("services", nargs="+")
+    wait.add_argument("--state", default="running", help="running / healthy / exited / stopped など")
+    commands.add_parser("watch", parents=[common], help="状態の変化を1行ずつ出力し続ける")
+    logs = commands.add_parser("logs", parents=[common], help="サービスのログを出力する")
+    logs.add_argument("services", nargs="+")
+    logs.add_argument("--tail", type=int, default=100, help="最初に出力する記録済みの行数")
+    logs.add_argument("-f", "--follow", action="store_true", help="新しい行を出力し続ける")
+    return parser
+
+
+def main(argv: Optional[list] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    # 標準出力は JSON 専用にし、各モジュールの print は標準エラーに回す
+    output = sys.stdout
+    sys.stdout = sys.stderr
+
+    loop = EventLoop()
+    dispatch.set_dispatcher(loop.dispatch)
+    project = HeadlessProject(args.compose_dir, output)
+
+    if not refresh(loop, project, args.timeout):
+        print("エラー: 状態を取得できませんでした", file=sys.stderr)
+        return EXIT_FAILED
+
+    services = getattr(args, "services", [])
+    unknown = [name for name in services if name not in project.services]
+    if unknown:
+        print(f"エラー: 不明なサービスです - {', '.join(unknown)}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.command == "status":
+        code = EXIT_OK
+    elif args.command in ("start", "stop"):
+        code = run_operation(loop, project, args.command, services, args)
+    elif args.command == "wait":
+        code = EXIT_OK if wait_for_state(loop, project, services, args.state, args.timeout) else EXIT_FAILED
+    elif args.command == "logs":
+        return run_logs(project, services, args, output)
+    else:
+        return run_watch(loop, project, output)
+
+    emit(output, project_status(project))
+    return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import deque
+from itertools import islice
+from typing import Callable, Optional
+from config import command_log_max_jobs, command_log_max_lines
+
+# ジョブの状態
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+STATUS_LABELS = {RUNNING: "⏳ 実行中", SUCCEEDED: "✅ 成功", FAILED: "❌ 失敗"}
+
+
+class CommandJob:
+    """コマンド (または API 呼び出し) 1回分の記録。出力は直近 max_lines 行だけを残す。
+       append / finish はワーカースレッドから、読み出しはどのスレッドからでもよい。
+    """
+
+    def __init__(self, history: "CommandHistory", job_id: int, project: str, title: str,
+                 command: Optional[list], max_lines: int) -> None:
+        self.history = history
+        self.job_id = job_id
+        self.project = project
+        self.title = title
+        self.command = " ".join(command) if command else ""
+        self.status = RUNNING
+        self.exit_code: Optional[int] = None
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._finished: Optional[float] = None
+        self._lines: deque = deque(maxlen=max_lines)
+        # これまでに追加した行数 (残っている先頭行の番号は total_lines - len(_lines))
+        self.total_lines = 0
+        self._lock = threading.Lock()
+
+    def append(self, text: str) -> None:
+        """出力を1行追加する (execute_command の output として渡す)"""
+        with self._lock:
+            self._lines.append(text)
+            self.total_lines += 1
+        self.history._changed(self)
+
+    def set_exit_code(self, exit_code: Optional[int]) -> None:
+        self.exit_code = exit_code
+
+    def finish(self, ok: bool) -> None:
+        self.status = SUCCEEDED if ok else FAILED
+        self._finished = time.monotonic()
+        self.history._changed(self)
+
+    def duration(self) -> float:
+        """所要時間 (実行中なら経過時間)"""
+        return (self._finished if self._finished is not None else time.monotonic()) - self._started
+
+    def read_from(self, position: int) -> tuple:
+        """position 行目以降の出力を ((実際の開始位置, 行の一覧)) で返す。
+           古い行が捨てられていれば、残っている先頭から返す。
+        """
+        with self._lock:
+            first = self.total_lines - len(self._lines)
+            start = max(position, first)
+            return start, list(islice(self._lines, start - first, None))
+
+
+class CommandHistory:
+    """最近のジョブを max_jobs 件まで残す (プロセス全体で1つ)。
+       ジョブの追加・出力・終了のたびにリスナーを呼ぶ (呼ばれるスレッドは決まっていない)。
+    """
+
+    def __init__(self, max_jobs: int = command_log_max_jobs, max_lines: int = command_log_max_lines) -> None:
+        self.max_lines = max_lines
+        self._jobs: deque = deque(maxlen=max_jobs)
+        self._listeners: list = []
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def begin(self, project: str, title: str, command: Optional[list] = None) -> CommandJob:
+        with self._lock:
+            job = CommandJob(self, self._next_id, project, title, command, self.max_lines)
+            self._next_id += 1
+            self._jobs.append(job)
+        self._changed(job)
+        return job
+
+    def jobs(self) -> list:
+        """残っているジョブ (古い順)"""
+        with self._lock:
+            return list(self._jobs)
+
+    def add_listener(self, listener: Callable[[CommandJob], None]) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[CommandJob], None]) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _changed(self, job: CommandJob) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(job)
+
+
+command_history = CommandHistory()
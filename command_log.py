@@ -1,29 +1,177 @@
 import gi
 gi.require_version("Gtk", "3.0")
+import threading
 from gi.repository import Gtk, GLib
+from command_history import CommandHistory, CommandJob, RUNNING, STATUS_LABELS, command_history
+from config import command_log_flush_rate
 
-class LogWindow(Gtk.Window):
-    def __init__(self, title="ログ"):
-        super().__init__(title=title)
-        self.set_default_size(600, 400)
+# ジョブ一覧の列
+COLUMN_ID, COLUMN_STATUS, COLUMN_PROJECT, COLUMN_TITLE, COLUMN_EXIT_CODE, COLUMN_DURATION = range(6)
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.1f}秒"
+    return f"{int(seconds // 60)}分{int(seconds % 60):02d}秒"
+
+
+class CommandConsole(Gtk.Box):
+    """実行したコマンドの一覧と、選択したジョブの出力を表示する (メインウィンドウの下部に置く)。
+       - 表示中 (map されている間) だけ command_history の変化を受け取り、描画は1秒あたり flush_rate 回まで
+       - 出力は選択中のジョブの分だけをテキストビューに描画する
+    """
+
+    def __init__(self, history: CommandHistory = command_history, flush_rate: float = command_log_flush_rate) -> None:
+        super().__init__(orientation=Gtk.Orientation.HORIZONTAL)
+        self.history = history
+        self.flush_interval_ms = int(1000 / flush_rate)
+        self.set_size_request(-1, 180)
+
+        # ジョブ ID → 一覧の行
+        self.rows: dict = {}
+        self.jobs: dict = {}
+        self.selected_job: CommandJob = None
+        # 選択中のジョブの出力をどこまで描画したか (CommandJob.read_from の位置)
+        self.rendered_to = 0
+
+        # 受け取った変化 (別スレッドから届く) をまとめて描画する
+        self._dirty: set = set()
+        self._dirty_lock = threading.Lock()
+        self._flush_source_id = None
+        self._tick_source_id = None
+
+        self.build_ui()
+        self.connect("map", lambda _: self.attach())
+        self.connect("unmap", lambda _: self.detach())
+        self.connect("destroy", lambda _: self.detach())
+
+    def build_ui(self) -> None:
+        paned = Gtk.Paned(orientation=Gtk.Orientation.HORIZONTAL)
+        self.pack_start(paned, True, True, 0)
+
+        self.store = Gtk.ListStore(int, str, str, str, str, str)
+        self.tree = Gtk.TreeView(model=self.store)
+        for title, column_id in (("状態", COLUMN_STATUS), ("プロジェクト", COLUMN_PROJECT), ("操作", COLUMN_TITLE),
+                                 ("終了コード", COLUMN_EXIT_CODE), ("所要時間", COLUMN_DURATION)):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=column_id)
+            column.set_resizable(True)
+            self.tree.append_column(column)
+        self.tree.get_selection().connect("changed", self.on_selection_changed)
+
+        jobs_scroll = Gtk.ScrolledWindow()
+        jobs_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        jobs_scroll.add(self.tree)
+        paned.pack1(jobs_scroll, False, False)
 
         self.textview = Gtk.TextView()
         self.textview.set_editable(False)
         self.textview.set_cursor_visible(False)
+        self.textview.set_monospace(True)
+        self.buffer = self.textview.get_buffer()
+        self.end_mark = self.buffer.create_mark("end", self.buffer.get_end_iter(), False)
 
-        scrolled_window = Gtk.ScrolledWindow()
-        scrolled_window.set_hexpand(True)
-        scrolled_window.set_vexpand(True)
-        scrolled_window.add(self.textview)
+        output_scroll = Gtk.ScrolledWindow()
+        output_scroll.set_hexpand(True)
+        output_scroll.set_vexpand(True)
+        output_scroll.add(self.textview)
+        paned.pack2(output_scroll, True, False)
 
-        self.add(scrolled_window)
+    def attach(self) -> None:
+        """表示されたら一覧を取り直し、変化の受け取りを始める"""
+        self.history.add_listener(self.on_job_changed)
+        for job in self.history.jobs():
+            self.update_row(job)
+        self.remove_expired_rows()
+        self.render_selected(reset=True)
+        if self._tick_source_id is None:
+            # 実行中のジョブの所要時間を進める
+            self._tick_source_id = GLib.timeout_add_seconds(1, self.on_tick)
 
-        self.buffer = self.textview.get_buffer()
+    def detach(self) -> None:
+        self.history.remove_listener(self.on_job_changed)
+        if self._tick_source_id is not None:
+            GLib.source_remove(self._tick_source_id)
+            self._tick_source_id = None
+
+    def on_job_changed(self, job: CommandJob) -> None:
+        """command_history から呼ばれる (ワーカースレッドのこともある)"""
+        with self._dirty_lock:
+            self._dirty.add(job)
+            if self._flush_source_id is not None:
+                return
+            self._flush_source_id = GLib.timeout_add(self.flush_interval_ms, self.flush)
+
+    def flush(self) -> bool:
+        with self._dirty_lock:
+            dirty = self._dirty
+            self._dirty = set()
+            self._flush_source_id = None
+        new_rows = False
+        for job in sorted(dirty, key=lambda job: job.job_id):
+            new_rows |= job.job_id not in self.rows
+            self.update_row(job)
+        if new_rows:
+            self.remove_expired_rows()
+        if self.selected_job in dirty:
+            self.render_selected()
+        return False
+
+    def on_tick(self) -> bool:
+        for job in self.jobs.values():
+            if job.status == RUNNING:
+                self.update_row(job)
+        return True
+
+    def update_row(self, job: CommandJob) -> None:
+        values = {
+            COLUMN_STATUS: STATUS_LABELS[job.status],
+            COLUMN_EXIT_CODE: "-" if job.exit_code is None else str(job.exit_code),
+            COLUMN_DURATION: format_duration(job.duration()),
+        }
+        row = self.rows.get(job.job_id)
+        if row is None:
+            tree_iter = self.store.append([job.job_id, values[COLUMN_STATUS], job.project, job.title,
+                                           values[COLUMN_EXIT_CODE], values[COLUMN_DURATION]])
+            self.rows[job.job_id] = Gtk.TreeRowReference.new(self.store, self.store.get_path(tree_iter))
+            self.jobs[job.job_id] = job
+            return
+        tree_iter = self.store.get_iter(row.get_path())
+        for column_id, value in values.items():
+            if self.store.get_value(tree_iter, column_id) != value:
+                self.store.set_value(tree_iter, column_id, value)
+
+    def remove_expired_rows(self) -> None:
+        """command_history から外れた古いジョブを一覧から消す"""
+        remaining = {job.job_id for job in self.history.jobs()}
+        for job_id in [job_id for job_id in self.rows if job_id not in remaining]:
+            row = self.rows.pop(job_id)
+            self.jobs.pop(job_id, None)
+            self.store.remove(self.store.get_iter(row.get_path()))
+
+    def on_selection_changed(self, selection: Gtk.TreeSelection) -> None:
+        model, tree_iter = selection.get_selected()
+        self.selected_job = self.jobs.get(model.get_value(tree_iter, COLUMN_ID)) if tree_iter else None
+        self.render_selected(reset=True)
 
-    def append_text(self, text: str):
-        """テキストを追加し、スクロールを下に移動する"""
-        end_iter = self.buffer.get_end_iter()
-        self.buffer.insert(end_iter, text)
-        mark = self.buffer.create_mark(None, self.buffer.get_end_iter(), False)
-        self.textview.scroll_to_mark(mark, 0.0, True, 0.0, 1.0)
+    def render_selected(self, reset: bool = False) -> None:
+        """選択中のジョブの出力を描画する。前回の続きだけを追加し、古い行が捨てられていれば描き直す"""
+        job = self.selected_job
+        if job is None:
+            self.buffer.set_text("")
+            return
+        position = 0 if reset else self.rendered_to
+        start, lines = job.read_from(position)
+        if reset or start > position:
+            header = f"$ {job.command}\n" if job.command else ""
+            if start:
+                header += f"... {start} 行を省略しました ...\n"
+            self.buffer.set_text(header)
+        self.buffer.insert(self.buffer.get_end_iter(), "".join(lines))
+        self.rendered_to = start + len(lines)
 
+        # 実行中のジョブの出力が増え続けても、ジョブが保持する行数までに抑える
+        excess = self.buffer.get_line_count() - self.history.max_lines - 1
+        if excess > 0:
+            self.buffer.delete(self.buffer.get_start_iter(), self.buffer.get_iter_at_line(excess))
+        self.buffer.move_mark(self.end_mark, self.buffer.get_end_iter())
+        self.textview.scroll_to_mark(self.end_mark, 0.0, True, 0.0, 1.0)
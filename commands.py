@@ -0,0 +1,129 @@
+import subprocess
+import threading
+import time
+from typing import Optional, Callable
+from dispatch import dispatch
+from diagnostics import record_command, timings
+
+
+def run_command(command: list, cwd: str = None) -> str:
+    """同期的にコマンドを実行（旧）"""
+    started = time.monotonic()
+    try:
+        result = subprocess.check_output(command, cwd=cwd, text=True)
+        return result
+    except subprocess.CalledProcessError as e:
+        print(f"エラー: コマンド実行に失敗しました - {e}")
+        return ""
+    finally:
+        record_command(command, time.monotonic() - started)
+
+
+def execute_command(command: list, cwd: str = None, start_msg: str = "",
+                    done_msg: str = "", fail_msg: str = "",
+                    status_callback: Optional[Callable[[str], bool]] = None,
+                    done_callback: Optional[Callable[[], bool]] = None,
+                    output: Optional[Callable[[str], None]] = None,
+                    exit_callback: Optional[Callable[[int], None]] = None) -> bool:
+    """コマンドを実行して終了まで待ち、経過を status_callback に通知する。成功なら True。
+       output を渡すとコマンドの出力を1行ずつ渡す (読み取りスレッドから呼ばれる)。
+       exit_callback にはコマンドの終了コードを渡す (起動できなかった場合は呼ばれない)。
+    """
+    def log(text: str) -> None:
+        if output:
+            output(text)
+
+    if status_callback and start_msg:
+        dispatch(status_callback, start_msg)
+        log(f"{start_msg}\n")
+
+    started = time.monotonic()
+    try:
+        # サブプロセスをPopenで起動
+        process = subprocess.Popen(
+            command,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            universal_newlines=True
+        )
+
+        # 標準出力を読み取るスレッド
+        def read_stdout():
+            for line in process.stdout:
+                log(line)
+        stdout_thread = threading.Thread(target=read_stdout, daemon=True)
+        stdout_thread.start()
+
+        # 標準エラーを読み取るスレッド
+        def read_stderr():
+            for line in process.stderr:
+                log(f"ERROR: {line}")
+        stderr_thread = threading.Thread(target=read_stderr, daemon=True)
+        stderr_thread.start()
+
+        # プロセスの終了を待機
+        process.wait()
+
+        # スレッドの終了を待つ
+        stdout_thread.join()
+        stderr_thread.join()
+        record_command(command, time.monotonic() - started)
+        if exit_callback:
+            exit_callback(process.returncode)
+
+        if process.returncode == 0:
+            if status_callback and done_msg:
+                dispatch(status_callback, done_msg)
+                log(f"{done_msg}\n")
+            if done_callback:
+                dispatch(done_callback)
+            return True
+        else:
+            error_message = f"{fail_msg} - Exit Code: {process.returncode}" if fail_msg else f"コマンドの実行に失敗しました: Exit Code {process.returncode}"
+            if status_callback:
+                dispatch(status_callback, error_message)
+                log(f"{error_message}\n")
+    except FileNotFoundError as e:
+        error_message = f"{fail_msg} - {e}" if fail_msg else f"コマンドの実行に失敗しました: {e}"
+        if status_callback:
+            dispatch(status_callback, error_message)
+            log(f"{error_message}\n")
+        print(f"エラー: コマンド実行に失敗しました - {e}")
+    except Exception as e:
+        error_message = f"{fail_msg} - {e}" if fail_msg else f"予期しないエラーが発生しました: {e}"
+        if status_callback:
+            dispatch(status_callback, error_message)
+            log(f"{error_message}\n")
+        print(f"エラー: {error_message}")
+    return False
+
+
+def execute_task(task: Callable[[], None], start_msg: str = "", done_msg: str = "", fail_msg: str = "",
+                 status_callback: Optional[Callable[[str], bool]] = None,
+                 done_callback: Optional[Callable[[], bool]] = None,
+                 timing_key: Optional[str] = None) -> bool:
+    """関数 (REST API 呼び出しなど) を実行し、execute_command と同じ形で結果を通知する。成功なら True。
+       timing_key を渡すと所要時間を "task" の分類で記録する。
+    """
+    if status_callback and start_msg:
+        dispatch(status_callback, start_msg)
+    started = time.monotonic()
+    try:
+        task()
+    except Exception as e:
+        error_message = f"{fail_msg} - {e}" if fail_msg else f"予期しないエラーが発生しました: {e}"
+        if status_callback:
+            dispatch(status_callback, error_message)
+        print(f"エラー: {error_message}")
+        return False
+    finally:
+        if timing_key:
+            timings.record("task", timing_key, time.monotonic() - started)
+    if status_callback and done_msg:
+        dispatch(status_callback, done_msg)
+    if done_callback:
+        dispatch(done_callback)
+    return True
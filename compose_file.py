@@ -0,0 +1,81 @@
+import os
+import threading
+from typing import Dict, Optional
+from config import target_containers
+
+# compose が探すのと同じ順序のファイル名
+COMPOSE_FILE_NAMES = (
+    "compose.yaml",
+    "compose.yml",
+    "docker-compose.yaml",
+    "docker-compose.yml",
+    "podman-compose.yaml",
+    "podman-compose.yml",
+)
+
+# パス → (mtime_ns, サイズ, 解析結果)
+_parse_cache: Dict[str, tuple] = {}
+_parse_cache_lock = threading.Lock()
+
+
+def find_compose_file(compose_dir: str) -> Optional[str]:
+    for name in COMPOSE_FILE_NAMES:
+        path = os.path.join(compose_dir, name)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def load_compose_file(compose_dir: str) -> Optional[dict]:
+    """compose ファイルを解析して返す。更新時刻とサイズが変わらない限りキャッシュを返す"""
+    # yaml の読み込みは重いので、起動時ではなく初回の解析時 (ワーカースレッド) に行う
+    try:
+        import yaml
+    except ImportError:  # PyYAML がなければ config.target_containers だけを使う
+        return None
+    path = find_compose_file(compose_dir)
+    if path is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    with _parse_cache_lock:
+        cached = _parse_cache.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+    try:
+        with open(path, encoding="utf-8") as f:
+            parsed = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        print(f"エラー: compose ファイルの解析に失敗しました ({path}) - {e}")
+        return None
+
+    with _parse_cache_lock:
+        _parse_cache[path] = (stat.st_mtime_ns, stat.st_size, parsed)
+    return parsed
+
+
+def discover_services(compose_dir: str) -> list:
+    """compose ファイルのサービス一覧に config.target_containers の表示名・説明・リンクを重ねて返す。
+       compose ファイルが読めない場合は target_containers をそのまま使う。
+    """
+    overlays = {container["service"]: container for container in target_containers}
+    compose = load_compose_file(compose_dir)
+    services = (compose or {}).get("services") or {}
+    if not services:
+        return [dict(container) for container in target_containers]
+
+    discovered = []
+    for service_name, definition in services.items():
+        definition = definition or {}
+        overlay = overlays.get(service_name, {})
+        discovered.append({
+            "name": overlay.get("name", service_name),
+            "service": service_name,
+            "description": overlay.get("description", definition.get("image", "")),
+            "links": overlay.get("links", []),
+        })
+    return discovered
@@ -1,7 +1,27 @@
 import os
+import re
 
 compose_dir = os.getenv("COMPOSE_DIR", "/home/ns1g/proj/compose-configuration/backend-api")
 
+# 1つのウィンドウで扱う compose ディレクトリ (COMPOSE_DIRS に区切り文字 ":" で複数指定できる)
+compose_dirs = [path for path in os.getenv("COMPOSE_DIRS", compose_dir).split(os.pathsep) if path]
+
+# compose のプロジェクト名 (既定はディレクトリ名から compose と同じ規則で生成)
+compose_project = os.getenv(
+    "COMPOSE_PROJECT_NAME",
+    re.sub(r"[^a-z0-9_-]", "", os.path.basename(os.path.normpath(compose_dir)).lower()),
+)
+
+# 状態取得・操作に使うバックエンド ("cli": podman compose コマンド / "api": Podman REST API)
+# "api" でソケットに接続できない場合は "cli" にフォールバックする
+container_backend = os.getenv("CONTAINER_BACKEND", "cli")
+podman_socket = os.getenv(
+    "PODMAN_SOCKET",
+    os.path.join(os.getenv("XDG_RUNTIME_DIR", f"/run/user/{os.getuid()}"), "podman", "podman.sock"),
+)
+
+# サービスは compose ファイルから検出する。ここに書いたサービスには表示名・説明・リンクを上書きで付ける
+# (compose ファイルが読めない場合はこの一覧をそのまま使う)
 target_containers = [
     {
         "name": "MinIO",
@@ -27,4 +47,69 @@ target_containers = [
     },
 ]
 
+# コマンドコンソール (実行したコマンドの一覧と出力) を起動時に表示するか。実行中もボタンで切り替えられる
 enable_log = False
+
+# 同時に実行する podman 操作の上限 (プロジェクトごと)
+job_max_concurrency = 2
+
+# 状態取得と操作コマンドを実行する共有ワーカーの数 (全プロジェクト共通)
+worker_pool_size = 8
+
+# コマンドコンソールに残すジョブの数、ジョブごとに保持する出力の最大行数と、1秒あたりの最大描画回数
+command_log_max_jobs = 50
+command_log_max_lines = 2000
+command_log_flush_rate = 20
+
+# リソース使用量の履歴としてサービスごとに保持するサンプル数 (約1秒間隔, 3時間分)
+metrics_history_size = 3 * 60 * 60
+
+# サービスのログを記録するディレクトリ (プロジェクト/サービスごとにセグメントファイルを置く)
+log_archive_dir = os.getenv(
+    "LOG_ARCHIVE_DIR",
+    os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "podman-compose-manager", "logs"),
+)
+# 1セグメントの大きさ、サービスごとの合計の上限 (超えたら古いものから削除)、圧縮せずに残す新しいセグメントの数
+log_archive_segment_bytes = 8 * 1024 * 1024
+log_archive_max_bytes = 256 * 1024 * 1024
+log_archive_hot_segments = 2
+
+# まとめてログ表示: 開いたときに各サービスから読む行数と、バッファに保持する最大行数
+merged_log_tail = 500
+merged_log_max_lines = 20000
+
+# メインループがこの時間以上止まったらスタックを採取する (ミリ秒)。監視の間隔と、保持する停止の件数
+watchdog_threshold_ms = 200
+watchdog_interval_ms = 50
+watchdog_max_stalls = 50
+
+# 依存関係に沿った起動で、準備完了 (healthy / running) を確認する間隔と、待つ上限 (秒)
+orchestrator_poll_interval = 1.0
+orchestrator_ready_timeout = 300
+
+# サービスのリンク (HTTP / tcp://) に応答があるかを確かめる間隔 (秒)。失敗が続くと最大間隔まで延ばす
+probe_interval = 5.0
+probe_max_interval = 60.0
+probe_timeout = 2.0
+# 同時に実行する確認の数と、応答時間の履歴として保持する件数
+probe_concurrency = 4
+probe_history_size = 64
+
+# ログの購読で共有する直近の行数 (購読者ごとの読み出し位置がこれより遅れると、
+# 読み飛ばす購読者は古い行を失い、待たせる購読者はログの取得を一時停止させる)
+log_hub_backlog_lines = 10000
+# 記録が空のサービスのログを取得し始めるときに、過去から取得する行数 (コンテナの全履歴は取得しない)
+log_hub_initial_tail = 1000
+
+# 状態を取り直す間隔 (秒)。変化の途中は fast、落ち着いていれば base から倍々に max まで延ばす。
+# ウィンドウにフォーカスがない間は unfocused より短くせず、最小化中は取り直さない
+refresh_fast_interval = 2.0
+refresh_base_interval = 10.0
+refresh_max_interval = 120.0
+refresh_unfocused_interval = 300.0
+
+# サービスの状態の変化として保持する最大件数 (全プロジェクト合計)。
+# 直近 flap_window 秒に flap_restarts 回以上起動し直したサービスは不安定として表示する
+state_history_max_transitions = 10000
+state_history_flap_window = 600
+state_history_flap_restarts = 3
@@ -1,100 +1,157 @@
-import json
+from gi.repository import Gtk, Gio, GLib, GObject
 from typing import Dict, Callable, Optional
-from utils import run_command_async, run_command
+from project_model import ProjectModel
+from dispatch import dispatch
+from workers import worker_pool
 from card import ContainerCard
-from config import compose_dir, target_containers
+from compose_file import discover_services
+from orchestrator import STEP_LABELS
 
 
-class ContainerManager:
+# 一度のアイドル処理でリストに追加する行数
+ROW_BATCH_SIZE = 20
+
+
+class ServiceItem(GObject.Object):
+    """Gio.ListStore に入れるサービス1件。カードは行が作られるときに生成する"""
+
+    def __init__(self, container: dict) -> None:
+        super().__init__()
+        self.container = container
+        self.service_name = container["service"]
+
+
+class ContainerManager(ProjectModel):
+    """ProjectModel の状態をサービスごとのカードのリストとして表示する"""
+
     def __init__(self, compose_dir: str, status_callback: Optional[Callable[[str], None]] = None) -> None:
-        self.compose_dir = compose_dir
+        super().__init__(compose_dir, status_callback)
+        # 生成済みのカード
         self.container_cards: Dict[str, ContainerCard] = {}
-        self.status_callback = status_callback
-
-    def set_status_callback(self, callback: Callable[[str], None]):
-        self.status_callback = callback
+        self.filter_text = ""
+        self._pending_items: list = []
 
     def initialize_cards(self, layout) -> None:
-        for container in target_containers:
-            card = ContainerCard(
-                container,
-                self.compose_dir,
-                self.start_container,
-                self.stop_container,
-            )
-            layout.pack_start(card.get_widget(), False, False, 5)
-            self.container_cards[container["service"]] = card
-
-    def update_container_status(self) -> None:
-        """Podmanの状態を取得してUIに反映する。
-           状態取得は同期でも問題ないが、もし重い場合は非同期化可能。
-        """
-        try:
-            result = run_command(["podman", "compose", "ps", "--format=json"], cwd=compose_dir)
-            print(f"Podman出力:\n{result}")
-            containers = {}
-            for line in result.strip().splitlines():
-                try:
-                    container_data = json.loads(line)
-                    service_name = container_data.get("Service")
-                    if service_name:
-                        containers[service_name] = container_data
-                except json.JSONDecodeError as e:
-                    print(f"エラー: JSONデコードに失敗しました (行: {line}) - {e}")
-
-            for service_name, card in self.container_cards.items():
-                container_data = containers.get(service_name, {"State": "stopped", "Service": service_name})
-                card.update_container_data(container_data)
-
-        except Exception as e:
-            print(f"エラー: 状況の更新に失敗しました - {e}")
-
-    def start_container(self, service_name: str) -> None:
-        run_command_async(
-            ["podman", "compose", "up", "-d", service_name],
-            cwd=self.compose_dir,
-            start_msg=f"{service_name} 起動中...",
-            done_msg=f"{service_name} が起動しました",
-            fail_msg=f"{service_name} の起動に失敗しました",
-            status_callback=self.status_callback,
-            done_callback=self.update_container_status
-        )
+        """サービス一覧をモデルに持つリストを作る。カードは行が追加されるときに作られる"""
+        self.service_store = Gio.ListStore(item_type=ServiceItem)
+        self.list_box = Gtk.ListBox()
+        self.list_box.set_selection_mode(Gtk.SelectionMode.NONE)
+        self.list_box.bind_model(self.service_store, self.create_card_widget)
+        self.list_box.set_filter_func(self.filter_row)
 
-    def stop_container(self, service_name: str) -> None:
-        run_command_async(
-            ["podman", "compose", "stop", service_name],
-            cwd=self.compose_dir,
-            start_msg=f"{service_name} 停止中...",
-            done_msg=f"{service_name} が停止しました",
-            fail_msg=f"{service_name} の停止に失敗しました",
-            status_callback=self.status_callback,
-            done_callback=self.update_container_status
-        )
+        scroll = Gtk.ScrolledWindow()
+        scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        scroll.set_propagate_natural_height(True)
+        scroll.add(self.list_box)
+        layout.pack_start(scroll, True, True, 0)
 
-    def start_all_containers(self) -> None:
-        run_command_async(
-            ["podman", "compose", "up", "-d"],
-            cwd=self.compose_dir,
-            start_msg="すべてのサービスを起動中...",
-            done_msg="すべてのサービスが起動しました",
-            fail_msg="すべてのコンテナの起動に失敗しました",
-            status_callback=self.status_callback,
-            done_callback=self.update_container_status
-        )
+        # compose ファイルの解析はワーカーで行い、ウィンドウの表示を待たせない
+        worker_pool.submit(self._discover_worker)
 
-    def stop_all_containers(self) -> None:
-        run_command_async(
-            ["podman", "compose", "down"],
-            cwd=self.compose_dir,
-            start_msg="すべてのサービスを停止中...",
-            done_msg="すべてのサービスが停止しました",
-            fail_msg="すべてのコンテナの停止に失敗しました",
-            status_callback=self.status_callback,
-            done_callback=self.update_container_status
+    def _discover_worker(self) -> None:
+        discovered = discover_services(self.compose_dir)
+        dispatch(self.sync_services, discovered)
+
+    def on_services_changed(self, added: list, removed: set) -> None:
+        for index in reversed(range(self.service_store.get_n_items())):
+            if self.service_store.get_item(index).service_name in removed:
+                self.service_store.remove(index)
+        self._pending_items = [item for item in self._pending_items if item["service"] not in removed]
+        for service_name in removed:
+            self.container_cards.pop(service_name, None)
+
+        if added:
+            # 行はアイドル時に少しずつ追加し、サービス数が多くても画面を止めない
+            schedule = not self._pending_items
+            self._pending_items.extend(added)
+            if schedule:
+                GLib.idle_add(self._add_pending_rows)
+
+    def _add_pending_rows(self) -> bool:
+        batch = self._pending_items[:ROW_BATCH_SIZE]
+        del self._pending_items[:ROW_BATCH_SIZE]
+        self.service_store.splice(self.service_store.get_n_items(), 0, [ServiceItem(c) for c in batch])
+        return bool(self._pending_items)
+
+    def create_card_widget(self, item: ServiceItem) -> Gtk.Widget:
+        card = ContainerCard(
+            item.container,
+            self.compose_dir,
+            self.start_container,
+            self.stop_container,
         )
+        self.container_cards[item.service_name] = card
+        container_data = self.container_states.get(item.service_name)
+        if container_data is not None:
+            card.update_container_data(container_data)
+        metrics = self.metrics_collector.get(item.service_name)
+        if metrics is not None:
+            card.set_metrics(metrics)
+        card.set_readiness(self.prober.summary(item.service_name))
+        widget = card.get_widget()
+        widget.show_all()
+        return widget
+
+    def filter_row(self, row: Gtk.ListBoxRow) -> bool:
+        if not self.filter_text:
+            return True
+        item = self.service_store.get_item(row.get_index())
+        if item is None:
+            return True
+        container = item.container
+        return any(self.filter_text in str(container.get(key, "")).lower()
+                   for key in ("service", "name", "description"))
+
+    def set_filter(self, text: str) -> None:
+        self.filter_text = text.strip().lower()
+        self.list_box.invalidate_filter()
+
+    def on_service_updated(self, service_name: str, container_data: dict, changed: bool) -> None:
+        """変化したサービスのカードだけ更新する。カードは観測した状態を表示するだけ"""
+        card = self.container_cards.get(service_name)
+        if card is None:
+            return
+        if changed:
+            card.update_container_data(container_data)
+        else:
+            # ウィジェットには触れず、詳細表示用の RAW データだけ差し替える
+            card.container_data = container_data
+
+    def on_metrics_updated(self, service_names: set) -> None:
+        for service_name in service_names:
+            card = self.container_cards.get(service_name)
+            if card is None:
+                continue
+            if card.metrics is None:
+                card.set_metrics(self.metrics_collector.get(service_name))
+            else:
+                card.update_metrics()
+
+    def on_probes_updated(self, service_names: set) -> None:
+        for service_name in service_names:
+            card = self.container_cards.get(service_name)
+            if card:
+                card.set_readiness(self.prober.summary(service_name))
+
+    def on_operation_finished(self, service_name: str) -> None:
+        """希望状態を解除し、観測した状態の表示に戻す"""
+        card = self.container_cards.get(service_name)
+        if card and not self.scheduler.is_pending(service_name):
+            card.clear_desired_state()
+            card.set_progress("")
 
-    def get_started_container_count(self) -> int:
-        return sum(card.is_running() for card in self.container_cards.values())
+    def on_orchestration_progress(self, service_name: str, step: str) -> None:
+        card = self.container_cards.get(service_name)
+        if card:
+            card.set_progress(f"⏳ {STEP_LABELS[step]}")
 
-    def check_all_running(self) -> bool:
-        return all(card.is_running() for card in self.container_cards.values())
+    def on_orchestration_finished(self, steps: dict) -> None:
+        """成功したサービスの表示は消し、失敗・中止したものは理由を残す"""
+        for service_name, step in steps.items():
+            card = self.container_cards.get(service_name)
+            if card is None:
+                continue
+            if step in ("ready", "stopped"):
+                card.set_progress("")
+            else:
+                card.set_progress(f"⚠️ {STEP_LABELS[step]}")
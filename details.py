@@ -0,0 +1,222 @@
+import threading
+from collections import OrderedDict
+from typing import Optional
+from gi.repository import Gtk, GLib, GObject
+from backend import get_backend
+
+# 展開前の子ノードの代わりに置くダミー行の目印
+PLACEHOLDER = object()
+
+# 検索で集める一致件数の上限
+MAX_MATCHES = 500
+
+
+class InspectCache:
+    """podman inspect の結果をコンテナ ID と状態ごとに保持する (件数上限つき LRU)"""
+
+    def __init__(self, max_entries: int = 64) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[dict]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: dict) -> None:
+        with self._lock:
+            self._entries[key] = data
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+inspect_cache = InspectCache()
+
+
+def children_of(data) -> list:
+    """(キー, 値) の一覧。dict と list 以外は子を持たない"""
+    if isinstance(data, dict):
+        return list(data.items())
+    if isinstance(data, list):
+        return [(f"[{i}]", item) for i, item in enumerate(data)]
+    return []
+
+
+def describe_value(data) -> str:
+    if isinstance(data, dict):
+        return f"{{{len(data)} 項目}}"
+    if isinstance(data, list):
+        return f"[{len(data)} 件]"
+    return str(data)
+
+
+class DetailsWindow(Gtk.Window):
+    """コンテナ情報をツリーで表示する。子ノードは展開されたときに初めて作る"""
+
+    def __init__(self, title: str, service_name: str, container_data: dict, compose_dir: str) -> None:
+        super().__init__(title=title)
+        self.set_default_size(600, 400)
+        self.service_name = service_name
+        self.container_data = container_data
+        self.backend = get_backend(compose_dir)
+
+        # 列: キー, 値の表示, 元データ
+        self.store = Gtk.TreeStore(str, str, GObject.TYPE_PYOBJECT)
+        self.matches: list = []
+        self.match_index = -1
+
+        self.build_ui()
+
+        self.add_root("概要", container_data)
+        self.load_inspect()
+
+    def build_ui(self) -> None:
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        main_box.set_margin_top(5)
+        main_box.set_margin_bottom(5)
+        main_box.set_margin_start(5)
+        main_box.set_margin_end(5)
+        self.add(main_box)
+
+        # 検索バー
+        search_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("キーまたは値を検索")
+        self.search_entry.connect("search-changed", self.on_search_changed)
+        self.search_entry.connect("activate", lambda _: self.jump_to_next_match())
+        search_box.pack_start(self.search_entry, True, True, 0)
+        next_button = Gtk.Button(label="次へ")
+        next_button.connect("clicked", lambda _: self.jump_to_next_match())
+        search_box.pack_start(next_button, False, False, 0)
+        self.match_label = Gtk.Label(label="")
+        search_box.pack_start(self.match_label, False, False, 0)
+        main_box.pack_start(search_box, False, False, 0)
+
+        # ツリー表示
+        self.tree_view = Gtk.TreeView(model=self.store)
+        for index, title in enumerate(("キー", "値")):
+            renderer = Gtk.CellRendererText()
+            column = Gtk.TreeViewColumn(title, renderer, text=index)
+            column.set_resizable(True)
+            self.tree_view.append_column(column)
+        self.tree_view.connect("test-expand-row", self.on_test_expand_row)
+
+        scroll = Gtk.ScrolledWindow()
+        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scroll.add(self.tree_view)
+        main_box.pack_start(scroll, True, True, 0)
+
+        # 閉じるボタン
+        close_button = Gtk.Button(label="閉じる")
+        close_button.set_margin_top(5)
+        close_button.connect("clicked", lambda _: self.close())
+        main_box.pack_start(close_button, False, False, 0)
+
+    def add_root(self, key: str, data) -> Gtk.TreeIter:
+        return self.append_node(None, key, data)
+
+    def append_node(self, parent: Optional[Gtk.TreeIter], key: str, data) -> Gtk.TreeIter:
+        tree_iter = self.store.append(parent, [str(key), describe_value(data), data])
+        if children_of(data):
+            self.store.append(tree_iter, ["", "", PLACEHOLDER])
+        return tree_iter
+
+    def populate(self, tree_iter: Gtk.TreeIter) -> None:
+        """ダミー行を実際の子ノードに置き換える (1階層分だけ)"""
+        child = self.store.iter_children(tree_iter)
+        if child is None or self.store.get_value(child, 2) is not PLACEHOLDER:
+            return
+        self.store.remove(child)
+        for key, value in children_of(self.store.get_value(tree_iter, 2)):
+            self.append_node(tree_iter, key, value)
+
+    def on_test_expand_row(self, tree_view: Gtk.TreeView, tree_iter: Gtk.TreeIter, path: Gtk.TreePath) -> bool:
+        self.populate(tree_iter)
+        return False
+
+    def load_inspect(self) -> None:
+        """inspect の結果をキャッシュから、なければバックグラウンドで取得して追加する"""
+        container_id = self.container_data.get("ID") or self.container_data.get("Name")
+        if not container_id:
+            return
+        key = (container_id, self.container_data.get("State"))
+        cached = inspect_cache.get(key)
+        if cached is not None:
+            self.add_root("inspect", cached)
+            return
+
+        loading_iter = self.store.append(None, ["inspect", "読み込み中...", None])
+
+        def worker():
+            try:
+                data = self.backend.inspect_container(container_id)
+            except Exception as e:
+                GLib.idle_add(self.store.set_value, loading_iter, 1, f"取得に失敗しました - {e}")
+                return
+            if data is not None:
+                inspect_cache.put(key, data)
+            GLib.idle_add(self.finish_inspect, loading_iter, data)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def finish_inspect(self, loading_iter: Gtk.TreeIter, data: Optional[dict]) -> None:
+        self.store.remove(loading_iter)
+        if data is None:
+            self.store.append(None, ["inspect", "取得できませんでした", None])
+            return
+        self.add_root("inspect", data)
+        self.on_search_changed(self.search_entry)
+
+    def on_search_changed(self, entry: Gtk.SearchEntry) -> None:
+        """元データを走査して一致するノードのキー経路を集める (ウィジェットは作らない)"""
+        text = entry.get_text().strip().lower()
+        self.matches = []
+        self.match_index = -1
+        if not text:
+            self.match_label.set_text("")
+            return
+
+        def walk(data, path: list) -> None:
+            for index, (key, value) in enumerate(children_of(data)):
+                if len(self.matches) >= MAX_MATCHES:
+                    return
+                child_path = path + [index]
+                if text in str(key).lower() or (not children_of(value) and text in str(value).lower()):
+                    self.matches.append(child_path)
+                walk(value, child_path)
+
+        root = self.store.get_iter_first()
+        root_index = 0
+        while root is not None:
+            data = self.store.get_value(root, 2)
+            if data is not None:
+                walk(data, [root_index])
+            root = self.store.iter_next(root)
+            root_index += 1
+
+        suffix = "+" if len(self.matches) >= MAX_MATCHES else ""
+        self.match_label.set_text(f"{len(self.matches)}{suffix} 件")
+
+    def jump_to_next_match(self) -> None:
+        if not self.matches:
+            return
+        self.match_index = (self.match_index + 1) % len(self.matches)
+        indices = self.matches[self.match_index]
+
+        # 経路上のノードを必要な分だけ作りながら展開する
+        tree_iter = self.store.iter_nth_child(None, indices[0])
+        for index in indices[1:]:
+            self.populate(tree_iter)
+            self.tree_view.expand_row(self.store.get_path(tree_iter), False)
+            tree_iter = self.store.iter_nth_child(tree_iter, index)
+            if tree_iter is None:
+                return
+
+        path = self.store.get_path(tree_iter)
+        self.tree_view.set_cursor(path, None, False)
+        self.tree_view.scroll_to_cell(path, None, True, 0.5, 0.0)
+        self.match_label.set_text(f"{self.match_index + 1}/{len(self.matches)} 件")
@@ -0,0 +1,222 @@
+import json
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from collections import deque
+from typing import Callable, Dict, Optional
+from config import watchdog_threshold_ms, watchdog_interval_ms, watchdog_max_stalls
+
+# ヒストグラムのバケットの上限 (秒)。最後のバケットはそれ以上すべて
+BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# 値を取るオプション (コマンドからサービス名を探すときに値を読み飛ばす)
+VALUE_OPTIONS = {"--tail", "--since", "--format", "--filter", "--interval", "-t", "--timeout"}
+
+# 停止1回あたりに保持するスタックの種類数
+MAX_STACKS_PER_STALL = 10
+
+
+class Histogram:
+    """対数間隔のバケットで所要時間の分布を数える"""
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, fraction: float) -> float:
+        """おおよその分位点 (そのバケットの上限。最大値を超えない)"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS[index] if index < len(BUCKETS) else self.max, self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            "p50_ms": round(self.percentile(0.5) * 1000, 2),
+            "p95_ms": round(self.percentile(0.95) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2),
+            "buckets_ms": {
+                (f"<={bound * 1000:g}" if index < len(BUCKETS) else f">{BUCKETS[-1] * 1000:g}"): count
+                for index, (bound, count) in enumerate(zip(BUCKETS + (BUCKETS[-1],), self.counts))
+                if count
+            },
+        }
+
+
+class TimingRegistry:
+    """分類 (command / service / refresh / main_loop) とキーごとのヒストグラム"""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, category: str, key: str, seconds: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get((category, key))
+            if histogram is None:
+                histogram = self._histograms[(category, key)] = Histogram()
+            histogram.record(seconds)
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        with self._lock:
+            result: Dict[str, Dict[str, dict]] = {}
+            for (category, key), histogram in sorted(self._histograms.items()):
+                result.setdefault(category, {})[key] = histogram.to_dict()
+            return result
+
+
+timings = TimingRegistry()
+
+
+def describe_command(command: list) -> tuple:
+    """podman のコマンドを (サブコマンド, サービス名または None) にする"""
+    args = command[1:] if command and command[0] == "podman" else list(command)
+    if args[:1] == ["compose"] and len(args) > 1:
+        subcommand, rest = f"compose {args[1]}", args[2:]
+    else:
+        subcommand, rest = (args[0] if args else ""), args[1:]
+    positional = []
+    skip = False
+    for arg in rest:
+        if skip:
+            skip = False
+        elif arg.startswith("-"):
+            skip = arg in VALUE_OPTIONS
+        else:
+            positional.append(arg)
+    service = positional[-1] if len(positional) == 1 and subcommand.startswith("compose") else None
+    return subcommand, service
+
+
+def record_command(command: list, seconds: float) -> None:
+    """コマンドの所要時間をサブコマンド別・サービス別に記録する"""
+    subcommand, service = describe_command(command)
+    timings.record("command", subcommand, seconds)
+    if service:
+        timings.record("service", f"{service} {subcommand}", seconds)
+
+
+class StallWatchdog:
+    """メインループの停止を検出する。
+       メインループのタイマーで心拍を打ち、その遅れ (ディスパッチの待ち時間) を記録する。
+       別スレッドが心拍の途絶えを監視し、閾値を超えている間はメインスレッドのスタックを採取する。
+    """
+
+    def __init__(self, timeout_add: Callable, threshold_ms: float = watchdog_threshold_ms,
+                 interval_ms: float = watchdog_interval_ms, max_stalls: int = watchdog_max_stalls) -> None:
+        self.timeout_add = timeout_add
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stalls: deque = deque(maxlen=max_stalls)
+        self._lock = threading.Lock()
+        self._main_thread_id = threading.main_thread().ident
+        self._last_beat = time.monotonic()
+        self._expected_beat = self._last_beat + self.interval
+        self._current: Optional[dict] = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._last_beat = time.monotonic()
+        self._expected_beat = self._last_beat + self.interval
+        self.timeout_add(int(self.interval * 1000), self._beat)
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _beat(self) -> bool:
+        """メインループで呼ばれる"""
+        if self._stop_event.is_set():
+            return False
+        now = time.monotonic()
+        timings.record("main_loop", "dispatch_delay", max(0.0, now - self._expected_beat))
+        with self._lock:
+            self._last_beat = now
+            self._expected_beat = now + self.interval
+            current, self._current = self._current, None
+        if current is not None:
+            current["duration_ms"] = round((now - current["monotonic"]) * 1000, 1)
+            del current["monotonic"]
+            current["stacks"] = sorted(current["stacks"].values(), key=lambda s: -s["samples"])
+            self.stalls.append(current)
+        return True
+
+    def _watch(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            with self._lock:
+                stalled_for = time.monotonic() - self._last_beat
+                if stalled_for < self.threshold:
+                    continue
+                if self._current is None:
+                    self._current = {
+                        "started_at": time.time() - stalled_for,
+                        "monotonic": self._last_beat,
+                        "stacks": {},
+                    }
+                self._sample_locked()
+
+    def _sample_locked(self) -> None:
+        frame = sys._current_frames().get(self._main_thread_id)
+        if frame is None:
+            return
+        stack = "".join(traceback.format_stack(frame))
+        stacks = self._current["stacks"]
+        entry = stacks.get(stack)
+        if entry is None:
+            if len(stacks) >= MAX_STACKS_PER_STALL:
+                return
+            entry = stacks[stack] = {"samples": 0, "stack": stack}
+        entry["samples"] += 1
+
+    def get_stalls(self) -> list:
+        with self._lock:
+            return list(self.stalls)
+
+
+# GUI の起動時に main.py が作る (ヘッドレスでは使わない)
+watchdog: Optional[StallWatchdog] = None
+
+
+def start_watchdog(timeout_add: Callable) -> StallWatchdog:
+    global watchdog
+    if watchdog is None:
+        watchdog = StallWatchdog(timeout_add)
+    watchdog.start()
+    return watchdog
+
+
+def export() -> dict:
+    """不具合報告に添付するための診断情報"""
+    return {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "stall_threshold_ms": watchdog_threshold_ms,
+        "stalls": watchdog.get_stalls() if watchdog else [],
+        "timings": timings.snapshot(),
+    }
+
+
+def write_report(path: str) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(export(), f, ensure_ascii=False, indent=2)
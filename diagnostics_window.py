@@ -0,0 +1,130 @@
+import time
+from gi.repository import Gtk
+import diagnostics
+
+
+class DiagnosticsWindow(Gtk.Window):
+    """メインループの停止とコマンドの所要時間を表示し、JSON に書き出す"""
+
+    def __init__(self) -> None:
+        super().__init__(title="診断情報")
+        self.set_default_size(760, 560)
+        self.stalls: list = []
+
+        # 停止の一覧: 発生時刻, 時間 (ms), 最後に実行していた箇所, self.stalls での位置 (非表示)
+        self.stall_store = Gtk.ListStore(str, str, str, int)
+        # 所要時間: 分類, キー, 回数, p50, p95, 最大
+        self.timing_store = Gtk.ListStore(str, str, int, str, str, str)
+
+        self.build_ui()
+        self.refresh()
+
+    def build_ui(self) -> None:
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        main_box.set_margin_top(5)
+        main_box.set_margin_bottom(5)
+        main_box.set_margin_start(5)
+        main_box.set_margin_end(5)
+        self.add(main_box)
+
+        paned = Gtk.Paned(orientation=Gtk.Orientation.VERTICAL)
+        main_box.pack_start(paned, True, True, 0)
+
+        # メインループの停止とスタック
+        stall_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        self.stall_label = Gtk.Label(label="")
+        self.stall_label.set_xalign(0)
+        stall_box.pack_start(self.stall_label, False, False, 0)
+        self.stall_view = self.create_tree_view(self.stall_store, ("発生時刻", "時間 (ms)", "実行中の箇所"))
+        self.stall_view.get_selection().connect("changed", self.on_stall_selected)
+        stall_box.pack_start(self.wrap_scroll(self.stall_view), True, True, 0)
+        self.stack_view = Gtk.TextView()
+        self.stack_view.set_editable(False)
+        self.stack_view.set_monospace(True)
+        stall_box.pack_start(self.wrap_scroll(self.stack_view), True, True, 0)
+        paned.pack1(stall_box, True, False)
+
+        # コマンド・サービスごとの所要時間
+        self.timing_view = self.create_tree_view(
+            self.timing_store, ("分類", "キー", "回数", "p50 (ms)", "p95 (ms)", "最大 (ms)")
+        )
+        paned.pack2(self.wrap_scroll(self.timing_view), True, False)
+
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        refresh_button = Gtk.Button(label="更新")
+        refresh_button.connect("clicked", lambda _: self.refresh())
+        button_box.pack_start(refresh_button, False, False, 0)
+        export_button = Gtk.Button(label="JSON に書き出す...")
+        export_button.connect("clicked", lambda _: self.export())
+        button_box.pack_start(export_button, False, False, 0)
+        close_button = Gtk.Button(label="閉じる")
+        close_button.connect("clicked", lambda _: self.destroy())
+        button_box.pack_end(close_button, False, False, 0)
+        main_box.pack_start(button_box, False, False, 0)
+
+    @staticmethod
+    def create_tree_view(store: Gtk.ListStore, titles: tuple) -> Gtk.TreeView:
+        tree_view = Gtk.TreeView(model=store)
+        for index, title in enumerate(titles):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=index)
+            column.set_resizable(True)
+            column.set_sort_column_id(index)
+            tree_view.append_column(column)
+        return tree_view
+
+    @staticmethod
+    def wrap_scroll(widget: Gtk.Widget) -> Gtk.ScrolledWindow:
+        scroll = Gtk.ScrolledWindow()
+        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scroll.add(widget)
+        return scroll
+
+    def refresh(self) -> None:
+        report = diagnostics.export()
+
+        self.stalls = report["stalls"]
+        self.stall_store.clear()
+        for index, stall in reversed(list(enumerate(self.stalls))):
+            stacks = stall["stacks"]
+            location = stacks[0]["stack"].strip().splitlines()[-2].strip() if stacks else ""
+            self.stall_store.append([
+                time.strftime("%H:%M:%S", time.localtime(stall["started_at"])),
+                f"{stall['duration_ms']:.0f}",
+                location,
+                index,
+            ])
+        if diagnostics.watchdog is None:
+            self.stall_label.set_text("停止の監視は動作していません")
+        else:
+            self.stall_label.set_text(
+                f"{report['stall_threshold_ms']} ms 以上の停止: {len(self.stalls)} 件"
+            )
+
+        self.timing_store.clear()
+        for category, entries in report["timings"].items():
+            for key, summary in entries.items():
+                self.timing_store.append([
+                    category, key, summary["count"],
+                    f"{summary['p50_ms']:.1f}", f"{summary['p95_ms']:.1f}", f"{summary['max_ms']:.1f}",
+                ])
+
+    def on_stall_selected(self, selection: Gtk.TreeSelection) -> None:
+        model, tree_iter = selection.get_selected()
+        if tree_iter is None:
+            return
+        stall = self.stalls[model.get_value(tree_iter, 3)]
+        text = "\n".join(f"--- {entry['samples']} 回採取 ---\n{entry['stack']}" for entry in stall["stacks"])
+        self.stack_view.get_buffer().set_text(text)
+
+    def export(self) -> None:
+        dialog = Gtk.FileChooserDialog(title="診断情報を書き出す", parent=self, action=Gtk.FileChooserAction.SAVE)
+        dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_SAVE, Gtk.ResponseType.OK)
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name(f"diagnostics-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            if dialog.run() == Gtk.ResponseType.OK:
+                diagnostics.write_report(dialog.get_filename())
+        except OSError as e:
+            print(f"エラー: 診断情報の書き出しに失敗しました - {e}")
+        finally:
+            dialog.destroy()
@@ -0,0 +1,18 @@
+from typing import Callable, Optional
+
+# バックグラウンドスレッドからの通知をどこで実行するか。
+# GUI では GLib.idle_add (メインループ)、ヘッドレスでは cli.py のイベントキューが設定される。
+_dispatcher: Optional[Callable] = None
+
+
+def set_dispatcher(dispatcher: Optional[Callable]) -> None:
+    global _dispatcher
+    _dispatcher = dispatcher
+
+
+def dispatch(callback: Callable, *args) -> None:
+    """callback(*args) を設定された実行先に渡す。未設定なら呼び出したスレッドでそのまま実行する"""
+    if _dispatcher is None:
+        callback(*args)
+    else:
+        _dispatcher(callback, *args)
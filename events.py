@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+# podman のイベント種別 → サービスの状態
+EVENT_STATES = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "stop": "exited",
+    "died": "exited",
+    "remove": "stopped",
+}
+
+
+def parse_event(line: str) -> Optional[tuple]:
+    """podman events の1行 (JSON) を (サービス名, 状態) に変換する。対象外なら None
+       CLI (`podman events --format json`) と REST API (Docker 互換形式) の両方に対応する。
+    """
+    try:
+        event = json.loads(line)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(event, dict) or event.get("Type", "container") != "container":
+        return None
+    state = EVENT_STATES.get(event.get("Status") or event.get("Action"))
+    if state is None:
+        return None
+    attributes = event.get("Attributes") or (event.get("Actor") or {}).get("Attributes") or {}
+    service_name = attributes.get("com.docker.compose.service")
+    if not service_name:
+        return None
+    return service_name, state
+
+
+class PodmanEventSubscriber:
+    """compose プロジェクトの podman events を購読し、サービスごとの状態変化を通知する。
+       ストリームが切れた場合は再接続し、再接続待ちの間だけポーリングで補う。
+    """
+
+    def __init__(self, backend,
+                 state_callback: Callable[[str, str], None],
+                 poll_callback: Callable[[], None],
+                 poll_interval: float = 5.0,
+                 reconnect_delay: float = 1.0,
+                 max_reconnect_delay: float = 30.0) -> None:
+        self.backend = backend
+        self.state_callback = state_callback
+        self.poll_callback = poll_callback
+        self.poll_interval = poll_interval
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.stream = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        stream = self.stream
+        if stream:
+            stream.close()
+
+    def _run(self) -> None:
+        delay = self.reconnect_delay
+        connected_once = False
+        while not self._stop_event.is_set():
+            try:
+                self.stream = self.backend.open_event_stream()
+            except Exception as e:
+                print(f"エラー: podman events の購読に失敗しました - {e}")
+                self._wait_reconnect(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+                continue
+
+            # 切断中に取りこぼしたイベントがあり得るので、再接続時は一度だけ全体を取り直す
+            if connected_once:
+                self.poll_callback()
+            connected_once = True
+            connected_at = time.monotonic()
+
+            for line in self.stream:
+                parsed = parse_event(line)
+                if parsed:
+                    self.state_callback(*parsed)
+
+            if self._stop_event.is_set():
+                break
+            print("警告: podman events のストリームが切断されました。再接続します")
+            # しばらく接続が続いていたなら一時的な切断とみなし、待ち時間を戻す
+            if time.monotonic() - connected_at > self.max_reconnect_delay:
+                delay = self.reconnect_delay
+            else:
+                delay = min(delay * 2, self.max_reconnect_delay)
+            self._wait_reconnect(delay)
+
+    def _wait_reconnect(self, delay: float) -> None:
+        """再接続までの待機。この間だけ poll_callback でポーリングする"""
+        deadline = time.monotonic() + delay
+        self.poll_callback()
+        next_poll = time.monotonic() + self.poll_interval
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now >= next_poll:
+                self.poll_callback()
+                next_poll = now + self.poll_interval
+            self._stop_event.wait(min(deadline, next_poll) - now)
@@ -0,0 +1,339 @@
+import fcntl
+import gzip
+import mmap
+import os
+import re
+import shutil
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+from config import log_archive_dir, log_archive_segment_bytes, log_archive_max_bytes, log_archive_hot_segments
+
+# `logs -t` が各行に付与するタイムスタンプ
+TIMESTAMP_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?(?:Z|[+-]\d{2}:\d{2})")
+
+# インデックスの1項目 (行末のセグメント内オフセット)
+INDEX_ENTRY = struct.Struct("<Q")
+
+
+def parse_log_timestamp(line: str) -> Optional[datetime]:
+    """ログ行の先頭付近からタイムスタンプを取り出す"""
+    match = TIMESTAMP_PATTERN.search(line, 0, 160)
+    if not match:
+        return None
+    text = match.group(0).replace("Z", "+00:00")
+    # fromisoformat はマイクロ秒 (6桁) までしか扱えないので切り詰める
+    text = re.sub(r"(\.\d{6})\d+", r"\1", text)
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return None
+
+
+def normalize_line(line: str) -> str:
+    """1レコード = 1行にそろえる (行の途中の改行は空白に置き換え、末尾に改行を1つ付ける)"""
+    return line.rstrip("\r\n").replace("\r", "").replace("\n", " ") + "\n"
+
+
+class MappedFile:
+    """読み取り専用の mmap。ファイルが伸びていれば読むときに張り直す"""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.file = None
+        self.map: Optional[mmap.mmap] = None
+
+    def view(self, needed: int) -> Optional[mmap.mmap]:
+        """先頭から needed バイト以上を読める mmap を返す"""
+        if self.map is not None and len(self.map) >= needed:
+            return self.map
+        self.close()
+        self.file = open(self.path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        if size == 0:
+            return None
+        self.map = mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+        return self.map
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class Segment:
+    """追記専用のセグメント1つ。
+       - {first_line}.log: ログ本体 (圧縮後は {first_line}.log.gz)
+       - {first_line}.idx: 各行の行末オフセット (8バイトずつ)
+       first_line はアーカイブ全体での通し行番号で、古いセグメントを削除しても変わらない。
+    """
+
+    def __init__(self, directory: str, first_line: int) -> None:
+        self.first_line = first_line
+        base = os.path.join(directory, f"{first_line:012d}")
+        self.log_path = base + ".log"
+        self.gz_path = base + ".log.gz"
+        self.index_path = base + ".idx"
+        self.compressed = not os.path.exists(self.log_path) and os.path.exists(self.gz_path)
+        self.line_count = 0
+        self.size = 0
+        self.data = MappedFile(self.log_path)
+        self.index = MappedFile(self.index_path)
+
+    @property
+    def end_line(self) -> int:
+        return self.first_line + self.line_count
+
+    def disk_bytes(self) -> int:
+        total = 0
+        for path in (self.gz_path if self.compressed else self.log_path, self.index_path):
+            try:
+                total += os.path.getsize(path)
+            except OSError:
+                pass
+        return total
+
+    def load(self) -> None:
+        """インデックスから行数と、最後の完全な行の末尾を読む (ファイルは変更しない)"""
+        index_size = os.path.getsize(self.index_path) if os.path.exists(self.index_path) else 0
+        self.line_count = index_size // INDEX_ENTRY.size
+        if self.line_count:
+            with open(self.index_path, "rb") as f:
+                f.seek((self.line_count - 1) * INDEX_ENTRY.size)
+                self.size = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))[0]
+
+    def recover(self) -> None:
+        """前回の書き込みが途中で終わっていれば、最後の完全な行まで切り詰める (書き込むプロセスだけが呼ぶ)"""
+        self.load()
+        if os.path.exists(self.index_path) and os.path.getsize(self.index_path) % INDEX_ENTRY.size:
+            os.truncate(self.index_path, self.line_count * INDEX_ENTRY.size)
+        if not self.compressed and os.path.exists(self.log_path) and os.path.getsize(self.log_path) > self.size:
+            os.truncate(self.log_path, self.size)
+
+    def line_bounds(self, index_map: mmap.mmap, relative: int) -> tuple:
+        start = INDEX_ENTRY.unpack_from(index_map, (relative - 1) * INDEX_ENTRY.size)[0] if relative else 0
+        end = INDEX_ENTRY.unpack_from(index_map, relative * INDEX_ENTRY.size)[0]
+        return start, end
+
+    def close(self) -> None:
+        self.data.close()
+        self.index.close()
+
+
+class LogArchive:
+    """サービス1つ分のログをディスクのセグメントに追記し、行番号で読み出す。
+       書き込みは1つのスレッド (log_hub.LogChannel) から、読み出しはどのスレッドからでもよい。
+       読み出しは必要な範囲だけを mmap から取り出すので、履歴が大きくてもメモリはほぼ増えない。
+       ディレクトリに書き込めるのは1プロセスだけ (.lock を flock する)。ロックを取れなかったプロセス
+       (一覧を開いたままのヘッドレス版など) は開いた時点の記録を読むだけで、追記した行は番号だけを進める
+       (その行は log_hub.LogChannel の直近の行から読む)。
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = log_archive_segment_bytes,
+                 max_bytes: int = log_archive_max_bytes, hot_segments: int = log_archive_hot_segments) -> None:
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.hot_segments = max(1, hot_segments)
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # 圧縮済みセグメントを最後に展開した内容 (同じセグメントを続けて読むことが多い)
+        self._inflated: Optional[tuple] = None
+        self._log_file = None
+        self._index_file = None
+
+        # 別のプロセスが書き込み中なら読み取り専用で開く
+        self._lock_file = open(os.path.join(directory, ".lock"), "a")
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            self.read_only = False
+        except OSError:
+            self.read_only = True
+        # 読み取り専用で追記した (ディスクに書いていない) 行数
+        self._memory_lines = 0
+
+        first_lines = sorted({int(name.split(".")[0]) for name in os.listdir(directory)
+                              if name.split(".")[0].isdigit()})
+        self.segments = [Segment(directory, first_line) for first_line in first_lines]
+        for segment in self.segments:
+            if self.read_only:
+                segment.load()
+            else:
+                segment.recover()
+        if not self.segments or (self.segments[-1].compressed and not self.read_only):
+            self.segments.append(Segment(directory, self.segments[-1].end_line if self.segments else 0))
+        if not self.read_only:
+            self._open_active()
+
+    def _open_active(self) -> None:
+        active = self.segments[-1]
+        self._log_file = open(active.log_path, "ab")
+        self._index_file = open(active.index_path, "ab")
+
+    @property
+    def start_line(self) -> int:
+        with self._lock:
+            return self.segments[0].first_line
+
+    @property
+    def end_line(self) -> int:
+        with self._lock:
+            return self.segments[-1].end_line + self._memory_lines
+
+    def disk_bytes(self) -> int:
+        with self._lock:
+            return sum(segment.disk_bytes() for segment in self.segments)
+
+    def append(self, line: str) -> int:
+        """1行追記して通し行番号を返す (書き込みスレッドから呼ぶ)。セグメントが上限を超えたら次のセグメントに切り替える"""
+        data = normalize_line(line).encode("utf-8", "replace")
+        with self._lock:
+            if self.read_only:
+                self._memory_lines += 1
+                return self.segments[-1].end_line + self._memory_lines - 1
+            active = self.segments[-1]
+            line_number = active.end_line
+            self._log_file.write(data)
+            active.size += len(data)
+            self._index_file.write(INDEX_ENTRY.pack(active.size))
+            active.line_count += 1
+            rotate = active.size >= self.segment_bytes
+        if rotate:
+            self._rotate()
+        return line_number
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if self._log_file is not None:
+            self._log_file.flush()
+            self._index_file.flush()
+
+    def _rotate(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            self._log_file.close()
+            self._index_file.close()
+            self.segments.append(Segment(self.directory, self.segments[-1].end_line))
+            self._open_active()
+            # 新しいセグメントから hot_segments 個は圧縮せずに残す
+            to_compress = [s for s in self.segments[:-self.hot_segments] if not s.compressed]
+        for segment in to_compress:
+            self._compress(segment)
+        self._enforce_budget()
+
+    def _compress(self, segment: Segment) -> None:
+        """書き終えたセグメントを gzip に置き換える。圧縮中も元のファイルから読める"""
+        temporary = segment.gz_path + ".tmp"
+        try:
+            with open(segment.log_path, "rb") as source, gzip.open(temporary, "wb", compresslevel=6) as target:
+                shutil.copyfileobj(source, target)
+            os.replace(temporary, segment.gz_path)
+        except OSError as e:
+            print(f"エラー: ログの圧縮に失敗しました - {e}")
+            return
+        with self._lock:
+            segment.data.close()
+            segment.compressed = True
+            os.remove(segment.log_path)
+
+    def _enforce_budget(self) -> None:
+        """合計サイズが上限を超えたら古いセグメントから削除する (書き込み中のセグメントは残す)"""
+        with self._lock:
+            total = sum(segment.disk_bytes() for segment in self.segments)
+            while total > self.max_bytes and len(self.segments) > 1:
+                segment = self.segments.pop(0)
+                total -= segment.disk_bytes()
+                segment.close()
+                if self._inflated and self._inflated[0] is segment:
+                    self._inflated = None
+                for path in (segment.log_path, segment.gz_path, segment.index_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+
+    def read_lines(self, start: int, count: int) -> list:
+        """通し行番号 start から最大 count 行を返す (削除済みの範囲は飛ばす)"""
+        return self.read_block(start, count)[1]
+
+    def read_block(self, start: int, count: int) -> tuple:
+        """read_lines と同じだが、実際に読み始めた行番号も返す ((行番号, 行の一覧))"""
+        lines = []
+        with self._lock:
+            self._flush_locked()
+            start = max(start, self.segments[0].first_line)
+            for segment in self.segments:
+                if len(lines) >= count:
+                    break
+                if segment.end_line <= start or segment.line_count == 0:
+                    continue
+                relative = max(0, start - segment.first_line)
+                last = min(segment.line_count, relative + count - len(lines))
+                try:
+                    lines.extend(self._read_segment(segment, relative, last))
+                except OSError:
+                    # 読み取り専用で開いている間に、書き込むプロセスが圧縮・削除した
+                    if self.read_only and not segment.compressed and os.path.exists(segment.gz_path):
+                        segment.compressed = True
+                        lines.extend(self._read_segment(segment, relative, last))
+                    else:
+                        break
+        return start, lines
+
+    def _read_segment(self, segment: Segment, first: int, last: int) -> list:
+        index_map = segment.index.view(last * INDEX_ENTRY.size)
+        begin = segment.line_bounds(index_map, first)[0]
+        ends = struct.unpack_from(f"<{last - first}Q", index_map, first * INDEX_ENTRY.size)
+        if segment.compressed:
+            if self._inflated is None or self._inflated[0] is not segment:
+                with gzip.open(segment.gz_path, "rb") as f:
+                    self._inflated = (segment, f.read())
+            data = self._inflated[1]
+        else:
+            data = segment.data.view(ends[-1])
+        lines = []
+        for end in ends:
+            lines.append(data[begin:end].decode("utf-8", "replace"))
+            begin = end
+        return lines
+
+    def last_timestamp(self) -> Optional[datetime]:
+        """最後に記録した行のタイムスタンプ (続きから取得するときの基準)"""
+        end = self.end_line
+        for line in reversed(self.read_lines(max(self.start_line, end - 10), 10)):
+            timestamp = parse_log_timestamp(line)
+            if timestamp is not None:
+                return timestamp
+        return None
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush_locked()
+            if self._log_file is not None:
+                self._log_file.close()
+                self._index_file.close()
+            self._log_file = None
+            self._index_file = None
+            for segment in self.segments:
+                segment.close()
+            # ロックを解放する
+            self._lock_file.close()
+
+
+_archives: Dict[tuple, LogArchive] = {}
+_registry_lock = threading.Lock()
+
+
+def get_archive(project: str, service_name: str) -> LogArchive:
+    """プロジェクト・サービスごとのアーカイブを返す (プロセス内で共有する)"""
+    with _registry_lock:
+        archive = _archives.get((project, service_name))
+        if archive is None:
+            archive = LogArchive(os.path.join(log_archive_dir, project, service_name))
+            _archives[(project, service_name)] = archive
+        return archive
@@ -0,0 +1,296 @@
+import threading
+from collections import deque
+from itertools import islice
+from typing import Dict, Optional
+from log_archive import LogArchive, get_archive, normalize_line, parse_log_timestamp
+from config import log_hub_backlog_lines, log_hub_initial_tail
+
+
+class Subscription:
+    """LogChannel の購読者1人分。読み出し位置 (通し行番号) を持つ。
+       block=False: 遅れて直近の行から外れたら、その分を読み飛ばす (dropped に数える)
+       block=True: 遅れている間はログの取得を止めて待たせる
+    """
+
+    def __init__(self, channel: "LogChannel", name: str, block: bool, close_on_end: bool,
+                 tail: Optional[int] = None) -> None:
+        self.channel = channel
+        self.name = name
+        self.block = block
+        self.close_on_end = close_on_end
+        # 記録がないときに取得を始める場合、過去の行を何行取得してほしいか
+        self.tail = tail
+        self.cursor = channel.backlog_end
+        self.dropped = 0
+
+    def read(self, limit: int = 1000, timeout: Optional[float] = None) -> tuple:
+        """次の行をまとめて返す ((先頭の通し行番号, 行の一覧))。
+           新しい行がなければ timeout 秒まで待つ (0 または None なら待たない)。
+           先頭の行番号が前回の続きより大きければ、その間は読み飛ばされた。
+        """
+        return self.channel._read(self, limit, timeout)
+
+    def close(self) -> None:
+        self.channel.unsubscribe(self)
+
+
+class LogChannel:
+    """サービス1つ分のログの取得を共有する。
+       - ログの取得 (podman のストリーム) は購読者がいる間だけ1本動かす
+       - 受け取った行はアーカイブに追記し、直近の行はメモリにも残して購読者に配る
+       - 最後の購読者が抜けたら取得を止める
+       メモリに残す行はアーカイブと同じ通し行番号で数える。
+    """
+
+    def __init__(self, backend, service_name: str, archive: LogArchive,
+                 backlog_lines: int = log_hub_backlog_lines) -> None:
+        self.backend = backend
+        self.service_name = service_name
+        self.archive = archive
+        self.backlog: deque = deque(maxlen=backlog_lines)
+        # backlog[0] の通し行番号 (backlog の末尾の次はアーカイブの末尾と同じ)
+        self.backlog_start = archive.end_line
+        self.subscribers: list = []
+        self.stream = None
+        self._thread: Optional[threading.Thread] = None
+        # close_stream() で取得を止めている途中か。その間に購読があれば、止まり次第取得し直す
+        self._closing = False
+        self._restart_requested = False
+        self._condition = threading.Condition()
+
+    # 読み出しは LogArchive と同じ形で行えるようにする (直近の行はメモリから返す)
+
+    @property
+    def start_line(self) -> int:
+        return self.archive.start_line
+
+    @property
+    def end_line(self) -> int:
+        return self.archive.end_line
+
+    @property
+    def backlog_end(self) -> int:
+        return self.backlog_start + len(self.backlog)
+
+    def disk_bytes(self) -> int:
+        return self.archive.disk_bytes()
+
+    def read_block(self, start: int, count: int) -> tuple:
+        with self._condition:
+            if self.backlog_start <= start < self.backlog_end:
+                offset = start - self.backlog_start
+                return start, list(islice(self.backlog, offset, offset + count))
+        return self.archive.read_block(start, count)
+
+    def read_lines(self, start: int, count: int) -> list:
+        return self.read_block(start, count)[1]
+
+    def is_streaming(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def subscribe(self, name: str, block: bool = False, close_on_end: bool = False,
+                  tail: Optional[int] = None) -> Subscription:
+        """購読を始める (取得が止まっていれば続きから取得する)。
+           close_on_end なら取得が (コンテナの停止などで) 終わったときに自動で購読をやめる。
+           tail は記録が空のときに取得する過去の行数 (省略時は log_hub_initial_tail)。
+        """
+        with self._condition:
+            subscription = Subscription(self, name, block, close_on_end, tail)
+            self.subscribers.append(subscription)
+        self.restart()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._condition:
+            if subscription not in self.subscribers:
+                return
+            self.subscribers.remove(subscription)
+            remaining = bool(self.subscribers)
+            # 待たせていた購読者が抜けたら取得を再開させる
+            self._condition.notify_all()
+        if not remaining:
+            self.close_stream()
+
+    def restart(self) -> None:
+        """購読者がいるのに取得が終わっていれば、続きから取得し直す"""
+        with self._condition:
+            if not self.subscribers:
+                return
+            if self.is_streaming():
+                if self._closing:
+                    # 止めている途中のスレッドが終わったら取得し直す (_finish)
+                    self._restart_requested = True
+                return
+            self._start_locked()
+
+    def _start_locked(self) -> None:
+        self._closing = False
+        self._restart_requested = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def close_stream(self) -> None:
+        with self._condition:
+            stream = self.stream
+            self.stream = None
+            self._closing = self.is_streaming()
+            self._restart_requested = False
+            self._condition.notify_all()
+        if stream:
+            stream.close()
+
+    def _run(self) -> None:
+        # 前回の続きから取得する (--since は境界の行を含むので、記録済みの行は読み飛ばす)
+        # 記録がなければ、コンテナの全履歴ではなく末尾の行だけを取得する
+        since = self.archive.last_timestamp()
+        tail = None
+        if since is None:
+            with self._condition:
+                tail = max((s.tail for s in self.subscribers if s.tail is not None), default=log_hub_initial_tail)
+        try:
+            stream = self.backend.open_log_stream(
+                self.service_name, True, tail=tail, since=since.isoformat() if since is not None else None
+            )
+        except Exception as e:
+            print(f"エラー: {self.service_name} のログの取得に失敗しました - {e}")
+            self._finish()
+            return
+        with self._condition:
+            closed = self._closing
+            if not closed:
+                self.stream = stream
+        if closed:
+            # 開いている間に close_stream() された
+            stream.close()
+            self._finish()
+            return
+        try:
+            for line in stream:
+                if stream is not self.stream:
+                    break
+                if since is not None:
+                    timestamp = parse_log_timestamp(line)
+                    if timestamp is not None and timestamp <= since:
+                        continue
+                    since = None
+                self._publish(line)
+        finally:
+            self.archive.flush()
+            self._finish()
+
+    def _publish(self, line: str) -> None:
+        line_number = self.archive.append(line)
+        with self._condition:
+            # 待たせる購読者が直近の行から外れそうなら、読み進めるまで取得を止める
+            while self.stream is not None and any(
+                subscription.block and line_number - subscription.cursor >= self.backlog.maxlen
+                for subscription in self.subscribers
+            ):
+                self._condition.wait(0.5)
+            if line_number != self.backlog_end:
+                # 取得し直した場合などで番号が飛んだら、直近の行を取り直す
+                self.backlog.clear()
+                self.backlog_start = line_number
+            self.backlog.append(normalize_line(line))
+            if len(self.backlog) == self.backlog.maxlen:
+                self.backlog_start = line_number + 1 - len(self.backlog)
+            self._condition.notify_all()
+
+    def _finish(self) -> None:
+        """取得が終わった。自動でやめる購読者を外す。
+           止めている途中に新しい購読があった場合は、ここで取得し直す。
+        """
+        with self._condition:
+            self.stream = None
+            self.subscribers = [s for s in self.subscribers if not s.close_on_end]
+            restart = self._restart_requested and bool(self.subscribers)
+            self._closing = False
+            self._restart_requested = False
+            self._condition.notify_all()
+            if restart:
+                self._start_locked()
+
+    def _read(self, subscription: Subscription, limit: int, timeout: Optional[float]) -> tuple:
+        with self._condition:
+            if subscription.cursor >= self.backlog_end and timeout:
+                self._condition.wait(timeout)
+            if subscription.cursor < self.backlog_start:
+                subscription.dropped += self.backlog_start - subscription.cursor
+                subscription.cursor = self.backlog_start
+            start = subscription.cursor
+            offset = start - self.backlog_start
+            lines = list(islice(self.backlog, offset, offset + limit))
+            subscription.cursor += len(lines)
+            if subscription.block and lines:
+                self._condition.notify_all()
+            return start, lines
+
+
+class LogHub:
+    """プロジェクト内のサービスのログを、サービスごとに1本の取得で共有する。
+       start() 後は起動中のサービスを購読し続け、down でコンテナが削除されてもログが記録に残る。
+    """
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+        self.channels: Dict[str, LogChannel] = {}
+        self.active = False
+        self._active_services: set = set()
+        # 記録のための購読 (取得が終わると自動で外れる)
+        self._recording: Dict[str, Subscription] = {}
+        self._lock = threading.Lock()
+
+    def channel(self, service_name: str) -> LogChannel:
+        with self._lock:
+            channel = self.channels.get(service_name)
+            if channel is None:
+                channel = LogChannel(self.backend, service_name, get_archive(self.backend.project, service_name))
+                self.channels[service_name] = channel
+            return channel
+
+    def subscribe(self, service_name: str, name: str, block: bool = False,
+                  tail: Optional[int] = None) -> Subscription:
+        return self.channel(service_name).subscribe(name, block, tail=tail)
+
+    def _record(self, service_name: str) -> None:
+        channel = self.channel(service_name)
+        subscription = self._recording.get(service_name)
+        if subscription is not None and subscription in channel.subscribers:
+            channel.restart()
+            return
+        self._recording[service_name] = channel.subscribe("記録", close_on_end=True)
+
+    def set_service_active(self, service_name: str, active: bool) -> None:
+        """起動中のサービスは記録を続ける。停止したサービスの取得は自然に終わるのを待つ"""
+        if active:
+            self._active_services.add(service_name)
+            if self.active:
+                self._record(service_name)
+        else:
+            self._active_services.discard(service_name)
+
+    def start(self) -> None:
+        self.active = True
+        for service_name in list(self._active_services):
+            self._record(service_name)
+
+    def stop(self) -> None:
+        self.active = False
+        with self._lock:
+            channels = list(self.channels.values())
+        for channel in channels:
+            channel.close_stream()
+
+
+_hubs: Dict[str, LogHub] = {}
+_hubs_lock = threading.Lock()
+
+
+def get_hub(backend) -> LogHub:
+    """compose ディレクトリごとの LogHub を返す (一覧・ログビューア・ヘッドレス版で共有する)"""
+    with _hubs_lock:
+        hub = _hubs.get(backend.compose_dir)
+        if hub is None:
+            hub = LogHub(backend)
+            _hubs[backend.compose_dir] = hub
+        return hub
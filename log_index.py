@@ -0,0 +1,241 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Optional
+from log_hub import LogChannel
+
+# ログレベル (数値が大きいほど重要)。レベルの書かれていない行は直前の行のレベルを引き継ぐ
+LEVEL_VALUES = {
+    "trace": 1, "debug": 1,
+    "info": 2, "notice": 2,
+    "warn": 3, "warning": 3,
+    "err": 4, "error": 4, "crit": 4, "critical": 4, "fatal": 4, "panic": 4,
+}
+LEVEL_PATTERN = re.compile(r"\b(" + "|".join(sorted(LEVEL_VALUES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+
+# 表示用のレベルの選択肢 (最低レベル → 表示名)
+LEVEL_CHOICES = [(0, "すべてのレベル"), (2, "INFO 以上"), (3, "WARN 以上"), (4, "ERROR 以上")]
+
+# 一度に読み込んで調べる行数
+BLOCK_LINES = 4096
+
+
+def detect_level(line: str) -> int:
+    """行の先頭付近に書かれたログレベル (見つからなければ 0)"""
+    match = LEVEL_PATTERN.search(line, 0, 200)
+    return LEVEL_VALUES[match.group(1).lower()] if match else 0
+
+
+class LogQuery:
+    """検索条件。text は部分一致 (大文字・小文字は区別しない) か正規表現。
+       正規表現が正しくなければ re.error を送出する。
+    """
+
+    def __init__(self, text: str = "", regex: bool = False, min_level: int = 0) -> None:
+        self.text = text
+        self.regex = regex
+        self.min_level = min_level
+        self.pattern = re.compile(text if regex else re.escape(text), re.IGNORECASE) if text else None
+
+    def is_empty(self) -> bool:
+        return self.pattern is None and self.min_level == 0
+
+    def refines(self, other: "LogQuery") -> bool:
+        """この条件に一致する行が、必ず other にも一致するか (入力を続けて条件を狭めた場合)"""
+        if self.regex or other.regex:
+            return self.text == other.text and self.regex == other.regex and self.min_level >= other.min_level
+        return other.text.lower() in self.text.lower() and self.min_level >= other.min_level
+
+    def matches(self, line: str, level: int) -> bool:
+        if level < self.min_level:
+            return False
+        return self.pattern is None or self.pattern.search(line) is not None
+
+
+class SearchResult:
+    """検索に一致した行番号の一覧。索引スレッドが調べ終えた範囲から順に追加していく"""
+
+    def __init__(self, query: LogQuery, scan_from: int, candidates: Optional[array] = None) -> None:
+        self.query = query
+        self.lines = array("q")
+        # 以前の結果を絞り込む場合に調べ直す行と、どこまで調べたか
+        self.candidates = candidates if candidates is not None else array("q")
+        self.candidate_position = 0
+        # ここより前の行 (候補を除く) は調べ終えた
+        self.scanned_to = scan_from
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.lines)
+
+    def slice(self, start: int, count: int) -> list:
+        with self._lock:
+            return list(self.lines[start:start + count])
+
+    def index_at_or_after(self, line_number: int) -> int:
+        with self._lock:
+            return bisect_left(self.lines, line_number)
+
+    def next_line(self, line_number: int) -> Optional[int]:
+        """line_number より後ろで最初に一致した行 (なければ None)"""
+        with self._lock:
+            index = bisect_right(self.lines, line_number)
+            return self.lines[index] if index < len(self.lines) else None
+
+    def previous_line(self, line_number: int) -> Optional[int]:
+        with self._lock:
+            index = bisect_left(self.lines, line_number)
+            return self.lines[index - 1] if index > 0 else None
+
+    def is_pending(self, indexed_to: int) -> bool:
+        """まだ調べていない行があるか"""
+        return self.candidate_position < len(self.candidates) or self.scanned_to < indexed_to
+
+    def add(self, line_numbers: list) -> None:
+        with self._lock:
+            self.lines.extend(line_numbers)
+
+
+class LogIndex:
+    """記録済みのログを裏で読み進め、各行のログレベルを索引にする。
+       検索は索引スレッドで行い、結果は一致した行番号の一覧として少しずつ増える。
+       - 新しい行は LogChannel の購読で受け取り、索引に追加するときに実行中の検索の条件でも調べる
+         (購読が遅れて読み飛ばした行は記録から読み直す)
+       - 入力を続けて条件を狭めた場合は、前回一致した行だけを調べ直す
+    """
+
+    def __init__(self, channel: LogChannel) -> None:
+        self.channel = channel
+        self.subscription = channel.subscribe("検索の索引")
+        # levels[i] は通し行番号 base + i の行のレベル
+        self.base = channel.start_line
+        self.levels = array("b")
+        self.search_result: Optional[SearchResult] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def indexed_to(self) -> int:
+        with self._lock:
+            return self.base + len(self.levels)
+
+    def is_complete(self) -> bool:
+        """記録済みの行をすべて索引にし、実行中の検索も調べ終えたか"""
+        indexed_to = self.indexed_to
+        result = self.search_result
+        return indexed_to >= self.channel.end_line and (result is None or not result.is_pending(indexed_to))
+
+    def search(self, query: LogQuery) -> Optional[SearchResult]:
+        """検索を始める (条件が空なら検索をやめて None)"""
+        previous = self.search_result
+        if previous is not None:
+            previous.cancelled = True
+        if query.is_empty():
+            self.search_result = None
+            return None
+        if previous is not None and query.refines(previous.query) and not previous.is_pending(self.indexed_to):
+            # 前回の結果を候補として調べ直し、以降の行は続きから調べる
+            with previous._lock:
+                candidates = array("q", previous.lines)
+            result = SearchResult(query, previous.scanned_to, candidates)
+        else:
+            result = SearchResult(query, self.channel.start_line)
+        self.search_result = result
+        return result
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.subscription.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            result = self.search_result
+            indexed_to = self.indexed_to
+            if result is not None and not result.cancelled and result.is_pending(indexed_to):
+                self._scan(result, indexed_to)
+            elif indexed_to < self.channel.end_line:
+                start, lines = self.channel.read_block(indexed_to, BLOCK_LINES)
+                if lines:
+                    self._index_block(start, lines)
+                elif self.channel.backlog_start > indexed_to:
+                    # 記録にも直近の行にもない行 (読み取り専用のアーカイブが番号だけ進めた行など) は飛ばす
+                    self._skip_to(self.channel.backlog_start)
+                else:
+                    self._stop_event.wait(0.1)
+            else:
+                # 新しい行か新しい検索を待つ (続きの行が届けばそのまま索引にする)
+                start, lines = self.subscription.read(BLOCK_LINES, timeout=0.1)
+                if lines and start == indexed_to:
+                    self._index_block(start, lines)
+
+    def _skip_to(self, line_number: int) -> None:
+        """line_number の手前まで、読めなかった (削除済みの) 行をレベルなしとして詰める"""
+        with self._lock:
+            if line_number > self.base + len(self.levels):
+                self.levels.extend([0] * (line_number - self.base - len(self.levels)))
+
+    def _index_block(self, start: int, lines: list) -> None:
+        if not lines:
+            return
+        self._skip_to(start)
+        with self._lock:
+            level = self.levels[-1] if self.levels else 0
+        new_levels = array("b")
+        for line in lines:
+            detected = detect_level(line)
+            if detected:
+                level = detected
+            new_levels.append(level)
+        with self._lock:
+            self.levels.extend(new_levels)
+
+        # 実行中の検索が追いついていれば、今読んだ行をそのまま調べる
+        result = self.search_result
+        if result is not None and not result.cancelled and not result.is_pending(start):
+            self._match(result, start, lines, new_levels)
+
+    def _scan(self, result: SearchResult, indexed_to: int) -> None:
+        if result.candidate_position < len(result.candidates):
+            # 前回一致した行を1行ずつ調べ直す
+            chunk = result.candidates[result.candidate_position:result.candidate_position + BLOCK_LINES]
+            matched = []
+            for line_number in chunk:
+                lines = self.channel.read_lines(line_number, 1)
+                if lines and result.query.matches(lines[0], self.level(line_number)):
+                    matched.append(line_number)
+            result.add(matched)
+            result.candidate_position += len(chunk)
+            return
+        if result.query.pattern is None:
+            # レベルだけの条件は本文を読まずに索引から求める
+            start = max(result.scanned_to, self.base)
+            with self._lock:
+                levels = self.levels[start - self.base:indexed_to - self.base]
+            minimum = result.query.min_level
+            result.add([start + i for i, level in enumerate(levels) if level >= minimum])
+            result.scanned_to = indexed_to
+            return
+        start, lines = self.channel.read_block(result.scanned_to, min(BLOCK_LINES, indexed_to - result.scanned_to))
+        if not lines:
+            # 読めない範囲は飛ばす (その先に直近の行があればそこから調べる)
+            backlog_start = self.channel.backlog_start
+            result.scanned_to = backlog_start if result.scanned_to < backlog_start < indexed_to else indexed_to
+            return
+        with self._lock:
+            levels = self.levels[start - self.base:start - self.base + len(lines)]
+        self._match(result, start, lines, levels)
+
+    def _match(self, result: SearchResult, start: int, lines: list, levels) -> None:
+        query = result.query
+        result.add([start + i for i, line in enumerate(lines) if query.matches(line, levels[i])])
+        result.scanned_to = start + len(lines)
+
+    def level(self, line_number: int) -> int:
+        with self._lock:
+            index = line_number - self.base
+            return self.levels[index] if 0 <= index < len(self.levels) else 0
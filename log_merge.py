@@ -0,0 +1,87 @@
+import heapq
+import time
+from typing import Dict, Optional
+from log_archive import parse_log_timestamp
+from log_hub import LogChannel
+
+# タイムスタンプのない行 (複数行のログの続きなど) で、直前の行もない場合の並び順
+NO_TIMESTAMP = float("-inf")
+
+
+class MergeCursor:
+    """サービス1つ分の読み出し位置と、次に出力する行 (先頭行) だけを持つ"""
+
+    def __init__(self, service_name: str, channel: LogChannel, position: int) -> None:
+        self.service_name = service_name
+        self.channel = channel
+        self.position = position
+        self.head: Optional[str] = None
+        self.head_time = NO_TIMESTAMP
+        # タイムスタンプのない行は直前の行と同じ時刻として扱い、続けて出力する
+        self.last_time = NO_TIMESTAMP
+
+    def fill(self) -> bool:
+        """先頭行がなければ1行読む。読める行がなければ False"""
+        if self.head is not None:
+            return True
+        # 古いセグメントが削除されていれば、読めた位置まで進む
+        self.position, lines = self.channel.read_block(self.position, 1)
+        if not lines:
+            return False
+        self.head = lines[0]
+        timestamp = parse_log_timestamp(self.head)
+        if timestamp is not None:
+            self.last_time = timestamp.timestamp()
+        self.head_time = self.last_time
+        return True
+
+    def take(self) -> str:
+        line = self.head
+        self.head = None
+        self.position += 1
+        return line
+
+
+class LogMerger:
+    """複数サービスのログ (LogChannel) をタイムスタンプ順に1本にまとめる。
+       各サービスは先頭行だけをメモリに持ち、最も古い行から順に出力する。
+       追記中のサービスはまだ届いていない行が先頭行より古い可能性があるので、
+       すべてのサービスに先頭行がそろうか、先頭行が lag 秒以上前のものになるまで待つ。
+       ログの取得が止まっているサービスは待たない。
+    """
+
+    def __init__(self, channels: Dict[str, LogChannel], tail: int, lag: float = 1.0) -> None:
+        self.lag = lag
+        # 各サービスの末尾 tail 行から始める
+        self.cursors = [
+            MergeCursor(name, channel, max(channel.start_line, channel.end_line - tail))
+            for name, channel in channels.items()
+        ]
+        self._heap: list = []
+        self._waiting = list(range(len(self.cursors)))
+
+    def next_batch(self, limit: int, now: Optional[float] = None) -> list:
+        """時刻順に最大 limit 行を (サービス名, 行) の一覧で返す"""
+        now = time.time() if now is None else now
+        batch = []
+        while len(batch) < limit:
+            # 先頭行がないサービスを読み足す
+            still_waiting = []
+            for index in self._waiting:
+                cursor = self.cursors[index]
+                if cursor.fill():
+                    heapq.heappush(self._heap, (cursor.head_time, index))
+                else:
+                    still_waiting.append(index)
+            self._waiting = still_waiting
+            if not self._heap:
+                break
+            head_time, index = self._heap[0]
+            blocking = any(self.cursors[i].channel.is_streaming() for i in self._waiting)
+            if blocking and head_time > now - self.lag:
+                break
+            heapq.heappop(self._heap)
+            cursor = self.cursors[index]
+            batch.append((cursor.service_name, cursor.take()))
+            self._waiting.append(index)
+        return batch
@@ -1,74 +1,459 @@
-from utils import run_command
-from gi.repository import Gtk, GLib
+import re
+from gi.repository import Gtk, Gdk, GLib, Pango
+from backend import get_backend
+from log_hub import get_hub
+from log_index import LogIndex, LogQuery, LEVEL_CHOICES
+from log_merge import LogMerger
+from metrics import format_bytes
+from config import merged_log_tail, merged_log_max_lines
+
+# アーカイブの伸びを確認して表示へ反映する間隔 (ミリ秒)
+FLUSH_INTERVAL_MS = 100
 
 
 class ContainerLogViewer(Gtk.Window):
+    """ディスクに記録したログを表示する。
+       バッファには画面に見えている行だけを入れ、スクロール位置 (通し行番号) に応じて入れ替える。
+       絞り込み中は一致した行の一覧をスクロールの対象にする (本文はコピーしない)。
+    """
+
     def __init__(self, service_name: str, compose_dir: str) -> None:
         super().__init__(title=f"ログビューアー - {service_name}")
         self.service_name = service_name
         self.compose_dir = compose_dir
+        self.backend = get_backend(compose_dir)
+        # ログの取得はサービスごとに共有し、表示は記録から行番号で読む
+        self.channel = get_hub(self.backend).channel(service_name)
         self.set_border_width(10)
         self.set_default_size(800, 600)
 
+        # 検索用の索引 (裏で読み進める) と、実行中の検索。索引の購読が開いている間はログの取得が続く
+        self.index = LogIndex(self.channel)
+        self.search_result = None
+        # 検索で移動した行 (次・前の一致の基準)
+        self.current_match = None
+
+        # 表示中の内容 (先頭の位置, 行数, 一致した行の数, 現在の一致)
+        self.shown_state = None
+        # プログラムからスクロール位置を変えている間は追従の切り替えをしない
+        self.updating_adjustment = False
+
         # UI構築
         self.build_ui()
 
-        # 初期ログの取得
-        self.update_logs()
+        self.flush_source_id = GLib.timeout_add(FLUSH_INTERVAL_MS, self.on_archive_tick)
+        self.connect("destroy", self.on_destroy)
+        self.on_archive_tick()
 
     def build_ui(self) -> None:
         """UIを構築"""
         main_layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
         self.add(main_layout)
+        main_layout.pack_start(self.build_search_bar(), False, False, 0)
 
-        # ログ表示エリア
+        # ログ表示エリア (縦方向のスクロールは通し行番号で管理する)
         self.log_view = Gtk.TextView()
         self.log_view.set_editable(False)
-        self.log_view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        self.log_view.set_monospace(True)
+        self.log_view.set_wrap_mode(Gtk.WrapMode.NONE)
         self.log_buffer = self.log_view.get_buffer()
+        self.match_tag = self.log_buffer.create_tag("match", background="#fce94f")
+        self.current_tag = self.log_buffer.create_tag("current", paragraph_background="#dbe9f9",
+                                                      weight=Pango.Weight.BOLD)
+        self.log_view.connect("scroll-event", self.on_scroll)
+        self.connect("key-press-event", self.on_key_press)
 
         scroll = Gtk.ScrolledWindow()
-        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.EXTERNAL)
         scroll.add(self.log_view)
-        main_layout.pack_start(scroll, True, True, 0)
+        scroll.connect("size-allocate", lambda *_: self.on_archive_tick())
+
+        self.adjustment = Gtk.Adjustment(value=0, lower=0, upper=0, step_increment=1, page_increment=1, page_size=1)
+        self.adjustment.connect("value-changed", self.on_adjustment_changed)
+        scrollbar = Gtk.Scrollbar(orientation=Gtk.Orientation.VERTICAL, adjustment=self.adjustment)
+
+        log_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=0)
+        log_box.pack_start(scroll, True, True, 0)
+        log_box.pack_start(scrollbar, False, False, 0)
+        main_layout.pack_start(log_box, True, True, 0)
 
         # ボタンエリア
         button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
         main_layout.pack_start(button_box, False, False, 0)
 
-        # 更新ボタン
-        update_button = Gtk.Button(label="更新")
-        update_button.connect("clicked", lambda _: self.update_logs())
-        button_box.pack_start(update_button, False, False, 0)
+        # 追従ボタン
+        self.follow_button = Gtk.ToggleButton(label="追従")
+        self.follow_button.set_active(True)
+        self.follow_button.connect("toggled", self.on_follow_toggled)
+        button_box.pack_start(self.follow_button, False, False, 0)
+
+        # 表示位置と記録の大きさ
+        self.position_label = Gtk.Label(label="")
+        self.position_label.set_xalign(0)
+        button_box.pack_start(self.position_label, True, True, 0)
 
         # 閉じるボタン
         close_button = Gtk.Button(label="閉じる")
         close_button.connect("clicked", lambda _: self.close_window())
-        button_box.pack_start(close_button, False, False, 0)
+        button_box.pack_end(close_button, False, False, 0)
+
+    def build_search_bar(self) -> Gtk.Box:
+        """検索・絞り込みの入力欄"""
+        search_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=5)
+
+        self.search_entry = Gtk.SearchEntry()
+        self.search_entry.set_placeholder_text("ログを検索 (Ctrl+F)")
+        self.search_entry.connect("search-changed", lambda _: self.update_search())
+        self.search_entry.connect("activate", lambda _: self.jump_to_match(forward=True))
+        self.search_entry.connect("next-match", lambda _: self.jump_to_match(forward=True))
+        self.search_entry.connect("previous-match", lambda _: self.jump_to_match(forward=False))
+        search_box.pack_start(self.search_entry, True, True, 0)
+
+        self.regex_check = Gtk.CheckButton(label="正規表現")
+        self.regex_check.connect("toggled", lambda _: self.update_search())
+        search_box.pack_start(self.regex_check, False, False, 0)
+
+        self.level_combo = Gtk.ComboBoxText()
+        for level, label in LEVEL_CHOICES:
+            self.level_combo.append(str(level), label)
+        self.level_combo.set_active_id("0")
+        self.level_combo.connect("changed", lambda _: self.update_search())
+        search_box.pack_start(self.level_combo, False, False, 0)
+
+        previous_button = Gtk.Button(label="▲")
+        previous_button.set_tooltip_text("前の一致 (Shift+Ctrl+G)")
+        previous_button.connect("clicked", lambda _: self.jump_to_match(forward=False))
+        search_box.pack_start(previous_button, False, False, 0)
+        next_button = Gtk.Button(label="▼")
+        next_button.set_tooltip_text("次の一致 (Enter / Ctrl+G)")
+        next_button.connect("clicked", lambda _: self.jump_to_match(forward=True))
+        search_box.pack_start(next_button, False, False, 0)
+
+        self.filter_button = Gtk.ToggleButton(label="一致した行だけ")
+        self.filter_button.connect("toggled", self.on_filter_toggled)
+        search_box.pack_start(self.filter_button, False, False, 0)
+
+        self.search_label = Gtk.Label(label="")
+        search_box.pack_start(self.search_label, False, False, 0)
+        return search_box
+
+    def is_filtering(self) -> bool:
+        return self.filter_button.get_active() and self.search_result is not None
+
+    def visible_rows(self) -> int:
+        """ログ表示エリアに収まる行数"""
+        layout = self.log_view.create_pango_layout("X")
+        line_height = max(1, layout.get_pixel_size()[1])
+        return max(1, self.log_view.get_parent().get_allocated_height() // line_height)
 
-    def update_logs(self) -> None:
-        """ログを取得して表示"""
-        command = ["podman", "compose", "logs", self.service_name]
-        logs = run_command(command, cwd=self.compose_dir)
+    def scroll_range(self) -> tuple:
+        """スクロールの範囲 (絞り込み中は一致した行の番目、それ以外は通し行番号)"""
+        if self.is_filtering():
+            return 0, self.search_result.count()
+        return self.channel.start_line, self.channel.end_line
 
-        if logs:
-            self.display_logs(logs)
+    def set_position(self, value: float) -> None:
+        self.updating_adjustment = True
+        try:
+            self.adjustment.set_value(value)
+        finally:
+            self.updating_adjustment = False
+
+    def on_archive_tick(self) -> bool:
+        """アーカイブの範囲をスクロールバーに反映し、追従中なら末尾を表示する"""
+        rows = self.visible_rows()
+        start, end = self.scroll_range()
+        self.updating_adjustment = True
+        try:
+            self.adjustment.configure(
+                min(max(self.adjustment.get_value(), start), max(start, end - rows)),
+                start, end, 1, max(1, rows - 1), rows,
+            )
+        finally:
+            self.updating_adjustment = False
+        if self.follow_button.get_active():
+            self.set_position(max(start, end - rows))
+        self.update_search_label()
+        self.render()
+        return True
+
+    def visible_lines(self, first: int, rows: int) -> tuple:
+        """表示する行番号と行の一覧"""
+        if self.is_filtering():
+            line_numbers = self.search_result.slice(first, rows)
+            lines = []
+            for line_number in line_numbers:
+                lines.extend(self.channel.read_lines(line_number, 1) or ["\n"])
+            return line_numbers, lines
+        start, lines = self.channel.read_block(first, rows)
+        return list(range(start, start + len(lines))), lines
+
+    def render(self) -> None:
+        """見えている範囲の行だけをバッファに入れる (表示が変わらなければ何もしない)"""
+        rows = self.visible_rows()
+        first = int(self.adjustment.get_value())
+        total = int(self.adjustment.get_upper())
+        match_count = self.search_result.count() if self.search_result is not None else 0
+        state = (first, min(rows, max(0, total - first)), self.is_filtering(), match_count, self.current_match)
+        if state == self.shown_state:
+            return
+        self.shown_state = state
+
+        line_numbers, lines = self.visible_lines(first, rows)
+        self.log_buffer.set_text("".join(lines).rstrip("\n"))
+        self.highlight(line_numbers, lines)
+        if self.is_filtering():
+            self.position_label.set_text(f"一致 {first + 1:,}–{first + len(lines):,} 件目 / {total:,} 件")
         else:
-            self.display_logs("エラー: ログの取得に失敗しました")
+            self.position_label.set_text(
+                f"{first + 1:,}–{first + len(lines):,} 行目 / {total:,} 行 (記録 {format_bytes(self.channel.disk_bytes())})"
+            )
 
-    def display_logs(self, logs: str) -> None:
-        """ログを表示"""
-        self.log_buffer.set_text("")  # バッファをクリア
-        self.log_buffer.insert_at_cursor(logs)
+    def highlight(self, line_numbers: list, lines: list) -> None:
+        """表示中の行で検索語に一致した箇所と、移動先の行を強調する"""
+        query = self.search_result.query if self.search_result is not None else None
+        for row, (line_number, line) in enumerate(zip(line_numbers, lines)):
+            if line_number == self.current_match:
+                start = self.log_buffer.get_iter_at_line(row)
+                end = start.copy()
+                end.forward_to_line_end()
+                self.log_buffer.apply_tag(self.current_tag, start, end)
+            if query is None or query.pattern is None:
+                continue
+            for match in query.pattern.finditer(line.rstrip("\n")):
+                if match.start() == match.end():
+                    continue
+                self.log_buffer.apply_tag(
+                    self.match_tag,
+                    self.log_buffer.get_iter_at_line_offset(row, match.start()),
+                    self.log_buffer.get_iter_at_line_offset(row, match.end()),
+                )
 
-        # 自動スクロールを一番下に
-        GLib.idle_add(self.scroll_to_bottom)
+    def update_search(self) -> None:
+        """入力欄の内容で検索し直す (索引スレッドで実行され、結果は少しずつ増える)"""
+        level = int(self.level_combo.get_active_id() or 0)
+        context = self.search_entry.get_style_context()
+        try:
+            query = LogQuery(self.search_entry.get_text(), self.regex_check.get_active(), level)
+        except re.error as e:
+            context.add_class("error")
+            self.search_label.set_text(f"正規表現が正しくありません: {e}")
+            return
+        context.remove_class("error")
+        self.search_result = self.index.search(query)
+        self.current_match = None
+        self.on_archive_tick()
 
-    def scroll_to_bottom(self) -> None:
-        """スクロールを一番下に"""
-        end_iter = self.log_buffer.get_end_iter()
-        self.log_view.scroll_to_iter(end_iter, 0.0, True, 0.0, 1.0)
+    def update_search_label(self) -> None:
+        if self.search_result is None:
+            self.search_label.set_text("")
+            return
+        count = self.search_result.count()
+        suffix = "" if self.index.is_complete() else " (検索中…)"
+        self.search_label.set_text(f"{count:,} 件{suffix}")
+
+    def jump_to_match(self, forward: bool) -> None:
+        """表示位置 (または前回移動した行) から次・前の一致へ移動する"""
+        if self.search_result is None:
+            return
+        rows = self.visible_rows()
+        if self.current_match is not None:
+            origin = self.current_match
+        elif self.is_filtering():
+            origin = (self.search_result.slice(int(self.adjustment.get_value()), 1) or [-1])[0] - 1
+        else:
+            origin = int(self.adjustment.get_value()) - 1
+        target = self.search_result.next_line(origin) if forward else self.search_result.previous_line(origin)
+        if target is None:
+            return
+        self.current_match = target
+        self.follow_button.set_active(False)
+        # 移動先の行が表示エリアの上から3分の1に来るようにする
+        if self.is_filtering():
+            position = self.search_result.index_at_or_after(target) - rows // 3
+        else:
+            position = target - rows // 3
+        self.set_position(min(max(position, self.adjustment.get_lower()),
+                              self.adjustment.get_upper() - self.adjustment.get_page_size()))
+        self.render()
+
+    def on_filter_toggled(self, button: Gtk.ToggleButton) -> None:
+        # 表示していた行 (移動先があればその行) が見えるように位置を合わせる
+        anchor = self.current_match
+        if anchor is None and self.search_result is not None:
+            if button.get_active():
+                anchor = int(self.adjustment.get_value())
+            else:
+                anchor = (self.search_result.slice(int(self.adjustment.get_value()), 1) or [None])[0]
+        self.on_archive_tick()
+        if anchor is not None and not self.follow_button.get_active():
+            position = self.search_result.index_at_or_after(anchor) if self.is_filtering() else anchor
+            self.set_position(min(max(position - self.visible_rows() // 3, self.adjustment.get_lower()),
+                                  self.adjustment.get_upper() - self.adjustment.get_page_size()))
+            self.render()
+
+    def on_adjustment_changed(self, adjustment: Gtk.Adjustment) -> None:
+        if not self.updating_adjustment:
+            # 手動で末尾から離れたら追従をやめ、末尾まで戻したら再開する
+            at_end = adjustment.get_value() >= adjustment.get_upper() - adjustment.get_page_size()
+            if at_end != self.follow_button.get_active():
+                self.follow_button.set_active(at_end)
+        self.render()
+
+    def scroll_by(self, rows: float) -> None:
+        upper = self.adjustment.get_upper() - self.adjustment.get_page_size()
+        self.adjustment.set_value(min(max(self.adjustment.get_value() + rows, self.adjustment.get_lower()), upper))
+
+    def on_scroll(self, widget: Gtk.Widget, event: Gdk.EventScroll) -> bool:
+        if event.direction == Gdk.ScrollDirection.UP:
+            self.scroll_by(-3)
+        elif event.direction == Gdk.ScrollDirection.DOWN:
+            self.scroll_by(3)
+        elif event.direction == Gdk.ScrollDirection.SMOOTH:
+            self.scroll_by(event.get_scroll_deltas()[2] * 3)
+        else:
+            return False
+        return True
+
+    def on_key_press(self, widget: Gtk.Widget, event: Gdk.EventKey) -> bool:
+        page = self.adjustment.get_page_size()
+        control = event.state & Gdk.ModifierType.CONTROL_MASK
+        if control and event.keyval in (Gdk.KEY_f, Gdk.KEY_F):
+            self.search_entry.grab_focus()
+        elif self.search_entry.has_focus():
+            # 入力欄では Home / End などを文字の移動に使う
+            return False
+        elif event.keyval == Gdk.KEY_Page_Up:
+            self.scroll_by(-page)
+        elif event.keyval == Gdk.KEY_Page_Down:
+            self.scroll_by(page)
+        elif event.keyval == Gdk.KEY_Home and control:
+            self.adjustment.set_value(self.adjustment.get_lower())
+        elif event.keyval == Gdk.KEY_End and control:
+            self.follow_button.set_active(True)
+        else:
+            return False
+        return True
+
+    def on_follow_toggled(self, button: Gtk.ToggleButton) -> None:
+        if button.get_active():
+            # 取得が止まっていれば続きから取り込み、末尾を表示する
+            self.current_match = None
+            self.channel.restart()
+            self.on_archive_tick()
+
+    def on_destroy(self, widget: Gtk.Widget) -> None:
+        GLib.source_remove(self.flush_source_id)
+        self.index.stop()
 
     def close_window(self) -> None:
         """ウィンドウを閉じる"""
         self.destroy()
+
+
+# サービスごとの文字色 (順に割り当てる)
+SERVICE_COLORS = ["#1f77b4", "#d62728", "#2ca02c", "#9467bd", "#ff7f0e", "#17becf", "#8c564b", "#e377c2"]
+
+# 1回の反映でまとめる最大行数 (これを超える分は次の反映に回し、画面を止めない)
+MERGE_BATCH_LINES = 2000
+
+
+class MergedLogViewer(Gtk.Window):
+    """複数サービスのログをタイムスタンプ順にまとめて表示する。
+       サービスの表示切り替えはタグの表示・非表示だけで行い、ログの取得は続けたままにする。
+    """
+
+    def __init__(self, compose_dir: str, services: dict) -> None:
+        super().__init__(title="ログビューアー - まとめて表示")
+        self.compose_dir = compose_dir
+        hub = get_hub(get_backend(compose_dir))
+        self.set_border_width(10)
+        self.set_default_size(1000, 700)
+
+        # 開いている間は各サービスのログの取得を続ける (停止中のサービスも残っているログを取り込む)
+        channels = {service_name: hub.channel(service_name) for service_name in services}
+        self.subscriptions = [channel.subscribe("まとめて表示") for channel in channels.values()]
+        self.merger = LogMerger(channels, merged_log_tail)
+
+        self.build_ui(services)
+
+        self.flush_source_id = GLib.timeout_add(FLUSH_INTERVAL_MS, self.flush_merged_lines)
+        self.connect("destroy", self.on_destroy)
+        self.flush_merged_lines()
+
+    def build_ui(self, services: dict) -> None:
+        """UIを構築"""
+        main_layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.add(main_layout)
+
+        self.log_view = Gtk.TextView()
+        self.log_view.set_editable(False)
+        self.log_view.set_monospace(True)
+        self.log_view.set_wrap_mode(Gtk.WrapMode.WORD_CHAR)
+        self.log_buffer = self.log_view.get_buffer()
+        self.end_mark = self.log_buffer.create_mark("end", self.log_buffer.get_end_iter(), False)
+
+        # サービスごとの色と表示切り替え
+        service_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        self.service_tags = {}
+        for index, (service_name, container) in enumerate(services.items()):
+            color = SERVICE_COLORS[index % len(SERVICE_COLORS)]
+            self.service_tags[service_name] = self.log_buffer.create_tag(None, foreground=color)
+            check = Gtk.CheckButton()
+            label = Gtk.Label()
+            label.set_markup(f'<span foreground="{color}">■</span> {GLib.markup_escape_text(container.get("name", service_name))}')
+            check.add(label)
+            check.set_active(True)
+            check.connect("toggled", self.on_service_toggled, service_name)
+            service_box.pack_start(check, False, False, 0)
+        main_layout.pack_start(service_box, False, False, 0)
+
+        scroll = Gtk.ScrolledWindow()
+        scroll.set_policy(Gtk.PolicyType.AUTOMATIC, Gtk.PolicyType.AUTOMATIC)
+        scroll.add(self.log_view)
+        main_layout.pack_start(scroll, True, True, 0)
+
+        button_box = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        main_layout.pack_start(button_box, False, False, 0)
+
+        self.follow_button = Gtk.ToggleButton(label="追従")
+        self.follow_button.set_active(True)
+        self.follow_button.connect("toggled", lambda button: button.get_active() and self.scroll_to_bottom())
+        button_box.pack_start(self.follow_button, False, False, 0)
+
+        close_button = Gtk.Button(label="閉じる")
+        close_button.connect("clicked", lambda _: self.destroy())
+        button_box.pack_end(close_button, False, False, 0)
+
+    def flush_merged_lines(self) -> bool:
+        """時刻順にそろった行をまとめてバッファへ追加する"""
+        batch = self.merger.next_batch(MERGE_BATCH_LINES)
+        if not batch:
+            return True
+        # 同じサービスが続く行は1回の挿入にまとめる
+        start = 0
+        for index in range(1, len(batch) + 1):
+            if index == len(batch) or batch[index][0] != batch[start][0]:
+                text = "".join(line if line.endswith("\n") else line + "\n" for _, line in batch[start:index])
+                self.log_buffer.insert_with_tags(self.log_buffer.get_end_iter(), text, self.service_tags[batch[start][0]])
+                start = index
+
+        excess = self.log_buffer.get_line_count() - merged_log_max_lines
+        if excess > 0:
+            self.log_buffer.delete(self.log_buffer.get_start_iter(), self.log_buffer.get_iter_at_line(excess))
+
+        if self.follow_button.get_active():
+            self.scroll_to_bottom()
+        return True
+
+    def on_service_toggled(self, check: Gtk.CheckButton, service_name: str) -> None:
+        self.service_tags[service_name].set_property("invisible", not check.get_active())
+
+    def scroll_to_bottom(self) -> None:
+        self.log_buffer.move_mark(self.end_mark, self.log_buffer.get_end_iter())
+        self.log_view.scroll_to_mark(self.end_mark, 0.0, True, 0.0, 1.0)
+
+    def on_destroy(self, widget: Gtk.Widget) -> None:
+        GLib.source_remove(self.flush_source_id)
+        for subscription in self.subscriptions:
+            subscription.close()
@@ -1,14 +1,23 @@
+import startup
 import gi
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk
+from gi.repository import Gtk, GLib
+import dispatch
+import diagnostics
 from ui import BackendManager
 
 
 def main() -> None:
     """アプリケーションのエントリーポイント"""
+    startup.mark("imports")
+    # バックグラウンドスレッドからの通知はメインループで実行する
+    dispatch.set_dispatcher(GLib.idle_add)
+    # メインループの停止を監視する
+    diagnostics.start_watchdog(GLib.timeout_add)
     app = BackendManager()
     app.connect("destroy", Gtk.main_quit)
     app.show_all()
+    startup.mark("window_built")
     Gtk.main()
 
 
@@ -0,0 +1,172 @@
+import json
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Optional
+
+# ServiceMetrics が保持する系列
+SERIES = ("cpu", "memory", "net_rx", "net_tx", "block_read", "block_write")
+
+
+class RingBuffer:
+    """固定長の float 配列によるリングバッファ (古い値から上書きする)"""
+
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self._data = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, value: float) -> None:
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+
+    def latest(self, default: float = 0.0) -> float:
+        if not self._size:
+            return default
+        return self._data[self._next - 1]
+
+    def values(self, count: Optional[int] = None) -> list:
+        """古い順に最大 count 件を返す"""
+        count = self._size if count is None else min(count, self._size)
+        start = (self._next - count) % self.capacity
+        if start + count <= self.capacity:
+            return self._data[start:start + count].tolist()
+        return (self._data[start:] + self._data[:self._next]).tolist()
+
+
+class ServiceMetrics:
+    """1サービス分のリソース使用量の時系列。
+       CPU は %、メモリはバイト、ネットワークとブロック I/O は累積値から求めた bytes/s で保持する。
+    """
+
+    def __init__(self, capacity: int) -> None:
+        self.lock = threading.Lock()
+        self.timestamps = RingBuffer(capacity)
+        self.series: Dict[str, RingBuffer] = {name: RingBuffer(capacity) for name in SERIES}
+        self.memory_limit = 0.0
+        self._last_counters: Optional[tuple] = None
+
+    def add_sample(self, timestamp: float, cpu: float, memory: float, memory_limit: float,
+                   counters: tuple) -> None:
+        """counters は (net_rx, net_tx, block_read, block_write) の累積バイト数"""
+        with self.lock:
+            rates = (0.0, 0.0, 0.0, 0.0)
+            if self._last_counters is not None:
+                last_timestamp, last_values = self._last_counters
+                elapsed = timestamp - last_timestamp
+                if elapsed > 0:
+                    # コンテナの再起動でカウンタが戻った場合は 0 とする
+                    rates = tuple(max(0.0, (value - last) / elapsed) for value, last in zip(counters, last_values))
+            self._last_counters = (timestamp, counters)
+
+            self.timestamps.append(timestamp)
+            self.series["cpu"].append(cpu)
+            self.series["memory"].append(memory)
+            for name, rate in zip(SERIES[2:], rates):
+                self.series[name].append(rate)
+            self.memory_limit = memory_limit
+
+    def values(self, name: str, count: Optional[int] = None) -> list:
+        with self.lock:
+            return self.series[name].values(count)
+
+    def latest(self, name: str) -> float:
+        with self.lock:
+            return self.series[name].latest()
+
+
+def parse_stats_line(line: str) -> list:
+    """podman stats の出力1行 (CLI の {{json .}} / REST API のストリーム) を統計の一覧にする"""
+    # CLI は更新ごとに画面クリアのエスケープシーケンスを出すことがあるので読み飛ばす
+    start = line.find("{")
+    if start < 0:
+        return []
+    try:
+        data = json.loads(line[start:])
+    except json.JSONDecodeError:
+        return []
+    if "Stats" in data:
+        return data.get("Stats") or []
+    return [data]
+
+
+def format_bytes(value: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if value < 1024:
+            return f"{value:.0f}{unit}" if unit == "B" else f"{value:.1f}{unit}"
+        value /= 1024
+    return f"{value:.1f}TB"
+
+
+class MetricsCollector:
+    """podman stats をバックグラウンドで購読し、サービスごとの時系列に蓄積する"""
+
+    def __init__(self, backend, service_for_container: Callable[[str], Optional[str]],
+                 sample_callback: Callable[[str], None], capacity: int,
+                 retry_delay: float = 5.0) -> None:
+        self.backend = backend
+        self.service_for_container = service_for_container
+        self.sample_callback = sample_callback
+        self.capacity = capacity
+        self.retry_delay = retry_delay
+        self.metrics: Dict[str, ServiceMetrics] = {}
+        self.stream = None
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def get(self, service_name: str) -> Optional[ServiceMetrics]:
+        return self.metrics.get(service_name)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        stream = self.stream
+        if stream:
+            stream.close()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                # 対象を指定しないと起動中の全コンテナが流れてくるので、サービスに対応するものだけ拾う
+                self.stream = self.backend.open_stats_stream([])
+                for line in self.stream:
+                    self._handle_line(line)
+            except Exception as e:
+                print(f"エラー: podman stats の購読に失敗しました - {e}")
+            # 起動中のコンテナがないと stats は終了するので、しばらく待って再接続する
+            self._stop_event.wait(self.retry_delay)
+
+    def _handle_line(self, line: str) -> None:
+        now = time.time()
+        for stats in parse_stats_line(line):
+            service_name = self.service_for_container(stats.get("Name", ""))
+            if not service_name:
+                continue
+            metrics = self.metrics.get(service_name)
+            if metrics is None:
+                metrics = self.metrics[service_name] = ServiceMetrics(self.capacity)
+            metrics.add_sample(
+                now,
+                float(stats.get("CPU") or 0.0),
+                float(stats.get("MemUsage") or 0),
+                float(stats.get("MemLimit") or 0),
+                (
+                    float(stats.get("NetInput") or 0),
+                    float(stats.get("NetOutput") or 0),
+                    float(stats.get("BlockInput") or 0),
+                    float(stats.get("BlockOutput") or 0),
+                ),
+            )
+            self.sample_callback(service_name)
@@ -0,0 +1,281 @@
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+from compose_file import load_compose_file
+from config import orchestrator_poll_interval, orchestrator_ready_timeout
+
+# 各サービスの進行状況と表示名
+STEP_LABELS = {
+    "waiting": "依存先の準備を待機中",
+    "starting": "起動中",
+    "waiting_ready": "準備完了を待機中",
+    "ready": "準備完了",
+    "failed": "失敗",
+    "blocked": "中止 (依存先が失敗)",
+    "timeout": "準備完了になりませんでした",
+    "stop_waiting": "依存元の停止を待機中",
+    "stopping": "停止中",
+    "stopped": "停止済み",
+}
+
+# 起動の結果として終わりの状態
+START_FINISHED = {"ready", "failed", "blocked", "timeout"}
+
+
+class OrchestrationError(Exception):
+    """依存関係の循環や、存在しないサービスへの依存"""
+
+
+class ServiceNode:
+    """依存グラフのサービス1つ。depends_on は依存先 → 条件 (リスト形式で書かれた場合は None)"""
+
+    def __init__(self, name: str, depends_on: Dict[str, Optional[str]], has_healthcheck: bool) -> None:
+        self.name = name
+        self.depends_on = depends_on
+        self.has_healthcheck = has_healthcheck
+
+
+def parse_dependency_graph(services: dict) -> Dict[str, ServiceNode]:
+    """compose ファイルの services から依存グラフを作る"""
+    graph = {}
+    for name, definition in services.items():
+        definition = definition or {}
+        depends_on = definition.get("depends_on") or {}
+        if isinstance(depends_on, list):
+            depends_on = {dependency: None for dependency in depends_on}
+        else:
+            depends_on = {dependency: (options or {}).get("condition") for dependency, options in depends_on.items()}
+        healthcheck = definition.get("healthcheck") or {}
+        has_healthcheck = bool(healthcheck) and not healthcheck.get("disable", False) \
+            and healthcheck.get("test") not in (["NONE"], "NONE")
+        graph[name] = ServiceNode(name, depends_on, has_healthcheck)
+
+    for node in graph.values():
+        unknown = [dependency for dependency in node.depends_on if dependency not in graph]
+        if unknown:
+            raise OrchestrationError(f"{node.name} の依存先が見つかりません: {', '.join(unknown)}")
+    topological_levels(graph)
+    return graph
+
+
+def load_dependency_graph(compose_dir: str) -> Optional[Dict[str, ServiceNode]]:
+    """compose ファイルから依存グラフを作る。読めない場合は None"""
+    compose = load_compose_file(compose_dir)
+    services = (compose or {}).get("services") or {}
+    if not services:
+        return None
+    return parse_dependency_graph(services)
+
+
+def topological_levels(graph: Dict[str, ServiceNode], targets: Optional[Iterable[str]] = None) -> list:
+    """依存先が前に来るように段に分ける (同じ段のサービスは互いに独立)。循環していれば OrchestrationError"""
+    targets = set(graph) if targets is None else set(targets)
+    remaining = {name: {d for d in graph[name].depends_on if d in targets} for name in targets}
+    levels = []
+    while remaining:
+        level = sorted(name for name, dependencies in remaining.items() if not dependencies)
+        if not level:
+            raise OrchestrationError(f"依存関係が循環しています: {', '.join(sorted(remaining))}")
+        levels.append(level)
+        for name in level:
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies.difference_update(level)
+    return levels
+
+
+def with_dependencies(graph: Dict[str, ServiceNode], services: Iterable[str]) -> set:
+    """指定したサービスと、その依存先すべて"""
+    result = set()
+    stack = list(services)
+    while stack:
+        name = stack.pop()
+        if name in result or name not in graph:
+            continue
+        result.add(name)
+        stack.extend(graph[name].depends_on)
+    return result
+
+
+def container_health(container_data: dict) -> str:
+    """ヘルスチェックの結果 (healthy / unhealthy / starting / 空文字)"""
+    health = container_data.get("Health")
+    if health:
+        return str(health).lower()
+    status = str(container_data.get("Status") or "")
+    for value in ("unhealthy", "healthy", "starting"):
+        if f"({value})" in status or f"(health: {value})" in status:
+            return value
+    return ""
+
+
+def is_service_ready(node: ServiceNode, container_data: Optional[dict]) -> bool:
+    """起動したサービスが使える状態か (ヘルスチェックがあれば healthy、なければ running)"""
+    if not container_data or container_data.get("State") != "running":
+        return False
+    return not node.has_healthcheck or container_health(container_data) == "healthy"
+
+
+def is_dependency_satisfied(node: ServiceNode, condition: Optional[str], container_data: Optional[dict]) -> bool:
+    """依存元を起動してよいか。リスト形式の依存は is_service_ready と同じ基準で待つ"""
+    if not container_data:
+        return False
+    if condition == "service_completed_successfully":
+        return container_data.get("State") == "exited" and int(container_data.get("ExitCode") or 0) == 0
+    if condition == "service_started":
+        return container_data.get("State") == "running"
+    if condition == "service_healthy":
+        return container_data.get("State") == "running" and container_health(container_data) == "healthy"
+    return is_service_ready(node, container_data)
+
+
+class Orchestrator:
+    """依存グラフに沿ってサービスを起動・停止する。
+       - 起動: 依存先の条件を満たしたサービスから並行して起動する
+       - 停止: 依存元がすべて停止したサービスから並行して停止する (起動の逆順)
+       start() / stop() は完了まで戻らないので、ワーカースレッドから呼ぶ。
+       progress_callback(サービス名, 段階) は呼び出したスレッドから呼ばれる。
+    """
+
+    def __init__(self, backend, graph: Dict[str, ServiceNode],
+                 progress_callback: Callable[[str, str], None],
+                 poll_interval: float = orchestrator_poll_interval,
+                 ready_timeout: float = orchestrator_ready_timeout) -> None:
+        self.backend = backend
+        self.graph = graph
+        self.progress_callback = progress_callback
+        self.poll_interval = poll_interval
+        self.ready_timeout = ready_timeout
+        self.steps: Dict[str, str] = {}
+
+    def _set_step(self, service_name: str, step: str) -> None:
+        if self.steps.get(service_name) == step:
+            return
+        self.steps[service_name] = step
+        self.progress_callback(service_name, step)
+
+    def _launch(self, results: "queue.Queue", service_name: str, operation: Callable[[str], None]) -> None:
+        def run():
+            try:
+                operation(service_name)
+                results.put((service_name, None))
+            except Exception as e:
+                results.put((service_name, e))
+        threading.Thread(target=run, daemon=True).start()
+
+    def _poll(self) -> Dict[str, dict]:
+        try:
+            return self.backend.list_services()
+        except Exception as e:
+            print(f"エラー: 準備状況の取得に失敗しました - {e}")
+            return {}
+
+    def start(self, services: Optional[Iterable[str]] = None) -> bool:
+        """サービス (省略時はすべて) を依存先から順に起動する。すべて準備完了になれば True"""
+        targets = set(self.graph) if services is None else with_dependencies(self.graph, services)
+        topological_levels(self.graph, targets)
+        for name in sorted(targets):
+            self._set_step(name, "waiting")
+
+        results: "queue.Queue" = queue.Queue()
+        containers: Dict[str, dict] = {}
+        # 起動した時刻と、依存先がすべて準備完了になった時刻 (どちらも準備待ちのタイムアウトの基準)
+        launched_at: Dict[str, float] = {}
+        unblocked_at: Dict[str, float] = {}
+
+        while any(self.steps[name] not in START_FINISHED for name in targets):
+            now = time.monotonic()
+            # 依存先の条件を満たしたサービスを起動する (失敗した依存先があれば中止)
+            for name in sorted(targets):
+                if self.steps[name] != "waiting":
+                    continue
+                dependencies = {d: c for d, c in self.graph[name].depends_on.items() if d in targets}
+                if any(self.steps[d] in ("failed", "blocked", "timeout") for d in dependencies):
+                    self._set_step(name, "blocked")
+                elif all(is_dependency_satisfied(self.graph[d], c, containers.get(d)) for d, c in dependencies.items()):
+                    self._set_step(name, "starting")
+                    launched_at[name] = now
+                    self._launch(results, name, self.backend.start_service)
+                elif all(self.steps[d] == "ready" for d in dependencies):
+                    # 依存先は準備完了でも条件 (正常終了など) を満たさないまま時間が過ぎたら諦める
+                    unblocked_at.setdefault(name, now)
+                    if now - unblocked_at[name] > self.ready_timeout:
+                        self._set_step(name, "timeout")
+
+            if all(self.steps[name] in START_FINISHED for name in targets):
+                break
+
+            # 起動コマンドの完了を待ち、準備待ちのサービスがあれば状態を確認する
+            try:
+                name, error = results.get(timeout=self.poll_interval)
+                if error is not None:
+                    print(f"エラー: {name} の起動に失敗しました - {error}")
+                    self._set_step(name, "failed")
+                else:
+                    self._set_step(name, "waiting_ready")
+            except queue.Empty:
+                pass
+
+            if not any(step in ("waiting", "waiting_ready") for step in self.steps.values()):
+                continue
+            containers = self._poll()
+            now = time.monotonic()
+            for name in targets:
+                if self.steps[name] != "waiting_ready":
+                    continue
+                data = containers.get(name)
+                if self._is_start_complete(name, data):
+                    self._set_step(name, "ready")
+                elif data and data.get("State") == "exited" and int(data.get("ExitCode") or 0) != 0:
+                    self._set_step(name, "failed")
+                elif now - launched_at[name] > self.ready_timeout:
+                    self._set_step(name, "timeout")
+
+        return all(self.steps[name] == "ready" for name in targets)
+
+    def _is_start_complete(self, service_name: str, container_data: Optional[dict]) -> bool:
+        node = self.graph[service_name]
+        if is_service_ready(node, container_data):
+            return True
+        # 一度だけ実行するサービス (依存元が完了を待つもの) は正常終了で完了とする
+        waits_for_completion = any(
+            other.depends_on.get(service_name) == "service_completed_successfully" for other in self.graph.values()
+        )
+        return waits_for_completion and is_dependency_satisfied(
+            node, "service_completed_successfully", container_data
+        )
+
+    def stop(self, services: Optional[Iterable[str]] = None, remove: bool = False) -> bool:
+        """サービス (省略時はすべて) を依存元から順に停止する。remove なら最後に compose down する"""
+        targets = set(self.graph) if services is None else set(services)
+        topological_levels(self.graph, targets)
+        dependents = {name: {other for other in targets if name in self.graph[other].depends_on} for name in targets}
+        for name in sorted(targets):
+            self._set_step(name, "stop_waiting")
+
+        results: "queue.Queue" = queue.Queue()
+        finished: set = set()
+        ok = True
+        while len(finished) < len(targets):
+            for name in sorted(targets):
+                if self.steps[name] == "stop_waiting" and dependents[name] <= finished:
+                    self._set_step(name, "stopping")
+                    self._launch(results, name, self.backend.stop_service)
+            name, error = results.get()
+            finished.add(name)
+            if error is not None:
+                # 停止できなくても残りの停止は続ける
+                print(f"エラー: {name} の停止に失敗しました - {error}")
+                self._set_step(name, "failed")
+                ok = False
+            else:
+                self._set_step(name, "stopped")
+
+        if remove:
+            try:
+                self.backend.down_project()
+            except Exception as e:
+                print(f"エラー: コンテナの削除に失敗しました - {e}")
+                ok = False
+        return ok
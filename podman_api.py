@@ -0,0 +1,225 @@
+import http.client
+import json
+import queue
+import socket
+import struct
+from typing import Iterator, Optional
+from urllib.parse import urlencode, quote
+
+# 一度使った接続で送信に失敗した場合 (サーバー側で keep-alive が切れていた等) は新しい接続でやり直す
+RETRYABLE_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                    BrokenPipeError, ConnectionResetError)
+
+
+class PodmanAPIError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """UNIX ソケット経由の HTTP 接続"""
+
+    def __init__(self, socket_path: str, timeout: Optional[float] = None) -> None:
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+
+
+class LineStream:
+    """ストリーミング応答を1行ずつ返す。close() で接続ごと閉じる"""
+
+    def __init__(self, connection: UnixHTTPConnection, response: http.client.HTTPResponse,
+                 multiplexed: bool = False) -> None:
+        self.connection = connection
+        self.response = response
+        self.multiplexed = multiplexed
+
+    def __iter__(self) -> Iterator[str]:
+        try:
+            if self.multiplexed:
+                yield from self._iter_frames()
+            else:
+                for raw in self.response:
+                    yield raw.decode("utf-8", errors="replace")
+        except (OSError, ValueError, http.client.HTTPException):
+            # close() による中断や切断はストリームの終端として扱う
+            return
+
+    def _iter_frames(self) -> Iterator[str]:
+        """stdout/stderr が多重化されたログ (8バイトのヘッダー + 本体) を行に戻す。
+           TTY 付きのコンテナはヘッダーなしで送られてくるので、その場合はそのまま行に分ける。
+        """
+        partial = b""
+        first = True
+        while True:
+            header = self.response.read(8)
+            if first and header and (header[0] not in (0, 1, 2) or header[1:4] != b"\0\0\0"):
+                partial = header
+                for raw in self.response:
+                    partial += raw
+                    *lines, partial = partial.split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8", errors="replace") + "\n"
+                break
+            first = False
+            if len(header) < 8:
+                break
+            _, size = struct.unpack(">BxxxL", header)
+            partial += self.response.read(size)
+            *lines, partial = partial.split(b"\n")
+            for line in lines:
+                yield line.decode("utf-8", errors="replace") + "\n"
+        if partial:
+            yield partial.decode("utf-8", errors="replace") + "\n"
+
+    def close(self) -> None:
+        try:
+            if self.connection.sock:
+                self.connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+
+
+class PodmanAPIClient:
+    """Podman (libpod) REST API クライアント。
+       通常のリクエストは keep-alive 接続をプールして使い回し、ストリーミングには専用の接続を使う。
+    """
+
+    def __init__(self, socket_path: str, api_version: str = "v4.0.0",
+                 pool_size: int = 4, timeout: float = 30.0) -> None:
+        self.socket_path = socket_path
+        self.api_version = api_version
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[UnixHTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+
+    def _url(self, path: str, params: Optional[dict] = None) -> str:
+        url = f"/{self.api_version}/libpod{path}"
+        if params:
+            url += "?" + urlencode(params, doseq=True)
+        return url
+
+    def _acquire(self) -> UnixHTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def _release(self, connection: UnixHTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def request(self, method: str, path: str, params: Optional[dict] = None) -> tuple:
+        """リクエストを送り (ステータス, 本文) を返す"""
+        url = self._url(path, params)
+        connection = self._acquire()
+        for attempt in range(2):
+            try:
+                connection.request(method, url)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except RETRYABLE_ERRORS:
+                connection.close()
+                if attempt:
+                    raise
+                connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+            except Exception:
+                connection.close()
+                raise
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+        return response.status, body
+
+    def request_json(self, method: str, path: str, params: Optional[dict] = None):
+        status, body = self.request(method, path, params)
+        if status >= 400:
+            raise PodmanAPIError(status, self._error_message(body))
+        return json.loads(body) if body else None
+
+    def stream(self, path: str, params: Optional[dict] = None, multiplexed: bool = False) -> LineStream:
+        """ストリーミング応答を開く (タイムアウトなしの専用接続)"""
+        connection = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            connection.request("GET", self._url(path, params))
+            response = connection.getresponse()
+        except Exception:
+            connection.close()
+            raise
+        if response.status >= 400:
+            body = response.read()
+            connection.close()
+            raise PodmanAPIError(response.status, self._error_message(body))
+        return LineStream(connection, response, multiplexed)
+
+    @staticmethod
+    def _error_message(body: bytes) -> str:
+        try:
+            return json.loads(body).get("message", "")
+        except (ValueError, AttributeError):
+            return body.decode("utf-8", errors="replace")
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    # --- コンテナ操作 ---
+
+    def list_containers(self, filters: Optional[dict] = None) -> list:
+        params = {"all": "true"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return self.request_json("GET", "/containers/json", params) or []
+
+    def inspect_container(self, name: str) -> dict:
+        return self.request_json("GET", f"/containers/{quote(name, safe='')}/json")
+
+    def start_container(self, name: str) -> None:
+        status, body = self.request("POST", f"/containers/{quote(name, safe='')}/start")
+        # 304 は既に起動済み
+        if status >= 400:
+            raise PodmanAPIError(status, self._error_message(body))
+
+    def stop_container(self, name: str, timeout: int = 10) -> None:
+        status, body = self.request("POST", f"/containers/{quote(name, safe='')}/stop", {"timeout": timeout})
+        # 304 は既に停止済み
+        if status >= 400:
+            raise PodmanAPIError(status, self._error_message(body))
+
+    def logs(self, name: str, follow: bool = False, tail: Optional[int] = None,
+             since: Optional[str] = None, timestamps: bool = True) -> LineStream:
+        params = {"stdout": "true", "stderr": "true",
+                  "follow": str(follow).lower(), "timestamps": str(timestamps).lower()}
+        if tail is not None:
+            params["tail"] = str(tail)
+        if since is not None:
+            params["since"] = since
+        return self.stream(f"/containers/{quote(name, safe='')}/logs", params, multiplexed=True)
+
+    def stats(self, names: list, stream: bool = True, interval: int = 1) -> LineStream:
+        params = {"containers": names, "stream": str(stream).lower(), "interval": interval}
+        return self.stream("/containers/stats", params)
+
+    def events(self, filters: Optional[dict] = None) -> LineStream:
+        params = {"stream": "true"}
+        if filters:
+            params["filters"] = json.dumps(filters)
+        return self.stream("/events", params)
@@ -0,0 +1,232 @@
+import socket
+import threading
+import time
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+from metrics import RingBuffer
+from workers import WorkerPool
+from config import probe_interval, probe_max_interval, probe_timeout, probe_concurrency, probe_history_size
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# 使い回した接続が相手に閉じられていたときに出る例外 (1回だけ張り直して再試行する)
+STALE_CONNECTION_ERRORS = (ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+
+class Endpoint:
+    """確認するリンク1つ。HTTP は接続を使い回し、tcp:// は接続できるかだけを見る"""
+
+    def __init__(self, service_name: str, name: str, url: str) -> None:
+        self.service_name = service_name
+        self.name = name
+        self.url = url
+        parsed = urlsplit(url)
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or DEFAULT_PORTS.get(self.scheme, 80)
+        self.path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+
+        self.latencies = RingBuffer(probe_history_size)
+        # None: 未確認 (またはサービス停止中)
+        self.ok: Optional[bool] = None
+        self.detail = ""
+        self.failures = 0
+        self.next_due = 0.0
+        self.in_flight = False
+        self.connection = None
+
+    def probe(self, timeout: float) -> float:
+        """1回確認して所要時間を返す。応答がなければ例外"""
+        started = time.perf_counter()
+        if self.scheme in ("http", "https"):
+            self.detail = self._probe_http(timeout)
+        else:
+            with socket.create_connection((self.host, self.port), timeout=timeout):
+                pass
+            self.detail = "接続可"
+        return time.perf_counter() - started
+
+    def _probe_http(self, timeout: float) -> str:
+        reused = self.connection is not None
+        try:
+            return self._request(timeout)
+        except STALE_CONNECTION_ERRORS + (ConnectionError,) as e:
+            self.close()
+            if not reused or isinstance(e, ConnectionRefusedError):
+                raise
+            return self._request(timeout)
+
+    def _request(self, timeout: float) -> str:
+        # http.client は読み込みが重いので、確認を始めるときに読み込む
+        import http.client
+        if self.connection is None:
+            if self.scheme == "https":
+                import ssl
+                # 応答があるかを見るだけなので、自己署名の証明書でも接続する
+                context = ssl._create_unverified_context()
+                self.connection = http.client.HTTPSConnection(self.host, self.port, timeout=timeout, context=context)
+            else:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+        try:
+            self.connection.request("GET", self.path, headers={"Connection": "keep-alive"})
+            response = self.connection.getresponse()
+            response.read()
+        except http.client.RemoteDisconnected as e:
+            raise ConnectionResetError(str(e)) from e
+        except (http.client.HTTPException, OSError):
+            self.close()
+            raise
+        if response.will_close:
+            self.close()
+        if response.status >= 500:
+            raise ConnectionError(f"HTTP {response.status}")
+        return f"HTTP {response.status}"
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+class EndpointProber:
+    """サービスのリンクに応答があるかをバックグラウンドで並行して確認する。
+       - 起動中のサービスだけを確認する
+       - 応答がない間は確認の間隔を倍々に延ばす (probe_max_interval まで)
+       update_callback(サービス名) は確認のたびに確認スレッドから呼ばれる。
+    """
+
+    def __init__(self, update_callback: Callable[[str], None],
+                 interval: float = probe_interval, max_interval: float = probe_max_interval,
+                 timeout: float = probe_timeout, concurrency: int = probe_concurrency) -> None:
+        self.update_callback = update_callback
+        self.interval = interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.endpoints: Dict[tuple, Endpoint] = {}
+        self.active_services: set = set()
+        self._lock = threading.Lock()
+        self._pool = WorkerPool(concurrency, name="probe-worker")
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def set_targets(self, services: Dict[str, dict]) -> None:
+        """サービス名 → サービス定義 (links を持つ) から確認対象を決め直す。既存の履歴は引き継ぐ"""
+        with self._lock:
+            endpoints = {}
+            for service_name, container in services.items():
+                for link in container.get("links", []):
+                    key = (service_name, link["url"])
+                    endpoints[key] = self.endpoints.get(key) or Endpoint(service_name, link["name"], link["url"])
+            for key, endpoint in self.endpoints.items():
+                if key not in endpoints:
+                    endpoint.close()
+            self.endpoints = endpoints
+        self._wake.set()
+
+    def set_service_active(self, service_name: str, active: bool) -> None:
+        """コンテナが起動したらすぐに確認し、停止したら確認をやめて状態を未確認に戻す"""
+        with self._lock:
+            if (service_name in self.active_services) == active:
+                return
+            if active:
+                self.active_services.add(service_name)
+            else:
+                self.active_services.discard(service_name)
+            for endpoint in self.endpoints.values():
+                if endpoint.service_name == service_name:
+                    endpoint.ok = None
+                    endpoint.failures = 0
+                    endpoint.next_due = 0.0
+                    if not active:
+                        endpoint.close()
+        self._wake.set()
+        if not active:
+            self.update_callback(service_name)
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            next_due = now + self.max_interval
+            with self._lock:
+                for endpoint in self.endpoints.values():
+                    if endpoint.service_name not in self.active_services or endpoint.in_flight:
+                        continue
+                    if endpoint.next_due <= now:
+                        endpoint.in_flight = True
+                        self._pool.submit(self._probe, endpoint)
+                    else:
+                        next_due = min(next_due, endpoint.next_due)
+            self._wake.wait(max(0.0, next_due - now))
+            self._wake.clear()
+
+    def _probe(self, endpoint: Endpoint) -> None:
+        try:
+            elapsed = endpoint.probe(self.timeout)
+            error = None
+        except Exception as e:
+            elapsed = None
+            error = e
+        with self._lock:
+            endpoint.in_flight = False
+            if endpoint.service_name not in self.active_services:
+                # 確認中にサービスが停止した
+                return
+            if error is None:
+                endpoint.ok = True
+                endpoint.failures = 0
+                endpoint.latencies.append(elapsed)
+                delay = self.interval
+            else:
+                endpoint.ok = False
+                endpoint.failures += 1
+                endpoint.detail = describe_error(error)
+                delay = min(self.max_interval, self.interval * 2 ** (endpoint.failures - 1))
+            endpoint.next_due = time.monotonic() + delay
+        self._wake.set()
+        self.update_callback(endpoint.service_name)
+
+    def summary(self, service_name: str) -> Optional[dict]:
+        """カード表示用の要約。確認対象がなければ None
+           state: ready (すべて応答) / partial (一部応答) / down (応答なし) / unknown (未確認・停止中)
+        """
+        with self._lock:
+            endpoints = [e for e in self.endpoints.values() if e.service_name == service_name]
+            if not endpoints:
+                return None
+            results = [e.ok for e in endpoints]
+            latencies = sorted(value for e in endpoints for value in e.latencies.values())
+            details = [(e.name, e.ok, e.detail) for e in endpoints]
+        if any(ok is None for ok in results):
+            state = "unknown"
+        elif all(results):
+            state = "ready"
+        elif any(results):
+            state = "partial"
+        else:
+            state = "down"
+        return {
+            "state": state,
+            "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else None,
+            "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000 if latencies else None,
+            "endpoints": details,
+        }
+
+
+def describe_error(error: Exception) -> str:
+    if isinstance(error, ConnectionRefusedError):
+        return "接続拒否"
+    if isinstance(error, (socket.timeout, TimeoutError)):
+        return "タイムアウト"
+    return str(error) or type(error).__name__
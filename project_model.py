@@ -0,0 +1,431 @@
+import threading
+import time
+from typing import Dict, Callable, Optional
+from dispatch import dispatch
+from commands import execute_command, execute_task
+from diagnostics import describe_command, timings
+from backend import get_backend
+from scheduler import JobScheduler, ALL_SERVICES
+from workers import worker_pool
+from command_history import command_history
+from state_history import state_history
+from metrics import MetricsCollector
+from probes import EndpointProber
+from log_hub import get_hub
+from compose_file import discover_services
+from orchestrator import Orchestrator, OrchestrationError, load_dependency_graph, STEP_LABELS, container_health
+from refresh import is_transitional
+from config import job_max_concurrency, metrics_history_size
+
+# カードの表示に影響する項目。これ以外 (経過時間の表記など) の変化ではウィジェットを更新しない
+SNAPSHOT_KEYS = ("ID", "State", "Health", "ExitCode")
+
+
+def snapshot_key(container_data: dict) -> tuple:
+    # Health がなく Status にだけ書かれるヘルスチェックの結果も変化として扱う
+    return tuple(container_data.get(key) for key in SNAPSHOT_KEYS) + (container_health(container_data),)
+
+
+class ProjectModel:
+    """compose プロジェクト1つ分の状態と操作 (GTK に依存しない部分)。
+       バックグラウンドの結果は dispatch() 経由で届き、表示側は on_* を上書きして受け取る。
+    """
+
+    def __init__(self, compose_dir: str, status_callback: Optional[Callable[[str], None]] = None) -> None:
+        self.compose_dir = compose_dir
+        self.backend = get_backend(compose_dir)
+        # 表示対象のサービス (compose ファイルから検出)
+        self.services: Dict[str, dict] = {}
+        # サービスごとに最後に観測したコンテナ情報
+        self.container_states: Dict[str, dict] = {}
+        self.status_callback = status_callback
+        self.snapshot_callback: Optional[Callable[[Dict[str, dict]], None]] = None
+        # 前回反映したサービスごとの状態 (差分の比較用)
+        self.snapshot: Dict[str, tuple] = {}
+        self.last_updated: Optional[float] = None
+        # 操作ごとの最後の結果 (サービス名または ALL_SERVICES → 成功したか)
+        self.operation_results: Dict[str, bool] = {}
+
+        self._refresh_lock = threading.Lock()
+        self._refresh_in_flight = False
+        self._refresh_waiters: list = []
+
+        # リソース使用量の収集 (コンテナ名 → サービス名の対応は状態取得のたびに更新する)
+        self.container_services: Dict[str, str] = {}
+        self._metrics_dirty: set = set()
+        self._metrics_lock = threading.Lock()
+        self.metrics_collector = MetricsCollector(
+            self.backend,
+            service_for_container=self.container_services.get,
+            sample_callback=self._queue_metrics_update,
+            capacity=metrics_history_size,
+        )
+
+        # リンクの応答確認 (起動中のサービスだけ。更新はメトリクスと同様にまとめて反映する)
+        self._probes_dirty: set = set()
+        self._probes_lock = threading.Lock()
+        self.prober = EndpointProber(self._queue_probes_update)
+
+        # ログの記録 (start_log_archive() 後、起動中のサービスのログを購読し続ける)
+        self.log_hub = get_hub(self.backend)
+
+        # サービスごとの操作キュー (変化は dispatch 先で jobs_callback に通知する)
+        self.jobs_callback: Optional[Callable[[str], None]] = None
+        self.scheduler = JobScheduler(
+            max_concurrency=job_max_concurrency,
+            change_callback=lambda: dispatch(self._notify_jobs),
+            submit=worker_pool.submit,
+            cancel_callback=lambda jobs: dispatch(self._jobs_cancelled, [job.key for job in jobs]),
+        )
+
+    def set_status_callback(self, callback: Callable[[str], None]):
+        self.status_callback = callback
+
+    def set_jobs_callback(self, callback: Callable[[str], None]):
+        self.jobs_callback = callback
+
+    def _notify_jobs(self) -> None:
+        if self.jobs_callback:
+            self.jobs_callback(self.scheduler.describe())
+
+    def set_snapshot_callback(self, callback: Callable[[Dict[str, dict]], None]):
+        self.snapshot_callback = callback
+
+    # 表示側が上書きする通知 (いずれも dispatch 先のスレッドで呼ばれる)
+
+    def on_services_changed(self, added: list, removed: set) -> None:
+        """サービスの追加・削除"""
+
+    def on_service_updated(self, service_name: str, container_data: dict, changed: bool) -> None:
+        """状態の取得・イベントのたびに呼ばれる。changed はスナップショットが変わったかどうか"""
+
+    def on_metrics_updated(self, service_names: set) -> None:
+        """リソース使用量の新しいサンプル"""
+
+    def on_probes_updated(self, service_names: set) -> None:
+        """リンクの応答確認の結果 (prober.summary() で取得する)"""
+
+    def on_operation_finished(self, service_name: str) -> None:
+        """サービスの操作が (成否にかかわらず) 終わった・取り消された・全体操作が終わった"""
+
+    def on_orchestration_progress(self, service_name: str, step: str) -> None:
+        """依存関係に沿った起動・停止での各サービスの段階 (orchestrator.STEP_LABELS のキー)"""
+
+    def on_orchestration_finished(self, steps: Dict[str, str]) -> None:
+        """依存関係に沿った起動・停止が終わった。steps は各サービスの最後の段階"""
+
+    def sync_services(self, discovered: list) -> None:
+        """検出したサービス一覧とモデルを揃える (変化がなければ何もしない)"""
+        names = [container["service"] for container in discovered]
+        if names == list(self.services):
+            return
+
+        removed = set(self.services) - set(names)
+        for service_name in removed:
+            self.container_states.pop(service_name, None)
+            self.snapshot.pop(service_name, None)
+
+        added = [container for container in discovered if container["service"] not in self.services]
+        self.services = {container["service"]: container for container in discovered}
+        self.prober.set_targets(self.services)
+        self.on_services_changed(added, removed)
+
+    def update_container_status(self, callback: Optional[Callable[[Dict[str, dict]], None]] = None) -> None:
+        """Podmanの状態を共有ワーカープールで取得し、結果だけを dispatch 先で反映する。
+           取得中に来た要求は新たにコマンドを実行せず、実行中の結果を共有する。
+           callback には取得結果 (失敗時は None) が渡される。
+        """
+        with self._refresh_lock:
+            if callback:
+                self._refresh_waiters.append(callback)
+            if self._refresh_in_flight:
+                return
+            self._refresh_in_flight = True
+        worker_pool.submit(self._refresh_worker)
+
+    def is_refreshing(self) -> bool:
+        with self._refresh_lock:
+            return self._refresh_in_flight
+
+    def _refresh_worker(self) -> None:
+        containers = None
+        started = time.monotonic()
+        # compose ファイルは更新されていなければキャッシュが返る
+        discovered = discover_services(self.compose_dir)
+        try:
+            containers = self.backend.list_services()
+        except Exception as e:
+            print(f"エラー: 状況の更新に失敗しました - {e}")
+        timings.record("refresh", self.backend.name, time.monotonic() - started)
+        dispatch(self._finish_refresh, containers, discovered)
+
+    def _finish_refresh(self, containers: Optional[Dict[str, dict]], discovered: list) -> None:
+        with self._refresh_lock:
+            waiters = self._refresh_waiters
+            self._refresh_waiters = []
+            self._refresh_in_flight = False
+        self.sync_services(discovered)
+        if containers is None:
+            # 待っている側には失敗 (None) を伝える
+            for waiter in waiters:
+                waiter(None)
+            return
+
+        self.reconcile(containers)
+        self.last_updated = time.time()
+        self.container_services.clear()
+        self.container_services.update(
+            {data["Name"]: service_name for service_name, data in containers.items() if data.get("Name")}
+        )
+
+        if self.snapshot_callback:
+            self.snapshot_callback(containers)
+        for waiter in waiters:
+            waiter(containers)
+
+    def get_data_age(self) -> Optional[float]:
+        """最後に状態を取得してからの経過秒数 (未取得なら None)"""
+        if self.last_updated is None:
+            return None
+        return time.time() - self.last_updated
+
+    def reconcile(self, containers: Dict[str, dict]) -> list:
+        """前回のスナップショットと比較し、変化したサービス名の一覧を返す。
+           ここからコマンドが発行されることはない。
+        """
+        changed = []
+        for service_name in self.services:
+            container_data = containers.get(service_name, {"State": "stopped", "Service": service_name})
+            self.container_states[service_name] = container_data
+            self.prober.set_service_active(service_name, container_data.get("State") == "running")
+            self.log_hub.set_service_active(service_name, container_data.get("State") == "running")
+            key = snapshot_key(container_data)
+            if self.snapshot.get(service_name) == key:
+                self.on_service_updated(service_name, container_data, False)
+                continue
+            self.snapshot[service_name] = key
+            state_history.observe(self.backend.project, service_name, container_data)
+            self.on_service_updated(service_name, container_data, True)
+            changed.append(service_name)
+        return changed
+
+    def apply_service_state(self, service_name: str, state: str) -> None:
+        """イベントで受け取ったサービス単位の状態変化を反映する"""
+        if service_name not in self.services:
+            return
+        container_data = dict(self.container_states.get(service_name, {"Service": service_name}))
+        container_data["State"] = state
+        self.container_states[service_name] = container_data
+        self.prober.set_service_active(service_name, state == "running")
+        self.log_hub.set_service_active(service_name, state == "running")
+        key = snapshot_key(container_data)
+        if self.snapshot.get(service_name) == key:
+            return
+        self.snapshot[service_name] = key
+        # イベントには終了コードがないので、前回の値を記録しない
+        state_history.observe(self.backend.project, service_name,
+                              {k: v for k, v in container_data.items() if k != "ExitCode"})
+        self.on_service_updated(service_name, container_data, True)
+
+    def start_metrics(self) -> None:
+        self.metrics_collector.start()
+
+    def stop_metrics(self) -> None:
+        self.metrics_collector.stop()
+
+    def _queue_metrics_update(self, service_name: str) -> None:
+        """収集スレッドから呼ばれる。まとめて1回の dispatch で反映する"""
+        with self._metrics_lock:
+            schedule = not self._metrics_dirty
+            self._metrics_dirty.add(service_name)
+        if schedule:
+            dispatch(self._flush_metrics)
+
+    def _flush_metrics(self) -> None:
+        with self._metrics_lock:
+            dirty = self._metrics_dirty
+            self._metrics_dirty = set()
+        self.on_metrics_updated(dirty)
+
+    def start_probes(self) -> None:
+        self.prober.start()
+
+    def stop_probes(self) -> None:
+        self.prober.stop()
+
+    def start_log_archive(self) -> None:
+        self.log_hub.start()
+
+    def stop_log_archive(self) -> None:
+        self.log_hub.stop()
+
+    def _queue_probes_update(self, service_name: str) -> None:
+        """確認スレッドから呼ばれる。まとめて1回の dispatch で反映する"""
+        with self._probes_lock:
+            schedule = not self._probes_dirty
+            self._probes_dirty.add(service_name)
+        if schedule:
+            dispatch(self._flush_probes)
+
+    def _flush_probes(self) -> None:
+        with self._probes_lock:
+            dirty = self._probes_dirty
+            self._probes_dirty = set()
+        self.on_probes_updated(dirty)
+
+    def _run_operation(self, command: list, task: Optional[Callable[[], None]],
+                       start_msg: str, done_msg: str, fail_msg: str) -> bool:
+        """スケジューラのワーカーから呼ばれ、操作を完了まで実行する。成功なら True。
+           実行したコマンドと出力はコマンドコンソール (command_history) に残す。
+        """
+        messages = dict(
+            start_msg=start_msg,
+            done_msg=done_msg,
+            fail_msg=fail_msg,
+            status_callback=self.status_callback,
+            done_callback=self.update_container_status,
+        )
+        job = command_history.begin(self.backend.project, start_msg, command)
+        ok = False
+        try:
+            if task is not None and self.backend.name == "api":
+                subcommand, service = describe_command(command)
+                ok = execute_task(task, timing_key=f"{service or '*'} {subcommand}", **messages)
+            else:
+                ok = execute_command(command, cwd=self.compose_dir, output=job.append,
+                                     exit_callback=job.set_exit_code, **messages)
+        finally:
+            job.finish(ok)
+        return ok
+
+    def _operation_finished(self, service_name: str) -> None:
+        """操作の完了後 (失敗時も) に表示側へ伝え、状態を取り直す"""
+        self.on_operation_finished(service_name)
+        self.update_container_status()
+
+    def _release_services(self, service_names) -> None:
+        """操作を待っていないサービスについて、操作が終わったことを表示側へ伝える"""
+        for service_name in service_names:
+            if not self.scheduler.is_pending(service_name) and not self.scheduler.is_running(service_name):
+                self.on_operation_finished(service_name)
+
+    def _jobs_cancelled(self, keys: list) -> None:
+        """待機中の操作が取り消された (全体操作に置き換えられた場合も含む)"""
+        for key in keys:
+            self._release_services(list(self.services) if key == ALL_SERVICES else [key])
+
+    def _run_service_operation(self, service_name: str, *args, **kwargs) -> None:
+        ok = False
+        try:
+            ok = self._run_operation(*args, **kwargs)
+        finally:
+            self.operation_results[service_name] = ok
+            dispatch(self._operation_finished, service_name)
+
+    def _run_all_operation(self, *args, **kwargs) -> None:
+        try:
+            self.operation_results[ALL_SERVICES] = self._run_operation(*args, **kwargs)
+        finally:
+            dispatch(self._release_services, list(self.services))
+
+    def _run_orchestrated(self, action: str, command: list, start_msg: str, done_msg: str, fail_msg: str) -> None:
+        """compose ファイルの依存関係に沿ってすべてのサービスを起動・停止する。
+           依存関係が読めない場合は compose コマンド1回で実行する。
+        """
+        try:
+            graph = load_dependency_graph(self.compose_dir)
+        except OrchestrationError as e:
+            print(f"警告: 依存関係を使わずに実行します - {e}")
+            graph = None
+        if graph is None:
+            self._run_all_operation(command, None, start_msg=start_msg, done_msg=done_msg, fail_msg=fail_msg)
+            return
+
+        job = command_history.begin(self.backend.project, start_msg, ["orchestrated", action])
+
+        def notify(message: str) -> None:
+            job.append(f"{message}\n")
+            if self.status_callback:
+                dispatch(self.status_callback, message)
+
+        finished_step = "ready" if action == "start" else "stopped"
+
+        def progress(service_name: str, step: str) -> None:
+            dispatch(self.on_orchestration_progress, service_name, step)
+            done = sum(s == finished_step for s in orchestrator.steps.values())
+            notify(f"{start_msg} {done}/{len(graph)} {STEP_LABELS[finished_step]} ({service_name}: {STEP_LABELS[step]})")
+
+        orchestrator = Orchestrator(self.backend, graph, progress)
+        notify(start_msg)
+        started = time.monotonic()
+        ok = False
+        try:
+            ok = orchestrator.start() if action == "start" else orchestrator.stop(remove=True)
+        except Exception as e:
+            print(f"エラー: {fail_msg} - {e}")
+            job.append(f"ERROR: {e}\n")
+        timings.record("task", f"* orchestrated {action}", time.monotonic() - started)
+
+        failed = sorted(name for name, step in orchestrator.steps.items() if step != finished_step)
+        notify(done_msg if ok else f"{fail_msg} - {', '.join(failed)}")
+        job.finish(ok)
+        self.operation_results[ALL_SERVICES] = ok
+        dispatch(self._release_services, list(self.services))
+        dispatch(self.on_orchestration_finished, dict(orchestrator.steps))
+        dispatch(self.update_container_status)
+
+    def start_container(self, service_name: str):
+        return self.scheduler.submit(service_name, "start", f"{service_name} 起動", lambda: self._run_service_operation(
+            service_name,
+            ["podman", "compose", "up", "-d", service_name],
+            lambda: self.backend.start_service(service_name),
+            start_msg=f"{service_name} 起動中...",
+            done_msg=f"{service_name} が起動しました",
+            fail_msg=f"{service_name} の起動に失敗しました",
+        ))
+
+    def stop_container(self, service_name: str):
+        return self.scheduler.submit(service_name, "stop", f"{service_name} 停止", lambda: self._run_service_operation(
+            service_name,
+            ["podman", "compose", "stop", service_name],
+            lambda: self.backend.stop_service(service_name),
+            start_msg=f"{service_name} 停止中...",
+            done_msg=f"{service_name} が停止しました",
+            fail_msg=f"{service_name} の停止に失敗しました",
+        ))
+
+    def start_all_containers(self):
+        return self.scheduler.submit(ALL_SERVICES, "start", "すべて起動", lambda: self._run_orchestrated(
+            "start",
+            ["podman", "compose", "up", "-d"],
+            start_msg="すべてのサービスを起動中...",
+            done_msg="すべてのサービスが起動しました",
+            fail_msg="すべてのコンテナの起動に失敗しました",
+        ), dedicated=True)
+
+    def stop_all_containers(self):
+        return self.scheduler.submit(ALL_SERVICES, "stop", "すべて停止", lambda: self._run_orchestrated(
+            "stop",
+            ["podman", "compose", "down"],
+            start_msg="すべてのサービスを停止中...",
+            done_msg="すべてのサービスが停止しました",
+            fail_msg="すべてのコンテナの停止に失敗しました",
+        ), dedicated=True)
+
+    def cancel_pending_jobs(self) -> int:
+        """待機中の操作をすべて取り消す"""
+        return self.scheduler.cancel_all()
+
+    def get_service_count(self) -> int:
+        return len(self.services)
+
+    def get_started_container_count(self) -> int:
+        return sum(data.get("State") == "running" for data in self.container_states.values())
+
+    def is_settling(self) -> bool:
+        """操作の実行中・待機中か、起動・停止やヘルスチェックの途中のサービスがあるか"""
+        running, pending = self.scheduler.get_counts()
+        return bool(running or pending) or any(is_transitional(data) for data in self.container_states.values())
+
+    def check_all_running(self) -> bool:
+        return self.get_started_container_count() == len(self.services)
@@ -0,0 +1,240 @@
+from gi.repository import Gtk, GLib
+from backend import get_backend
+from container import ContainerManager
+from dispatch import dispatch
+from events import PodmanEventSubscriber
+from refresh import RefreshPolicy, HIDDEN
+import startup
+
+
+class ProjectView(Gtk.Box):
+    """compose プロジェクト1つ分の表示 (全体の状態・コンテナ一覧・ジョブ状況)"""
+
+    def __init__(self, compose_dir: str, status_callback) -> None:
+        super().__init__(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        self.compose_dir = compose_dir
+        self.project = get_backend(compose_dir).project
+
+        # プロジェクトごとに状態のキャッシュを持つ ContainerManager
+        self.container_manager = ContainerManager(compose_dir, status_callback=status_callback)
+
+        # UIの構築
+        self.build_ui()
+
+        self.container_manager.set_snapshot_callback(self.on_snapshot)
+        self.container_manager.set_jobs_callback(self.update_jobs)
+
+        # 状態の取り直し (間隔は変化の有無とウィンドウの見え方で決める)
+        self.refresh_policy = RefreshPolicy()
+        self.refresh_source_id = None
+        self.refresh_due = None
+        self.last_snapshot: dict = {}
+
+        # 初回状態の更新
+        self.update_container_status()
+
+        # データの鮮度表示を1秒ごとに更新
+        self.data_age_source_id = GLib.timeout_add_seconds(1, self.update_data_age)
+
+        # イベント購読とリソース収集はウィンドウの描画後に start_background_streams で始める
+        self.event_subscriber = None
+
+    def start_background_streams(self) -> None:
+        if self.event_subscriber is not None:
+            return
+        # podman events を購読して状態変化を反映
+        self.start_event_subscription()
+
+        # リソース使用量の収集を開始
+        self.container_manager.start_metrics()
+        # リンクの応答確認を開始
+        self.container_manager.start_probes()
+        # 起動中のサービスのログをディスクに記録する
+        self.container_manager.start_log_archive()
+
+    def on_snapshot(self, containers: dict) -> None:
+        startup.mark("first_state")
+        self.update_overall_status()
+        # 取得のたびに (どこから要求されたものでも) 次の取り直しを決め直す
+        changed = self.container_manager.snapshot != self.last_snapshot
+        self.last_snapshot = dict(self.container_manager.snapshot)
+        self.schedule_refresh(self.refresh_policy.next_delay(self.container_manager.is_settling(), changed))
+
+    def schedule_refresh(self, delay, only_if_sooner: bool = False) -> None:
+        """delay 秒後に状態を取り直す (None なら止める)。
+           only_if_sooner なら、予定がそれより早ければ変えない。
+        """
+        now = GLib.get_monotonic_time() / 1_000_000
+        if only_if_sooner and delay is not None and self.refresh_due is not None and self.refresh_due <= now + delay:
+            return
+        if self.refresh_source_id is not None:
+            GLib.source_remove(self.refresh_source_id)
+            self.refresh_source_id = None
+            self.refresh_due = None
+        if delay is None:
+            return
+        self.refresh_due = now + delay
+        self.refresh_source_id = GLib.timeout_add(int(delay * 1000), self.on_refresh_timer)
+
+    def on_refresh_timer(self) -> bool:
+        self.refresh_source_id = None
+        self.refresh_due = None
+        self.container_manager.update_container_status(self.on_refresh_result)
+        return False
+
+    def on_refresh_result(self, containers) -> None:
+        # 成功時は on_snapshot で決め直すので、失敗した場合だけ間隔を延ばして続ける
+        if containers is None:
+            self.schedule_refresh(self.refresh_policy.next_delay(self.container_manager.is_settling(), False))
+
+    def set_visibility(self, visibility: str) -> None:
+        """ウィンドウ (タブ) の見え方を反映する。フォーカスが戻ったらすぐ取り直す"""
+        if visibility == self.refresh_policy.visibility:
+            return
+        if self.refresh_policy.set_visibility(visibility):
+            self.update_container_status()
+        elif visibility == HIDDEN:
+            self.schedule_refresh(None)
+        else:
+            self.schedule_refresh(self.refresh_policy.adjust(self.refresh_policy.interval))
+
+    def build_ui(self) -> None:
+        # 全体の状態セクション
+        overall_status_section = self.build_overall_status_section()
+        self.pack_start(overall_status_section, False, False, 10)
+
+        # コンテナごとの稼働状況セクション
+        container_status_frame = self.build_container_status_section()
+        self.pack_start(container_status_frame, True, True, 10)
+
+        # ジョブの状況 (実行中・待機中の操作) と、データの鮮度
+        jobs_bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
+        self.jobs_label = Gtk.Label(label="")
+        self.jobs_label.set_xalign(0)
+        jobs_bar.pack_start(self.jobs_label, True, True, 5)
+        self.data_age_label = Gtk.Label(label="最終更新: -")
+        jobs_bar.pack_end(self.data_age_label, False, False, 5)
+        self.cancel_jobs_button = Gtk.Button(label="待機中を取消")
+        self.cancel_jobs_button.set_sensitive(False)
+        self.cancel_jobs_button.connect("clicked", lambda _: self.container_manager.cancel_pending_jobs())
+        jobs_bar.pack_end(self.cancel_jobs_button, False, False, 5)
+        self.pack_start(jobs_bar, False, False, 0)
+
+    def build_overall_status_section(self) -> Gtk.Box:
+        layout = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
+
+        self.overall_status_label = Gtk.Label(label="全体の状態: 未確認")
+        self.overall_status_label.set_xalign(0)
+        layout.pack_start(self.overall_status_label, True, True, 0)
+
+        button_layout = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        button_layout.set_halign(Gtk.Align.END)
+        start_all_button = Gtk.Button(label="🟢 すべて起動")
+        stop_all_button = Gtk.Button(label="🔴 すべて停止")
+        start_all_button.connect("clicked", lambda _: self.container_manager.start_all_containers())
+        stop_all_button.connect("clicked", lambda _: self.container_manager.stop_all_containers())
+        button_layout.pack_start(start_all_button, False, False, 0)
+        button_layout.pack_start(stop_all_button, False, False, 0)
+        merged_logs_button = Gtk.Button(label="📜 まとめてログ")
+        merged_logs_button.set_tooltip_text("全サービスのログを時刻順にまとめて表示する")
+        merged_logs_button.connect("clicked", lambda _: self.show_merged_logs())
+        button_layout.pack_start(merged_logs_button, False, False, 0)
+        history_button = Gtk.Button(label="📈 状態の履歴")
+        history_button.set_tooltip_text("サービスの状態の変化 (再起動の繰り返しなど) をタイムラインで表示する")
+        history_button.connect("clicked", lambda _: self.show_state_history())
+        button_layout.pack_start(history_button, False, False, 0)
+
+        layout.pack_end(button_layout, False, False, 0)
+
+        return layout
+
+    def show_merged_logs(self) -> None:
+        # ログビューアは開くときに読み込む
+        from log_viewer import MergedLogViewer
+        window = MergedLogViewer(self.compose_dir, dict(self.container_manager.services))
+        window.set_transient_for(self.get_toplevel())
+        window.show_all()
+
+    def show_state_history(self) -> None:
+        from timeline_window import StateTimelineWindow
+        window = StateTimelineWindow(self.project, list(self.container_manager.services))
+        window.set_transient_for(self.get_toplevel())
+        window.show_all()
+
+    def build_container_status_section(self) -> Gtk.Frame:
+        frame = Gtk.Frame(label="🛠️ コンテナの稼働状況")
+        layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
+        layout.set_margin_top(10)
+        layout.set_margin_bottom(10)
+        layout.set_margin_start(10)
+        layout.set_margin_end(10)
+        frame.add(layout)
+
+        # サービスの絞り込み
+        filter_entry = Gtk.SearchEntry()
+        filter_entry.set_placeholder_text("サービスを絞り込み")
+        filter_entry.connect("search-changed", lambda entry: self.container_manager.set_filter(entry.get_text()))
+        layout.pack_start(filter_entry, False, False, 0)
+
+        self.container_manager.initialize_cards(layout)
+        return frame
+
+    def update_container_status(self) -> None:
+        # 取得はワーカープールで行われ、完了時に snapshot_callback 経由で全体の状態が更新される
+        self.container_manager.update_container_status()
+
+    def apply_service_state(self, service_name: str, state: str) -> None:
+        self.container_manager.apply_service_state(service_name, state)
+        self.update_overall_status()
+        # イベントに載らないヘルスチェックなどを早めに取り直す
+        self.schedule_refresh(self.refresh_policy.soon(), only_if_sooner=True)
+
+    def update_overall_status(self) -> None:
+        started_count = self.container_manager.get_started_container_count()
+        total_count = self.container_manager.get_service_count()
+        if (started_count == total_count) and total_count > 0:
+            status_text = "全体の状態: 全サービス起動中"
+        elif started_count > 0:
+            status_text = f"全体の状態: {started_count}/{total_count} サービス起動中"
+        elif total_count > 0:
+            status_text = "全体の状態: 全サービス停止中"
+        else:
+            status_text = "全体の状態: 未確認"
+
+        self.overall_status_label.set_text(status_text)
+
+    def start_event_subscription(self) -> None:
+        """イベント購読を開始する。ストリームが切れている間だけポーリングに切り替わる"""
+        self.event_subscriber = PodmanEventSubscriber(
+            self.container_manager.backend,
+            state_callback=lambda service, state: dispatch(self.apply_service_state, service, state),
+            poll_callback=lambda: dispatch(self.update_container_status),
+        )
+        self.event_subscriber.start()
+
+    def update_data_age(self) -> bool:
+        """最後に状態を取得してからの経過時間を表示する"""
+        age = self.container_manager.get_data_age()
+        if age is None:
+            self.data_age_label.set_text("最終更新: -")
+        else:
+            self.data_age_label.set_text(f"最終更新: {int(age)}秒前")
+        return True
+
+    def update_jobs(self, summary: str) -> None:
+        """実行中・待機中の操作を表示する"""
+        self.jobs_label.set_text(summary)
+        running, pending = self.container_manager.scheduler.get_counts()
+        self.cancel_jobs_button.set_sensitive(pending > 0)
+        if running or pending:
+            self.schedule_refresh(self.refresh_policy.soon(), only_if_sooner=True)
+
+    def shutdown(self) -> None:
+        """バックグラウンドの購読を止める"""
+        GLib.source_remove(self.data_age_source_id)
+        self.schedule_refresh(None)
+        if self.event_subscriber is not None:
+            self.event_subscriber.stop()
+        self.container_manager.stop_metrics()
+        self.container_manager.stop_probes()
+        self.container_manager.stop_log_archive()
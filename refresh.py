@@ -0,0 +1,73 @@
+from typing import Optional
+from orchestrator import container_health
+from config import refresh_fast_interval, refresh_base_interval, refresh_max_interval, refresh_unfocused_interval
+
+# 状態が変わっている途中とみなす State / ヘルスチェックの結果 (この間は短い間隔で取り直す)
+TRANSITIONAL_STATES = {"created", "configured", "initialized", "restarting", "removing", "stopping"}
+TRANSITIONAL_HEALTH = {"starting", "unhealthy"}
+
+# ウィンドウの見え方
+FOCUSED = "focused"
+UNFOCUSED = "unfocused"
+HIDDEN = "hidden"
+
+
+def is_transitional(container_data: dict) -> bool:
+    """起動・停止の途中か、ヘルスチェックが落ち着いていないか"""
+    state = str(container_data.get("State") or "").lower()
+    return state in TRANSITIONAL_STATES or container_health(container_data) in TRANSITIONAL_HEALTH
+
+
+class RefreshPolicy:
+    """状態を定期的に取り直す間隔を決める (タイマーは表示側が持つ)。
+       - 変化の途中のサービスや実行中の操作があれば fast_interval ごとに取り直す
+       - 落ち着いていれば base_interval から倍々に max_interval まで延ばし、変化があれば戻す
+       - フォーカスがなければ unfocused_interval より短くしない。最小化中は止める
+       停止・起動そのものは podman events で届くので、ここで補うのはヘルスチェックなどの変化。
+    """
+
+    def __init__(self, fast_interval: float = refresh_fast_interval, base_interval: float = refresh_base_interval,
+                 max_interval: float = refresh_max_interval,
+                 unfocused_interval: float = refresh_unfocused_interval) -> None:
+        self.fast_interval = fast_interval
+        self.base_interval = base_interval
+        self.max_interval = max_interval
+        self.unfocused_interval = unfocused_interval
+        # 落ち着いているときの次の間隔
+        self.interval = base_interval
+        self.visibility = FOCUSED
+
+    def reset(self) -> None:
+        """変化があった。間隔を最初に戻す"""
+        self.interval = self.base_interval
+
+    def next_delay(self, busy: bool, changed: bool) -> Optional[float]:
+        """次に取り直すまでの秒数 (止める場合は None)。取得のたびに1回呼ぶ"""
+        if busy:
+            delay = self.fast_interval
+            self.interval = self.base_interval
+        elif changed:
+            delay = self.interval = self.base_interval
+        else:
+            delay = self.interval
+            self.interval = min(self.max_interval, self.interval * 2)
+        return self.adjust(delay)
+
+    def soon(self) -> Optional[float]:
+        """イベントや操作で変化を知った。詳しい状態を早めに取り直す"""
+        self.reset()
+        return self.adjust(self.fast_interval)
+
+    def adjust(self, delay: float) -> Optional[float]:
+        """ウィンドウの見え方に合わせて間隔を延ばす"""
+        if self.visibility == HIDDEN:
+            return None
+        if self.visibility == UNFOCUSED:
+            return max(delay, self.unfocused_interval)
+        return delay
+
+    def set_visibility(self, visibility: str) -> bool:
+        """見え方を変える。見えていなかったウィンドウにフォーカスが戻ったら True (すぐ取り直す)"""
+        previous = self.visibility
+        self.visibility = visibility
+        return visibility == FOCUSED and previous != FOCUSED
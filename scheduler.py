@@ -0,0 +1,166 @@
+import itertools
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+# プロジェクト全体を対象にするジョブのキー (すべて起動/すべて停止)
+ALL_SERVICES = "*"
+
+
+class Job:
+    """サービスに対する1回の操作"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, key: str, action: str, label: str, run: Callable[[], None],
+                 dedicated: bool = False) -> None:
+        self.id = next(self._ids)
+        self.key = key
+        self.action = action
+        self.label = label
+        self.run = run
+        # 長く待つジョブは共有の実行先 (ワーカープール) を塞がないよう専用のスレッドで実行する
+        self.dedicated = dedicated
+        self.state = "queued"  # queued / running / done / cancelled
+
+
+class JobScheduler:
+    """サービスごとに操作を直列化するスケジューラ。
+       - 1サービスにつき実行中1件・待機1件まで。待機中の操作は新しい操作で置き換える
+         (起動→停止→起動 は起動1回になる)
+       - 実行中と同じ操作が来た場合は何もしない
+       - 同時に実行するジョブ数を max_concurrency までに制限する
+       - 全体ジョブ (ALL_SERVICES) は他のジョブと同時には実行しない
+    """
+
+    def __init__(self, max_concurrency: int = 2,
+                 change_callback: Optional[Callable[[], None]] = None,
+                 submit: Optional[Callable] = None,
+                 cancel_callback: Optional[Callable[[list], None]] = None) -> None:
+        self.max_concurrency = max_concurrency
+        self.change_callback = change_callback
+        # 取り消された (置き換えられた) 待機中のジョブの一覧を受け取る
+        self.cancel_callback = cancel_callback
+        # ジョブの実行先 (指定がなければジョブごとにスレッドを起こす)
+        self.submit_work = submit or (lambda fn, *args: threading.Thread(target=fn, args=args, daemon=True).start())
+        # change_callback から describe() などを呼んでもデッドロックしないよう再入可能にする
+        self._lock = threading.RLock()
+        self._pending: "OrderedDict[str, Job]" = OrderedDict()
+        self._running: Dict[str, Job] = {}
+
+    def submit(self, key: str, action: str, label: str, run: Callable[[], None], dedicated: bool = False) -> Job:
+        """操作を登録する。run はワーカースレッドで実行される (ブロックしてよい)。
+           dedicated なら共有の実行先ではなく専用のスレッドで実行する。
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending and pending.action == action:
+                return pending
+
+            running = self._running.get(key)
+            if running and running.action == action:
+                # 実行中の操作で目的の状態になるので、待機中の逆操作も不要になる
+                if pending:
+                    del self._pending[key]
+                    self._cancelled_locked([pending])
+                    self._notify_locked()
+                return running
+
+            cancelled = []
+            if pending:
+                del self._pending[key]
+                cancelled.append(pending)
+            if key == ALL_SERVICES:
+                # 全体操作は個別の待機中の操作をすべて包含する
+                cancelled.extend(self._pending.values())
+                self._pending.clear()
+
+            job = Job(key, action, label, run, dedicated)
+            self._pending[key] = job
+            self._cancelled_locked(cancelled)
+            self._dispatch_locked()
+            self._notify_locked()
+            return job
+
+    def cancel(self, key: str) -> bool:
+        """待機中の操作を取り消す (実行中のものは取り消せない)"""
+        with self._lock:
+            job = self._pending.pop(key, None)
+            if job is None:
+                return False
+            self._cancelled_locked([job])
+            self._notify_locked()
+            return True
+
+    def cancel_all(self) -> int:
+        with self._lock:
+            cancelled = list(self._pending.values())
+            self._pending.clear()
+            self._cancelled_locked(cancelled)
+            self._notify_locked()
+            return len(cancelled)
+
+    def is_pending(self, key: str) -> bool:
+        with self._lock:
+            return key in self._pending
+
+    def is_running(self, key: str) -> bool:
+        with self._lock:
+            return key in self._running
+
+    def get_counts(self) -> tuple:
+        """(実行中, 待機中) の件数"""
+        with self._lock:
+            return len(self._running), len(self._pending)
+
+    def describe(self) -> str:
+        """ステータスバー表示用の要約"""
+        with self._lock:
+            running = [job.label for job in self._running.values()]
+            pending = len(self._pending)
+        if not running and not pending:
+            return ""
+        text = f"実行中: {', '.join(running)}" if running else "実行中: なし"
+        if pending:
+            text += f" / 待機中: {pending}件"
+        return text
+
+    def _dispatch_locked(self) -> None:
+        for key in list(self._pending):
+            if len(self._running) >= self.max_concurrency:
+                return
+            if ALL_SERVICES in self._running:
+                return
+            if key in self._running:
+                continue
+            if key == ALL_SERVICES and self._running:
+                # 全体ジョブは実行中のジョブがなくなるまで待ち、後続も追い越させない
+                return
+            job = self._pending.pop(key)
+            job.state = "running"
+            self._running[key] = job
+            if job.dedicated:
+                threading.Thread(target=self._execute, args=(job,), name=f"job-{job.id}", daemon=True).start()
+            else:
+                self.submit_work(self._execute, job)
+
+    def _execute(self, job: Job) -> None:
+        try:
+            job.run()
+        except Exception as e:
+            print(f"エラー: ジョブの実行に失敗しました ({job.label}) - {e}")
+        with self._lock:
+            job.state = "done"
+            del self._running[job.key]
+            self._dispatch_locked()
+            self._notify_locked()
+
+    def _cancelled_locked(self, jobs: list) -> None:
+        for job in jobs:
+            job.state = "cancelled"
+        if jobs and self.cancel_callback:
+            self.cancel_callback(jobs)
+
+    def _notify_locked(self) -> None:
+        if self.change_callback:
+            self.change_callback()
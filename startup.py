@@ -0,0 +1,38 @@
+import time
+
+# このモジュールは main.py で最初に読み込まれ、ここを起動時刻の基準にする
+_started_at = time.perf_counter()
+_marks: dict = {}
+_reported = False
+
+# これらが揃った時点でレポートを出力する
+REPORT_MARKS = ("first_paint", "first_state")
+
+LABELS = {
+    "imports": "モジュール読み込み",
+    "window_built": "ウィンドウ構築",
+    "first_paint": "初回描画",
+    "first_state": "初回の状態取得",
+}
+
+
+def mark(name: str) -> None:
+    """起動からの経過時間を記録する (同じ名前は最初の1回だけ)"""
+    global _reported
+    if name in _marks:
+        return
+    _marks[name] = time.perf_counter() - _started_at
+    if not _reported and all(key in _marks for key in REPORT_MARKS):
+        _reported = True
+        print(report())
+
+
+def get_marks() -> dict:
+    return dict(_marks)
+
+
+def report() -> str:
+    lines = ["起動時間:"]
+    for name, elapsed in sorted(_marks.items(), key=lambda item: item[1]):
+        lines.append(f"  {LABELS.get(name, name)}: {elapsed * 1000:.1f} ms")
+    return "\n".join(lines)
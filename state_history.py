@@ -0,0 +1,132 @@
+import json
+import sys
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Dict, Optional
+from orchestrator import container_health
+from config import state_history_max_transitions, state_history_flap_window, state_history_flap_restarts
+
+# 状態の変化1件。状態は "running" や "running/unhealthy" (ヘルスチェックがあれば付ける) の形
+Transition = namedtuple("Transition", "timestamp project service old_state new_state exit_code")
+
+
+def describe_state(container_data: dict) -> str:
+    state = str(container_data.get("State") or "unknown").lower()
+    health = container_health(container_data)
+    return sys.intern(f"{state}/{health}" if health and state == "running" else state)
+
+
+def parse_exit_code(container_data: dict) -> Optional[int]:
+    try:
+        return int(container_data.get("ExitCode"))
+    except (TypeError, ValueError):
+        return None
+
+
+class StateHistory:
+    """サービスの状態の変化だけを記録する (プロセス全体で1つ)。
+       各サービスは最後に観測した状態だけを持ち、変わったときに Transition を1件追加する。
+       記録は全体で max_transitions 件までで、超えたら古いものから捨てる。
+    """
+
+    def __init__(self, max_transitions: int = state_history_max_transitions) -> None:
+        self.transitions: deque = deque(maxlen=max_transitions)
+        # (プロジェクト, サービス) → (状態, その状態になった時刻)
+        self.current: Dict[tuple, tuple] = {}
+        # (プロジェクト, サービス) → 最初に観測した時刻 (それより前は描画しない)
+        self.first_seen: Dict[tuple, float] = {}
+        # 上限で捨てた最後の変化の時刻 (これより前の状態はわからない)
+        self.complete_since = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, project: str, service_name: str, container_data: dict,
+                timestamp: Optional[float] = None) -> Optional[Transition]:
+        """観測した状態を記録する。前回から変わっていれば Transition を返す (最初の観測は記録しない)"""
+        state = describe_state(container_data)
+        timestamp = time.time() if timestamp is None else timestamp
+        key = (project, service_name)
+        with self._lock:
+            previous = self.current.get(key)
+            if previous is not None and previous[0] == state:
+                return None
+            self.current[key] = (state, timestamp)
+            if previous is None:
+                self.first_seen[key] = timestamp
+                return None
+            transition = Transition(timestamp, project, service_name, previous[0], state,
+                                    parse_exit_code(container_data))
+            if len(self.transitions) == self.transitions.maxlen:
+                self.complete_since = self.transitions[0].timestamp
+            self.transitions.append(transition)
+            return transition
+
+    def query(self, project: Optional[str] = None, service_name: Optional[str] = None,
+              since: Optional[float] = None) -> list:
+        """条件に合う変化を古い順に返す"""
+        with self._lock:
+            transitions = list(self.transitions)
+        return [
+            t for t in transitions
+            if (project is None or t.project == project)
+            and (service_name is None or t.service == service_name)
+            and (since is None or t.timestamp >= since)
+        ]
+
+    def segments(self, project: str, service_name: str, start: float, end: float) -> list:
+        """start〜end の状態を (開始時刻, 終了時刻, 状態) の一覧にする (タイムラインの描画用)"""
+        transitions = self.query(project, service_name, since=start)
+        with self._lock:
+            current = self.current.get((project, service_name))
+            first_seen = max(self.first_seen.get((project, service_name), 0.0), self.complete_since)
+        if current is None:
+            return []
+        # start の時点の状態: start より後の最初の変化の、変化前の状態
+        state = transitions[0].old_state if transitions else current[0]
+        position = max(start, first_seen)
+        result = []
+        for transition in transitions:
+            if transition.timestamp >= end:
+                break
+            if transition.timestamp > position:
+                result.append((position, transition.timestamp, state))
+            position = transition.timestamp
+            state = transition.new_state
+        if position < end:
+            result.append((position, end, state))
+        return result
+
+    def activity(self, project: str, service_name: str, window: float = state_history_flap_window,
+                 now: Optional[float] = None) -> dict:
+        """直近 window 秒の変化の回数・起動し直した回数・異常終了の回数と、不安定 (flapping) かどうか"""
+        now = time.time() if now is None else now
+        transitions = self.query(project, service_name, since=now - window)
+        restarts = sum(t.new_state.startswith("running") and not t.old_state.startswith("running")
+                       for t in transitions)
+        failures = sum(t.new_state == "exited" and bool(t.exit_code) for t in transitions)
+        return {
+            "transitions": len(transitions),
+            "restarts": restarts,
+            "failures": failures,
+            "flapping": restarts >= state_history_flap_restarts,
+        }
+
+    def export(self, project: Optional[str] = None) -> dict:
+        transitions = self.query(project)
+        with self._lock:
+            current = {key: value for key, value in self.current.items() if project is None or key[0] == project}
+        return {
+            "exported_at": time.time(),
+            "current": [
+                {"project": key[0], "service": key[1], "state": state, "since": since}
+                for key, (state, since) in sorted(current.items())
+            ],
+            "transitions": [t._asdict() for t in transitions],
+        }
+
+    def write_json(self, path: str, project: Optional[str] = None) -> None:
+        with open(path, "w") as f:
+            json.dump(self.export(project), f, ensure_ascii=False, indent=2)
+
+
+state_history = StateHistory()
@@ -0,0 +1,92 @@
+"""log_index.py を一時ディレクトリのアーカイブに対して確かめる (標準ライブラリのみ)。
+
+    python -m unittest discover tests
+"""
+import shutil
+import tempfile
+import time
+import unittest
+
+from log_archive import LogArchive
+from log_hub import LogChannel
+from log_index import LogIndex, LogQuery
+
+
+class FakeStream:
+    def __init__(self, lines: list) -> None:
+        self.lines = lines
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def close(self) -> None:
+        pass
+
+
+class FakeBackend:
+    """最初の取得で lines を返し、以降は何も返さない"""
+
+    def __init__(self, lines: list) -> None:
+        self.pending = lines
+
+    def open_log_stream(self, service_name: str, follow: bool, tail=None, since=None) -> FakeStream:
+        lines, self.pending = self.pending, []
+        return FakeStream(lines)
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class ReadOnlyArchiveIndexTest(unittest.TestCase):
+    """別のプロセスが書き込み中で、アーカイブを読み取り専用で開いた場合"""
+
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        # 同じディレクトリを先に開いた方が .lock を持つ (flock はファイルを開くごとにかかる)
+        self.writer = LogArchive(self.directory)
+        self.archive = LogArchive(self.directory)
+        self.assertTrue(self.archive.read_only)
+
+        lines = [f"INFO line {i}\n" for i in range(40)] + [f"ERROR line {i}\n" for i in range(40, 50)]
+        self.channel = LogChannel(FakeBackend(lines), "web", self.archive, backlog_lines=10)
+        recording = self.channel.subscribe("記録")
+        self.assertTrue(wait_until(lambda: self.channel.end_line == 50 and not self.channel.is_streaming()))
+        recording.close()
+        self.index = None
+
+    def tearDown(self) -> None:
+        if self.index is not None:
+            self.index.stop()
+        self.archive.close()
+        self.writer.close()
+        shutil.rmtree(self.directory)
+
+    def test_lines_past_backlog_are_skipped(self) -> None:
+        # 0〜39 行目はディスクにも直近の行にもない
+        self.assertEqual(self.channel.backlog_start, 40)
+        self.assertEqual(self.channel.read_block(0, 10), (0, []))
+
+        self.index = LogIndex(self.channel)
+        self.assertTrue(wait_until(self.index.is_complete))
+        self.assertEqual(self.index.indexed_to, 50)
+        self.assertEqual(self.index.level(0), 0)
+        self.assertEqual(self.index.level(45), 4)
+
+        result = self.index.search(LogQuery("error"))
+        self.assertTrue(wait_until(self.index.is_complete))
+        self.assertEqual(result.slice(0, 100), list(range(40, 50)))
+
+        # 索引し終えたら空回りせずに待つ
+        used = time.process_time()
+        time.sleep(0.5)
+        self.assertLess(time.process_time() - used, 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
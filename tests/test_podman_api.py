@@ -0,0 +1,213 @@
+"""podman_api.py を UNIX ソケット上の偽の Podman API サーバーに対して確かめる (標準ライブラリのみ)。
+
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import socketserver
+import struct
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler
+
+from backend import ApiBackend
+from podman_api import PodmanAPIClient, PodmanAPIError
+
+PREFIX = "/v4.0.0/libpod"
+
+
+def frame(stream: int, data: bytes) -> bytes:
+    """多重化されたログの1フレーム (8バイトのヘッダー + 本体)"""
+    return struct.pack(">BxxxL", stream, len(data)) + data
+
+
+class FakePodmanHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunked(self, chunks: list) -> None:
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for chunk in chunks:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self) -> None:
+        path = self.path.split("?", 1)[0]
+        self.server.paths.append(self.path)
+        if path == PREFIX + "/containers/json":
+            self.send_body(200, json.dumps([{"Names": ["web"]}]).encode())
+        elif path == PREFIX + "/containers/web/json":
+            self.send_body(200, json.dumps({"Name": "web", "State": {"Status": "running"}}).encode())
+            if self.server.drop_after_inspect:
+                # keep-alive のまま応答してから切断する (クライアントはプールした接続が切れていることを知らない)
+                self.close_connection = True
+        elif path == PREFIX + "/containers/web/logs":
+            self.send_chunked([
+                frame(1, b"first li"),
+                frame(1, b"ne\nsecond line\n"),
+                frame(2, b"err"),
+                frame(2, b"or\nunterminated"),
+            ])
+        elif path == PREFIX + "/containers/tty/logs":
+            self.send_chunked([b"plain ", b"line\nnext\n"])
+        elif path == PREFIX + "/events":
+            self.send_chunked([b'{"Action": "st', b'art"}\n{"Action"', b': "die"}\n'])
+        else:
+            self.send_body(404, json.dumps({"message": "no such container"}).encode())
+
+    def do_POST(self) -> None:
+        path = self.path.split("?", 1)[0]
+        self.server.paths.append(self.path)
+        if path.startswith(PREFIX + "/containers/web/") and self.server.fail_actions:
+            self.send_body(500, json.dumps({"message": "internal error"}).encode())
+        elif path == PREFIX + "/containers/web/start":
+            self.send_body(204, b"")
+        elif path == PREFIX + "/containers/web/stop":
+            self.send_body(304, b"")
+        else:
+            self.send_body(404, json.dumps({"message": "no such container"}).encode())
+
+
+class FakePodmanServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str) -> None:
+        super().__init__(socket_path, FakePodmanHandler)
+        self.connections = 0
+        self.paths: list = []
+        self.drop_after_inspect = False
+        # True なら起動・停止に 500 を返す
+        self.fail_actions = False
+        self.lock = threading.Lock()
+
+
+class PodmanAPIClientTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        socket_path = os.path.join(self.directory, "podman.sock")
+        self.server = FakePodmanServer(socket_path)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = PodmanAPIClient(socket_path, timeout=5.0)
+
+    def tearDown(self) -> None:
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_requests_reuse_pooled_connection(self) -> None:
+        self.assertEqual(self.client.list_containers({"label": ["a=b"]}), [{"Names": ["web"]}])
+        self.assertEqual(self.client.inspect_container("web")["Name"], "web")
+        self.client.start_container("web")
+        self.assertEqual(self.server.connections, 1)
+        self.assertIn("filters=", self.server.paths[0])
+
+    def test_not_modified_is_ok(self) -> None:
+        self.client.stop_container("web", timeout=3)
+        self.assertTrue(self.server.paths[-1].endswith("/stop?timeout=3"))
+
+    def test_error_status_maps_to_api_error(self) -> None:
+        with self.assertRaises(PodmanAPIError) as raised:
+            self.client.inspect_container("missing")
+        self.assertEqual(raised.exception.status, 404)
+        self.assertEqual(raised.exception.message, "no such container")
+        with self.assertRaises(PodmanAPIError) as raised:
+            self.client.start_container("missing")
+        self.assertEqual(raised.exception.status, 404)
+        with self.assertRaises(PodmanAPIError) as raised:
+            self.client.logs("missing")
+        self.assertEqual(raised.exception.status, 404)
+
+    def test_retries_when_pooled_connection_was_closed(self) -> None:
+        self.server.drop_after_inspect = True
+        self.client.inspect_container("web")
+        self.server.drop_after_inspect = False
+        self.assertEqual(self.client.inspect_container("web")["Name"], "web")
+        self.assertEqual(self.server.connections, 2)
+
+    def test_multiplexed_logs_are_decoded(self) -> None:
+        stream = self.client.logs("web", tail=10)
+        try:
+            lines = list(stream)
+        finally:
+            stream.close()
+        self.assertEqual(lines, ["first line\n", "second line\n", "error\n", "unterminated\n"])
+        self.assertIn("tail=10", self.server.paths[-1])
+
+    def test_tty_logs_pass_through(self) -> None:
+        stream = self.client.logs("tty")
+        try:
+            self.assertEqual(list(stream), ["plain line\n", "next\n"])
+        finally:
+            stream.close()
+
+    def test_chunked_stream_reassembles_lines(self) -> None:
+        stream = self.client.events()
+        try:
+            events = [json.loads(line) for line in stream]
+        finally:
+            stream.close()
+        self.assertEqual(events, [{"Action": "start"}, {"Action": "die"}])
+
+
+class RecordingBackend:
+    """ApiBackend のフォールバック先の代わりに、呼ばれた操作を記録する"""
+
+    def __init__(self) -> None:
+        self.calls: list = []
+
+    def start_service(self, service_name: str) -> None:
+        self.calls.append(("start", service_name))
+
+    def stop_service(self, service_name: str) -> None:
+        self.calls.append(("stop", service_name))
+
+
+class ApiBackendTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.mkdtemp()
+        socket_path = os.path.join(self.directory, "podman.sock")
+        self.server = FakePodmanServer(socket_path)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.backend = ApiBackend(self.directory, "project", socket_path)
+        self.backend.fallback = RecordingBackend()
+
+    def tearDown(self) -> None:
+        self.backend.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_start_and_stop_use_api(self) -> None:
+        self.backend.start_service("web")
+        self.backend.stop_service("web")
+        self.assertEqual(self.backend.fallback.calls, [])
+        self.assertTrue(self.server.paths[-1].startswith(PREFIX + "/containers/web/stop"))
+
+    def test_failed_actions_fall_back_to_cli(self) -> None:
+        self.server.fail_actions = True
+        self.backend.start_service("web")
+        self.backend.stop_service("web")
+        self.assertEqual(self.backend.fallback.calls, [("start", "web"), ("stop", "web")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,186 @@
+"""probes.py をローカルの HTTP / TCP サーバーに対して確かめる (標準ライブラリのみ)。
+
+    python -m unittest discover tests
+"""
+import socket
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from probes import Endpoint, EndpointProber
+
+
+class CountingHandler(BaseHTTPRequestHandler):
+    """keep-alive で応答し、/error には 500 を返す"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self) -> None:
+        status = 500 if self.path == "/error" else 200
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+
+def start_http_server() -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CountingHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def start_tcp_listener() -> socket.socket:
+    """接続を受け付けるだけの TCP サーバー (受け付けないとバックログが埋まって接続できなくなる)"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+
+    def accept() -> None:
+        while True:
+            try:
+                connection, _ = listener.accept()
+            except OSError:
+                return
+            connection.close()
+
+    threading.Thread(target=accept, daemon=True).start()
+    return listener
+
+
+def unused_port() -> int:
+    """何も待ち受けていないポート (接続拒否になる)"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until(predicate, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return predicate()
+
+
+class EndpointTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = start_http_server()
+        self.port = self.server.server_address[1]
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_http_reuses_connection(self) -> None:
+        endpoint = Endpoint("web", "WebUI", f"http://127.0.0.1:{self.port}/")
+        try:
+            for _ in range(3):
+                self.assertGreaterEqual(endpoint.probe(1.0), 0.0)
+                self.assertEqual(endpoint.detail, "HTTP 200")
+        finally:
+            endpoint.close()
+        self.assertEqual(self.server.connections, 1)
+
+    def test_server_error_is_failure(self) -> None:
+        endpoint = Endpoint("web", "WebUI", f"http://127.0.0.1:{self.port}/error")
+        try:
+            with self.assertRaises(ConnectionError):
+                endpoint.probe(1.0)
+        finally:
+            endpoint.close()
+
+    def test_tcp_connects(self) -> None:
+        listener = start_tcp_listener()
+        try:
+            endpoint = Endpoint("db", "DB", f"tcp://127.0.0.1:{listener.getsockname()[1]}")
+            endpoint.probe(1.0)
+            self.assertEqual(endpoint.detail, "接続可")
+        finally:
+            listener.close()
+
+    def test_refused(self) -> None:
+        endpoint = Endpoint("web", "WebUI", f"http://127.0.0.1:{unused_port()}/")
+        with self.assertRaises(ConnectionRefusedError):
+            endpoint.probe(1.0)
+
+
+class EndpointProberTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = start_http_server()
+        self.listener = start_tcp_listener()
+        self.updates: list = []
+        self.prober = EndpointProber(self.updates.append, interval=0.05, max_interval=0.4, timeout=1.0)
+        self.prober.set_targets({
+            "web": {"links": [
+                {"name": "WebUI", "url": f"http://127.0.0.1:{self.server.server_address[1]}/"},
+                {"name": "DB", "url": f"tcp://127.0.0.1:{self.listener.getsockname()[1]}"},
+            ]},
+            "down": {"links": [{"name": "API", "url": f"http://127.0.0.1:{unused_port()}/"}]},
+            "none": {"links": []},
+        })
+        self.prober.start()
+
+    def tearDown(self) -> None:
+        self.prober.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        self.listener.close()
+
+    def state(self, service_name: str) -> str:
+        return self.prober.summary(service_name)["state"]
+
+    def test_inactive_services_are_not_probed(self) -> None:
+        time.sleep(0.2)
+        self.assertEqual(self.state("web"), "unknown")
+        self.assertEqual(self.server.connections, 0)
+        self.assertIsNone(self.prober.summary("none"))
+
+    def test_ready_and_down(self) -> None:
+        self.prober.set_service_active("web", True)
+        self.prober.set_service_active("down", True)
+        self.assertTrue(wait_until(lambda: self.state("web") == "ready" and self.state("down") == "down"))
+
+        summary = self.prober.summary("web")
+        self.assertIsNotNone(summary["p50_ms"])
+        self.assertIsNotNone(summary["p95_ms"])
+        self.assertEqual(self.prober.summary("down")["endpoints"][0][2], "接続拒否")
+        self.assertIn("web", self.updates)
+
+        # 確認を続けても HTTP の接続は使い回される
+        self.assertTrue(wait_until(lambda: len(self.prober.endpoints[
+            ("web", f"http://127.0.0.1:{self.server.server_address[1]}/")].latencies.values()) >= 3))
+        self.assertEqual(self.server.connections, 1)
+
+    def test_failures_back_off(self) -> None:
+        self.prober.set_service_active("down", True)
+        endpoint = next(e for e in self.prober.endpoints.values() if e.service_name == "down")
+        self.assertTrue(wait_until(lambda: endpoint.failures >= 4))
+        # 0.05, 0.1, 0.2, 0.4 と延び、最大間隔を超えない
+        self.assertLessEqual(endpoint.next_due - time.monotonic(), 0.4)
+        failures = endpoint.failures
+        time.sleep(0.2)
+        self.assertLessEqual(endpoint.failures - failures, 1)
+
+    def test_stopping_service_resets_state(self) -> None:
+        self.prober.set_service_active("web", True)
+        self.assertTrue(wait_until(lambda: self.state("web") == "ready"))
+        self.prober.set_service_active("web", False)
+        self.assertEqual(self.state("web"), "unknown")
+
+
+if __name__ == "__main__":
+    unittest.main()
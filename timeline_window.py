@@ -0,0 +1,160 @@
+import time
+from gi.repository import Gtk, GLib
+from state_history import state_history
+
+# 表示する期間の選択肢 (秒, 表示名)
+PERIODS = [(600, "10分"), (3600, "1時間"), (6 * 3600, "6時間"), (24 * 3600, "24時間")]
+
+# 状態ごとの色 (RGB)。ここにない状態は STATE_COLOR_OTHER
+STATE_COLORS = {
+    "running": (0.30, 0.70, 0.30),
+    "running/healthy": (0.30, 0.70, 0.30),
+    "running/starting": (0.95, 0.80, 0.20),
+    "running/unhealthy": (0.95, 0.50, 0.10),
+    "exited": (0.80, 0.25, 0.25),
+    "stopped": (0.60, 0.60, 0.60),
+    "paused": (0.35, 0.50, 0.85),
+}
+STATE_COLOR_OTHER = (0.55, 0.75, 0.90)
+
+# タイムラインの1行の高さ (px)
+ROW_HEIGHT = 18
+
+
+class StateTimelineWindow(Gtk.Window):
+    """サービスごとの状態の変化をタイムラインと一覧で表示し、JSON に書き出す"""
+
+    def __init__(self, project: str, services: list) -> None:
+        super().__init__(title=f"状態の履歴 - {project}")
+        self.set_default_size(820, 560)
+        self.project = project
+        self.services = services
+        self.period = PERIODS[1][0]
+
+        # 変化の一覧: 時刻, サービス, 変化前, 変化後, 終了コード
+        self.transition_store = Gtk.ListStore(str, str, str, str, str)
+        self.timelines: dict = {}
+        self.activity_labels: dict = {}
+
+        self.build_ui()
+        self.refresh()
+        self.refresh_source_id = GLib.timeout_add_seconds(5, self.on_refresh_timer)
+        self.connect("destroy", lambda _: GLib.source_remove(self.refresh_source_id))
+
+    def build_ui(self) -> None:
+        main_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
+        main_box.set_margin_top(5)
+        main_box.set_margin_bottom(5)
+        main_box.set_margin_start(5)
+        main_box.set_margin_end(5)
+        self.add(main_box)
+
+        toolbar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
+        toolbar.pack_start(Gtk.Label(label="期間:"), False, False, 0)
+        period_combo = Gtk.ComboBoxText()
+        for seconds, label in PERIODS:
+            period_combo.append(str(seconds), label)
+        period_combo.set_active_id(str(self.period))
+        period_combo.connect("changed", self.on_period_changed)
+        toolbar.pack_start(period_combo, False, False, 0)
+        self.range_label = Gtk.Label(label="")
+        toolbar.pack_start(self.range_label, False, False, 0)
+        export_button = Gtk.Button(label="JSON に書き出す...")
+        export_button.connect("clicked", lambda _: self.export())
+        toolbar.pack_end(export_button, False, False, 0)
+        main_box.pack_start(toolbar, False, False, 0)
+
+        paned = Gtk.Paned(orientation=Gtk.Orientation.VERTICAL)
+        main_box.pack_start(paned, True, True, 0)
+
+        # サービスごとのタイムライン (名前, 帯, 直近の再起動・異常終了の回数)
+        grid = Gtk.Grid(column_spacing=10, row_spacing=4)
+        for row, service_name in enumerate(self.services):
+            name_label = Gtk.Label(label=service_name)
+            name_label.set_xalign(0)
+            grid.attach(name_label, 0, row, 1, 1)
+            timeline = Gtk.DrawingArea()
+            timeline.set_size_request(-1, ROW_HEIGHT)
+            timeline.set_hexpand(True)
+            timeline.connect("draw", self.draw_timeline, service_name)
+            grid.attach(timeline, 1, row, 1, 1)
+            activity_label = Gtk.Label(label="")
+            activity_label.set_xalign(0)
+            grid.attach(activity_label, 2, row, 1, 1)
+            self.timelines[service_name] = timeline
+            self.activity_labels[service_name] = activity_label
+        grid_scroll = Gtk.ScrolledWindow()
+        grid_scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
+        grid_scroll.add(grid)
+        paned.pack1(grid_scroll, True, False)
+
+        transition_view = Gtk.TreeView(model=self.transition_store)
+        for index, title in enumerate(("時刻", "サービス", "変化前", "変化後", "終了コード")):
+            column = Gtk.TreeViewColumn(title, Gtk.CellRendererText(), text=index)
+            column.set_resizable(True)
+            column.set_sort_column_id(index)
+            transition_view.append_column(column)
+        transition_scroll = Gtk.ScrolledWindow()
+        transition_scroll.add(transition_view)
+        paned.pack2(transition_scroll, True, False)
+
+    def on_period_changed(self, combo: Gtk.ComboBoxText) -> None:
+        self.period = int(combo.get_active_id())
+        self.refresh()
+
+    def on_refresh_timer(self) -> bool:
+        self.refresh()
+        return True
+
+    def refresh(self) -> None:
+        now = time.time()
+        self.range_label.set_text(
+            f"{time.strftime('%m/%d %H:%M', time.localtime(now - self.period))} 〜 {time.strftime('%H:%M', time.localtime(now))}"
+        )
+        for service_name, label in self.activity_labels.items():
+            activity = state_history.activity(self.project, service_name, window=self.period, now=now)
+            text = f"再起動 {activity['restarts']} 回 / 異常終了 {activity['failures']} 回"
+            if activity["flapping"]:
+                text = "⚠️ 不安定 " + text
+            label.set_text(text)
+            self.timelines[service_name].queue_draw()
+
+        self.transition_store.clear()
+        for transition in reversed(state_history.query(self.project, since=now - self.period)):
+            self.transition_store.append([
+                time.strftime("%m/%d %H:%M:%S", time.localtime(transition.timestamp)),
+                transition.service,
+                transition.old_state,
+                transition.new_state,
+                "-" if transition.exit_code is None else str(transition.exit_code),
+            ])
+
+    def draw_timeline(self, widget: Gtk.DrawingArea, cr, service_name: str) -> bool:
+        width = widget.get_allocated_width()
+        height = widget.get_allocated_height()
+        # 観測していない期間は薄い灰色
+        cr.set_source_rgb(0.92, 0.92, 0.92)
+        cr.rectangle(0, 0, width, height)
+        cr.fill()
+        end = time.time()
+        start = end - self.period
+        scale = width / self.period
+        for segment_start, segment_end, state in state_history.segments(self.project, service_name, start, end):
+            cr.set_source_rgb(*STATE_COLORS.get(state, STATE_COLOR_OTHER))
+            # 短い状態 (起動し直した直後など) も見えるよう最低1px で描く
+            cr.rectangle((segment_start - start) * scale, 0, max(1.0, (segment_end - segment_start) * scale), height)
+            cr.fill()
+        return False
+
+    def export(self) -> None:
+        dialog = Gtk.FileChooserDialog(title="状態の履歴を書き出す", parent=self, action=Gtk.FileChooserAction.SAVE)
+        dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_SAVE, Gtk.ResponseType.OK)
+        dialog.set_do_overwrite_confirmation(True)
+        dialog.set_current_name(f"state-history-{self.project}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+        try:
+            if dialog.run() == Gtk.ResponseType.OK:
+                state_history.write_json(dialog.get_filename(), self.project)
+        except OSError as e:
+            print(f"エラー: 状態の履歴の書き出しに失敗しました - {e}")
+        finally:
+            dialog.destroy()
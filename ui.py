@@ -1,10 +1,10 @@
 import gi
 gi.require_version("Gtk", "3.0")
-from gi.repository import Gtk, GLib
-import threading
-import time
-from config import compose_dir
-from container import ContainerManager
+from gi.repository import Gtk, Gdk, GLib
+from config import compose_dirs, enable_log
+from project_view import ProjectView
+from refresh import FOCUSED, UNFOCUSED, HIDDEN
+import startup
 
 
 class BackendManager(Gtk.Window):
@@ -13,24 +13,35 @@ class BackendManager(Gtk.Window):
         self.set_border_width(10)
 
         # BackendManagerがステータス更新用のメソッドを持つ
-        # ContainerManagerに渡せるようにするため、一旦Noneで初期化
-        self.status_label = None
+        # プロジェクトの初期化中にもメッセージが来るので先にラベルを用意する
+        self.status_label = Gtk.Label(label="準備完了")
 
-        # ContainerManager の初期化時にstatus_callbackを渡す
-        # 後でbuild_ui()でstatus_labelがセットされるため、一旦lambdaで仮定義
-        self.container_manager = ContainerManager(compose_dir, status_callback=lambda msg: None)
+        # プロジェクトごとの表示 (状態取得と操作は共有のワーカープールで実行される)
+        self.project_views = []
+        self.notebook = None
+        self.iconified = False
+        # コマンドコンソール (初めて表示するときに作る)
+        self.command_console = None
 
         # UIの構築
         self.build_ui()
 
-        # ContainerManagerにstatus_callbackをセットし直す
-        self.container_manager.set_status_callback(self.update_status)
+        self.connect("destroy", lambda _: self.shutdown())
+
+        # フォーカス・最小化に合わせて状態の取り直しを遅らせる・止める
+        self.connect("notify::is-active", lambda *_: self.update_visibility())
+        self.connect("window-state-event", self.on_window_state)
 
-        # 初回状態の更新
-        self.update_container_status()
+        # 初回描画までの時間を記録する
+        self.first_draw_handler_id = self.connect("draw", self.on_first_draw)
 
-        # 状態を定期的に更新
-        self.start_periodic_update()
+    def on_first_draw(self, widget: Gtk.Widget, cr) -> bool:
+        self.disconnect(self.first_draw_handler_id)
+        startup.mark("first_paint")
+        # イベント購読などの常駐処理は描画の後で始める
+        for view in self.project_views:
+            GLib.idle_add(view.start_background_streams)
+        return False
 
     def build_ui(self) -> None:
         main_layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
@@ -42,73 +53,96 @@ class BackendManager(Gtk.Window):
 
         main_layout.set_size_request(512, -1)
 
-        # 全体の状態セクション
-        overall_status_section = self.build_overall_status_section()
-        main_layout.pack_start(overall_status_section, False, False, 10)
+        # 上にプロジェクト、下にコマンドコンソール
+        self.console_paned = Gtk.Paned(orientation=Gtk.Orientation.VERTICAL)
+        main_layout.pack_start(self.console_paned, True, True, 0)
 
-        # コンテナごとの稼働状況セクション
-        container_status_frame = self.build_container_status_section()
-        main_layout.pack_start(container_status_frame, True, True, 10)
+        if len(compose_dirs) == 1:
+            view = ProjectView(compose_dirs[0], status_callback=self.update_status)
+            self.project_views.append(view)
+            self.console_paned.pack1(view, True, False)
+        else:
+            # 複数プロジェクトはタブで切り替える
+            notebook = Gtk.Notebook()
+            notebook.set_scrollable(True)
+            for compose_dir in compose_dirs:
+                view = ProjectView(compose_dir, status_callback=None)
+                view.container_manager.set_status_callback(
+                    lambda msg, project=view.project: self.update_status(f"[{project}] {msg}")
+                )
+                self.project_views.append(view)
+                notebook.append_page(view, Gtk.Label(label=view.project))
+            # 表示中でないタブはフォーカスがないものとして扱う
+            notebook.connect("switch-page", lambda _, page, __: self.update_visibility(page))
+            self.notebook = notebook
+            self.console_paned.pack1(notebook, True, False)
 
         # ボトムバー（ステータス表示用）
         status_bar = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL)
-        self.status_label = Gtk.Label(label="準備完了")
         status_bar.pack_start(self.status_label, True, True, 5)
+        refresh_button = Gtk.Button(label="🔄 更新")
+        refresh_button.set_tooltip_text("すべてのプロジェクトの状態を取得し直す")
+        refresh_button.connect("clicked", lambda _: self.refresh_all())
+        status_bar.pack_end(refresh_button, False, False, 5)
+        diagnostics_button = Gtk.Button(label="🩺 診断")
+        diagnostics_button.set_tooltip_text("メインループの停止とコマンドの所要時間を表示する")
+        diagnostics_button.connect("clicked", lambda _: self.show_diagnostics())
+        status_bar.pack_end(diagnostics_button, False, False, 5)
+        console_button = Gtk.ToggleButton(label="🖥️ コンソール")
+        console_button.set_tooltip_text("実行したコマンドとその出力を表示する")
+        console_button.connect("toggled", lambda button: self.set_console_visible(button.get_active()))
+        status_bar.pack_end(console_button, False, False, 5)
         main_layout.pack_start(status_bar, False, False, 5)
-
-    def build_overall_status_section(self) -> Gtk.Box:
-        layout = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=20)
-
-        self.overall_status_label = Gtk.Label(label="全体の状態: 未確認")
-        self.overall_status_label.set_xalign(0)
-        layout.pack_start(self.overall_status_label, True, True, 0)
-
-        button_layout = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=10)
-        button_layout.set_halign(Gtk.Align.END)
-        start_all_button = Gtk.Button(label="🟢 すべて起動")
-        stop_all_button = Gtk.Button(label="🔴 すべて停止")
-        start_all_button.connect("clicked", lambda _: self.container_manager.start_all_containers())
-        stop_all_button.connect("clicked", lambda _: self.container_manager.stop_all_containers())
-        button_layout.pack_start(start_all_button, False, False, 0)
-        button_layout.pack_start(stop_all_button, False, False, 0)
-
-        layout.pack_end(button_layout, False, False, 0)
-
-        return layout
-
-    def build_container_status_section(self) -> Gtk.Frame:
-        frame = Gtk.Frame(label="🛠️ コンテナの稼働状況")
-        layout = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=10)
-        layout.set_margin_top(10)
-        layout.set_margin_bottom(10)
-        layout.set_margin_start(10)
-        layout.set_margin_end(10)
-        frame.add(layout)
-
-        self.container_manager.initialize_cards(layout)
-        return frame
-
-    def update_container_status(self) -> None:
-        self.container_manager.update_container_status()
-        started_count = self.container_manager.get_started_container_count()
-        total_count = len(self.container_manager.container_cards)
-        if (started_count == total_count) and total_count > 0:
-            status_text = "全体の状態: 全サービス起動中"
-        elif started_count > 0:
-            status_text = f"全体の状態: {started_count}/{total_count} サービス起動中"
-        elif total_count > 0:
-            status_text = "全体の状態: 全サービス停止中"
-        else:
-            status_text = "全体の状態: 未確認"
-
-        self.overall_status_label.set_text(status_text)
-
-    def start_periodic_update(self) -> None:
-        def periodic_update():
-            while True:
-                time.sleep(10)
-                GLib.idle_add(self.update_container_status)
-        threading.Thread(target=periodic_update, daemon=True).start()
+        if enable_log:
+            GLib.idle_add(console_button.set_active, True)
+
+    def on_window_state(self, widget: Gtk.Widget, event) -> bool:
+        hidden = Gdk.WindowState.ICONIFIED | Gdk.WindowState.WITHDRAWN
+        self.iconified = bool(event.new_window_state & hidden)
+        self.update_visibility()
+        return False
+
+    def update_visibility(self, current_page=None) -> None:
+        """各プロジェクトにウィンドウ (タブ) の見え方を伝える"""
+        if current_page is None and self.notebook is not None:
+            current_page = self.notebook.get_nth_page(self.notebook.get_current_page())
+        for view in self.project_views:
+            if self.iconified:
+                visibility = HIDDEN
+            elif self.is_active() and (current_page is None or view is current_page):
+                visibility = FOCUSED
+            else:
+                visibility = UNFOCUSED
+            view.set_visibility(visibility)
+
+    def set_console_visible(self, visible: bool) -> None:
+        """コマンドコンソールの表示を切り替える (隠している間は描画しない)"""
+        if visible and self.command_console is None:
+            # コンソールは初めて表示するときに読み込む
+            from command_log import CommandConsole
+            self.command_console = CommandConsole()
+            self.console_paned.pack2(self.command_console, False, True)
+        if self.command_console is not None:
+            if visible:
+                self.command_console.show_all()
+            else:
+                self.command_console.hide()
+
+    def refresh_all(self) -> None:
+        """全プロジェクトの状態取得を同時に投入する (ワーカープールで並行して実行される)"""
+        for view in self.project_views:
+            view.update_container_status()
+
+    def show_diagnostics(self) -> None:
+        # 診断ウィンドウは開くときに読み込む
+        from diagnostics_window import DiagnosticsWindow
+        window = DiagnosticsWindow()
+        window.set_transient_for(self)
+        window.show_all()
+
+    def shutdown(self) -> None:
+        for view in self.project_views:
+            view.shutdown()
 
     def update_status(self, message: str) -> None:
         """ステータスバーのメッセージを更新"""
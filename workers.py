@@ -0,0 +1,41 @@
+import queue
+import threading
+from typing import Callable
+from config import worker_pool_size
+
+
+class WorkerPool:
+    """固定数のデーモンスレッドでタスクを実行するプール。
+       全プロジェクトの状態取得と操作コマンドはここを通し、同時に動く podman の数を抑える。
+    """
+
+    def __init__(self, size: int, name: str = "podman-worker") -> None:
+        self.size = size
+        self.name = name
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args) -> None:
+        self._ensure_started()
+        self._queue.put((fn, args))
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.size):
+                thread = threading.Thread(target=self._worker, name=f"{self.name}-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _worker(self) -> None:
+        while True:
+            fn, args = self._queue.get()
+            try:
+                fn(*args)
+            except Exception as e:
+                print(f"エラー: ワーカーでの処理に失敗しました - {e}")
+
+
+worker_pool = WorkerPool(worker_pool_size)